@@ -0,0 +1,34 @@
+"""
+Benchmarks for the SciGateway Auth API.
+
+Importing this package sets defaults for any configuration that has not been provided through environment variables
+when there is no `.env` file, so that the benchmarks can be run from a fresh clone of the repository using the test
+keys.
+"""
+
+import os
+from pathlib import Path
+
+BENCHMARK_ENVIRONMENT = {
+    "API__ALLOWED_CORS_HEADERS": '["*"]',
+    "API__ALLOWED_CORS_ORIGINS": '["*"]',
+    "API__ALLOWED_CORS_METHODS": '["*"]',
+    "AUTHENTICATION__PRIVATE_KEY_PATH": str(Path(__file__).parent.parent / "test" / "keys" / "jwt-key"),
+    "AUTHENTICATION__PUBLIC_KEY_PATH": str(Path(__file__).parent.parent / "test" / "keys" / "jwt-key.pub"),
+    "AUTHENTICATION__JWT_ALGORITHM": "RS256",
+    "AUTHENTICATION__ACCESS_TOKEN_VALIDITY_MINUTES": "30",
+    "AUTHENTICATION__REFRESH_TOKEN_VALIDITY_DAYS": "7",
+    "AUTHENTICATION__JWT_REFRESH_TOKEN_BLACKLIST": "[]",
+    "AUTHENTICATION__ADMIN_USERS": "[]",
+    "MAINTENANCE__MAINTENANCE_PATH": str(Path(__file__).parent.parent / "maintenance" / "maintenance.json"),
+    "MAINTENANCE__SCHEDULED_MAINTENANCE_PATH": str(
+        Path(__file__).parent.parent / "maintenance" / "scheduled_maintenance.json",
+    ),
+    "ICAT_SERVER__URL": "http://localhost/icat",
+    "ICAT_SERVER__CERTIFICATE_VALIDATION": "true",
+    "ICAT_SERVER__REQUEST_TIMEOUT_SECONDS": "5",
+}
+
+if not (Path(__file__).parent.parent / "scigateway_auth" / ".env").exists():
+    for name, value in BENCHMARK_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
@@ -0,0 +1,68 @@
+"""
+Benchmark comparing how many tokens can be signed and verified per second with each of the supported JWT algorithms,
+using freshly generated keys of the sizes recommended for each algorithm. It can be used to choose the algorithm (and
+key type) of the signing key: e.g. Ed25519 signs far faster than RSA, but RSA with its small public exponent verifies
+faster than either ECDSA or Ed25519.
+
+Run from the root of the repository using:
+
+    python -m benchmarks.jwt_algorithms
+    python -m benchmarks.jwt_algorithms --algorithms RS256 EdDSA
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from benchmarks.utils import measure_ops_per_second, print_results
+from scigateway_auth.src.key_material import _create_jwt_key
+
+# Generates a private key suitable for each algorithm
+KEY_GENERATORS: dict[str, Callable[[], Any]] = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "PS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "ES384": lambda: ec.generate_private_key(ec.SECP384R1()),
+    "EdDSA": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        choices=KEY_GENERATORS,
+        default=list(KEY_GENERATORS),
+        help="The algorithms to benchmark",
+    )
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds to run each measurement for")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    payload = {
+        "sessionId": "benchmark-session-id",
+        "username": "benchmark/username",
+        "userIsAdmin": False,
+        "exp": datetime.now(timezone.utc) + timedelta(hours=1),
+    }
+
+    results = {}
+    for algorithm_name in args.algorithms:
+        private_key = KEY_GENERATORS[algorithm_name]()
+        key = _create_jwt_key(algorithm_name, private_key.public_key(), private_key)
+        token = key.sign(payload)
+        results[algorithm_name] = {
+            "sign": measure_ops_per_second(partial(key.sign, payload), args.duration),
+            "verify": measure_ops_per_second(partial(key.verify, token), args.duration),
+            "token length": len(token),
+        }
+
+    print_results("Tokens signed and verified per second by algorithm", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Microbenchmark comparing how many tokens can be minted per second when the private key is parsed on every token (the
+previous behaviour of `JWTHandler._pack_jwt`) and when the parsed key held by `KeyMaterial` is reused.
+
+Run from the root of the repository using:
+
+    python -m benchmarks.jwt_signing
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import serialization
+import jwt
+
+from benchmarks.utils import measure_ops_per_second, print_results
+from scigateway_auth.common.config import config
+from scigateway_auth.src.jwt_handler import JWTHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds to run each measurement for")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    with open(config.authentication.private_key_path, "r", encoding="utf-8") as file:
+        private_key = file.read()
+
+    payload = {
+        "sessionId": "benchmark-session-id",
+        "username": "benchmark/username",
+        "userIsAdmin": False,
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=config.authentication.access_token_validity_minutes),
+    }
+
+    def mint_with_key_parsing() -> str:
+        loaded_private_key = serialization.load_ssh_private_key(bytes(private_key, encoding="utf8"), password=None)
+        return jwt.encode(payload, loaded_private_key, algorithm=config.authentication.jwt_algorithm)
+
+    def mint_with_cached_key() -> str:
+        return JWTHandler._pack_jwt(payload)
+
+    before = measure_ops_per_second(mint_with_key_parsing, args.duration)
+    after = measure_ops_per_second(mint_with_cached_key, args.duration)
+    print_results(
+        f"Tokens minted per second ({config.authentication.jwt_algorithm})",
+        {"key parsed per token": before, "cached key": after, "speedup": round(after / before, 2)},
+        args.json,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Load test which starts the SciGateway Auth API in uvicorn, backed by the stand-in ICAT and OIDC provider servers from
+`benchmarks.stand_in_servers`, and drives a weighted mix of requests to its routes at a fixed concurrency. It reports the
+latency percentiles and throughput of each route along with the memory used by each worker process.
+
+The requests are made from this process, so the client can become the bottleneck at high throughputs. Compare results
+from runs on the same machine with the same options. The API logs using `scigateway_auth/logging.ini`, which must exist
+and whose log level affects the results.
+
+Run from the root of the repository using:
+
+    python -m benchmarks.load_test
+"""
+
+import argparse
+import asyncio
+from contextlib import contextmanager
+import math
+import os
+from pathlib import Path
+import random
+import socket
+import subprocess  # noqa: S404
+import sys
+import time
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+import httpx
+
+from benchmarks import BENCHMARK_ENVIRONMENT
+from benchmarks.stand_in_servers import CLIENT_ID
+from benchmarks.utils import print_results
+
+# The default weights of the routes in the mix of requests, roughly matching a deployment where the other services
+# verify the token of every request they receive
+DEFAULT_MIX = (
+    "verify=50,verify_batch=2,refresh=10,login=5,oidc_login=5,authenticators=5,oidc_providers=3,maintenance=10,"
+    "scheduled_maintenance=10"
+)
+
+# The number of distinct users to log in as before the load test so that there are tokens to verify and refresh
+USERS = 20
+
+# The number of tokens in each batch verification request
+BATCH_SIZE = 10
+
+REPOSITORY_ROOT = Path(__file__).parent.parent
+
+
+class LoadTestContext:
+    """
+    The tokens and clients used by the requests made during the load test.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, stand_in_client: httpx.AsyncClient, rng: random.Random) -> None:
+        """
+        Initialise the context.
+
+        :param client: The client for the SciGateway Auth API.
+        :param stand_in_client: The client for the stand-in servers.
+        :param rng: The random number generator used to pick the tokens and users.
+        """
+        self.client = client
+        self.stand_in_client = stand_in_client
+        self.rng = rng
+        # Pairs of access and refresh tokens
+        self.tokens: list[tuple[str, str]] = []
+        self.id_tokens: list[str] = []
+
+    async def setup(self) -> None:
+        """
+        Log in as each of the users and obtain an OIDC id_token for each of them.
+        """
+        for user in range(USERS):
+            response = await self.login(user)
+            response.raise_for_status()
+            self.tokens.append((response.json(), response.cookies["scigateway:refresh_token"]))
+
+            response = await self.stand_in_client.post("/oidc/token", data={"code": str(user)})
+            response.raise_for_status()
+            self.id_tokens.append(response.json()["id_token"])
+
+    def login(self, user: int) -> Awaitable[httpx.Response]:
+        """
+        Log in to the API as one of the users.
+
+        :param user: The number of the user.
+        :return: The response.
+        """
+        return self.client.post(
+            "/login",
+            json={"mnemonic": "simple", "credentials": {"username": f"user-{user}", "password": "password"}},
+        )
+
+
+async def verify(context: LoadTestContext) -> httpx.Response:
+    return await context.client.post("/verify", json={"token": context.rng.choice(context.tokens)[0]})
+
+
+async def verify_batch(context: LoadTestContext) -> httpx.Response:
+    tokens = [access_token for access_token, _ in context.rng.choices(context.tokens, k=BATCH_SIZE)]
+    return await context.client.post("/verify/batch", json={"tokens": tokens})
+
+
+async def refresh(context: LoadTestContext) -> httpx.Response:
+    index = context.rng.randrange(len(context.tokens))
+    access_token, refresh_token = context.tokens[index]
+    response = await context.client.post(
+        "/refresh",
+        json={"token": access_token},
+        headers={"Cookie": f"scigateway:refresh_token={refresh_token}"},
+    )
+    # Refresh tokens are rotated on every use, and reusing an old one later would revoke the user's tokens
+    if response.is_success:
+        context.tokens[index] = (response.json(), response.cookies["scigateway:refresh_token"])
+    return response
+
+
+async def login(context: LoadTestContext) -> httpx.Response:
+    return await context.login(context.rng.randrange(USERS))
+
+
+async def oidc_login(context: LoadTestContext) -> httpx.Response:
+    id_token = context.rng.choice(context.id_tokens)
+    return await context.client.post("/oidc_login/benchmark", headers={"Authorization": f"Bearer {id_token}"})
+
+
+async def authenticators(context: LoadTestContext) -> httpx.Response:
+    return await context.client.get("/authenticators")
+
+
+async def oidc_providers(context: LoadTestContext) -> httpx.Response:
+    return await context.client.get("/oidc_providers")
+
+
+async def maintenance(context: LoadTestContext) -> httpx.Response:
+    return await context.client.get("/maintenance")
+
+
+async def scheduled_maintenance(context: LoadTestContext) -> httpx.Response:
+    return await context.client.get("/scheduled_maintenance")
+
+
+# The functions making a request to each of the routes. The streaming and `PUT` maintenance routes are not included as
+# they are not request/response routes and require an admin user respectively.
+ROUTES: dict[str, Callable[[LoadTestContext], Awaitable[httpx.Response]]] = {
+    "verify": verify,
+    "verify_batch": verify_batch,
+    "refresh": refresh,
+    "login": login,
+    "oidc_login": oidc_login,
+    "authenticators": authenticators,
+    "oidc_providers": oidc_providers,
+    "maintenance": maintenance,
+    "scheduled_maintenance": scheduled_maintenance,
+}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+    Parse a mix of requests given as comma separated `route=weight` pairs.
+
+    :param mix: The mix of requests.
+    :raises ValueError: If the mix contains an unknown route.
+    :return: The weights indexed by route.
+    """
+    weights = {}
+    for pair in mix.split(","):
+        route, weight = pair.split("=")
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route {route!r}, expected one of: {', '.join(ROUTES)}")
+        weights[route] = float(weight)
+    return weights
+
+
+def get_free_port() -> int:
+    """
+    Return a port on the local host that is not in use.
+
+    :return: The port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(app: str, port: int, workers: int, environment: dict[str, str]) -> Iterator[subprocess.Popen]:
+    """
+    Context manager which runs an ASGI app in uvicorn in a subprocess and waits for it to accept connections.
+
+    :param app: The import string of the app.
+    :param port: The port to serve the app on.
+    :param workers: The number of worker processes.
+    :param environment: The environment variables to run uvicorn with.
+    :raises RuntimeError: If uvicorn exits or does not accept connections within 30 seconds.
+    :return: The uvicorn process.
+    """
+    command = [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--workers", str(workers)]
+    command += ["--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(  # noqa: S603
+        command,
+        cwd=REPOSITORY_ROOT,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{app} exited with code {process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{app} did not start accepting connections") from None
+                time.sleep(0.1)
+        yield process
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def get_worker_memory_mib(process: subprocess.Popen, workers: int) -> list[float]:
+    """
+    Return the resident memory of each of the worker processes of uvicorn. This is only supported on Linux.
+
+    :param process: The uvicorn process.
+    :param workers: The number of worker processes uvicorn was started with.
+    :return: The resident memory of each worker process in MiB, or an empty list if it cannot be determined.
+    """
+    if workers == 1:
+        # uvicorn serves the app from the main process when there is only one worker
+        pids = [process.pid]
+    else:
+        pids = []
+        for proc_path in Path("/proc").glob("[0-9]*"):
+            try:
+                status = (proc_path / "status").read_text()
+                command_line = (proc_path / "cmdline").read_bytes()
+            except OSError:
+                continue
+            if f"\nPPid:\t{process.pid}\n" in status and b"spawn_main" in command_line:
+                pids.append(int(proc_path.name))
+
+    memory = []
+    for pid in pids:
+        try:
+            status = Path(f"/proc/{pid}/status").read_text()
+        except OSError:
+            return []
+        resident_kib = next(int(line.split()[1]) for line in status.splitlines() if line.startswith("VmRSS:"))
+        memory.append(round(resident_kib / 1024, 1))
+    return memory
+
+
+def summarise(latencies: list[float], errors: int, duration_seconds: float) -> dict[str, Any]:
+    """
+    Summarise the latencies of the requests made to a route.
+
+    :param latencies: The latencies of the requests in seconds.
+    :param errors: The number of requests which failed.
+    :param duration_seconds: The duration of the load test.
+    :return: The number of requests and errors, the throughput and the latency percentiles in milliseconds.
+    """
+    latencies = sorted(latencies)
+
+    def percentile(percent: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return round(latencies[max(math.ceil(percent / 100 * len(latencies)) - 1, 0)] * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / duration_seconds, 1),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+
+
+async def drive_load(
+    context: LoadTestContext,
+    weights: dict[str, float],
+    concurrency: int,
+    duration_seconds: float,
+) -> dict[str, tuple[list[float], int]]:
+    """
+    Make requests to the routes picked according to their weights from `concurrency` concurrent tasks for the given
+    duration.
+
+    :param context: The load test context.
+    :param weights: The weights of the routes.
+    :param concurrency: The number of concurrent requests.
+    :param duration_seconds: The duration to make requests for.
+    :return: The latencies of the successful requests and the number of failed requests indexed by route.
+    """
+    routes = list(weights)
+    results: dict[str, tuple[list[float], int]] = {route: ([], 0) for route in routes}
+    deadline = time.perf_counter() + duration_seconds
+
+    async def run() -> None:
+        while time.perf_counter() < deadline:
+            route = context.rng.choices(routes, weights=[weights[route] for route in routes])[0]
+            start = time.perf_counter()
+            try:
+                response = await ROUTES[route](context)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latency = time.perf_counter() - start
+
+            latencies, errors = results[route]
+            if failed:
+                results[route] = (latencies, errors + 1)
+            else:
+                latencies.append(latency)
+
+    await asyncio.gather(*(run() for _ in range(concurrency)))
+    return results
+
+
+async def run_load_test(args: argparse.Namespace, weights: dict[str, float], api_port: int, stand_in_port: int) -> dict:
+    """
+    Set up the tokens, warm up the API and then drive the load against it.
+
+    :param args: The command line arguments.
+    :param weights: The weights of the routes.
+    :param api_port: The port the API is served on.
+    :param stand_in_port: The port the stand-in servers are served on.
+    :return: The summary of the requests made to each route and overall.
+    """
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with (
+        httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", limits=limits, timeout=30) as client,
+        httpx.AsyncClient(base_url=f"http://127.0.0.1:{stand_in_port}") as stand_in_client,
+    ):
+        context = LoadTestContext(client, stand_in_client, random.Random(args.seed))  # noqa: S311
+        await context.setup()
+        await drive_load(context, weights, args.concurrency, args.warmup)
+        results = await drive_load(context, weights, args.concurrency, args.duration)
+
+    all_latencies = [latency for latencies, _ in results.values() for latency in latencies]
+    all_errors = sum(errors for _, errors in results.values())
+    return {
+        "overall": summarise(all_latencies, all_errors, args.duration),
+        "routes": {
+            route: summarise(latencies, errors, args.duration) for route, (latencies, errors) in results.items()
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="Number of seconds to drive the load for")
+    parser.add_argument("--warmup", type=float, default=5, help="Number of seconds to warm up for before measuring")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of concurrent requests")
+    parser.add_argument("--workers", type=int, default=1, help="Number of uvicorn worker processes for the API")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of the stand-in ICAT and OIDC servers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma separated route=weight pairs")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking the routes, tokens and users")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    api_port = get_free_port()
+    stand_in_port = get_free_port()
+
+    stand_in_environment = {**os.environ, "BENCHMARK_STAND_IN_LATENCY_MS": str(args.latency_ms)}
+    api_environment = {
+        **BENCHMARK_ENVIRONMENT,
+        **os.environ,
+        "ICAT_SERVER__URL": f"http://127.0.0.1:{stand_in_port}/icat",
+        "AUTHENTICATION__OIDC_PROVIDERS__benchmark__DISPLAY_NAME": "Benchmark",
+        "AUTHENTICATION__OIDC_PROVIDERS__benchmark__CONFIGURATION_URL": (
+            f"http://127.0.0.1:{stand_in_port}/oidc/.well-known/openid-configuration"
+        ),
+        "AUTHENTICATION__OIDC_PROVIDERS__benchmark__CLIENT_ID": CLIENT_ID,
+        "AUTHENTICATION__OIDC_ICAT_AUTHENTICATOR": "delegating",
+        "AUTHENTICATION__OIDC_ICAT_AUTHENTICATOR_TOKEN": "benchmark-token",
+    }
+
+    with run_server("benchmarks.stand_in_servers:app", stand_in_port, 1, stand_in_environment):
+        with run_server("scigateway_auth.main:app", api_port, args.workers, api_environment) as api_process:
+            results = asyncio.run(run_load_test(args, weights, api_port, stand_in_port))
+            results["memory_mib_per_worker"] = get_worker_memory_mib(api_process, args.workers)
+
+    results["options"] = {
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "latency_ms": args.latency_ms,
+        "mix": weights,
+        "seed": args.seed,
+    }
+    print_results("Load test", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark measuring the latency of logging in to ICAT as the login routes do, i.e. authenticating and then getting the
+username of the new session, against the stand-in ICAT server with a configurable latency per request. It reports how
+much of each login is spent on each of the two requests.
+
+The username request cannot be saved or sent alongside the authentication request: ICAT's response to a login only
+contains the session ID, and the username can only be looked up with that session ID. Both requests are sent over the
+same kept-alive connection of the shared ICAT client, so the second one does not pay for a new connection.
+
+Run from the root of the repository using:
+
+    python -m benchmarks.login_pipeline
+    python -m benchmarks.login_pipeline --latency-ms 20 --logins 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+
+from benchmarks import stand_in_servers
+from benchmarks.utils import print_results
+from scigateway_auth.src.authentication import ICATAuthenticator
+from scigateway_auth.src.icat_client import icat_client
+
+
+def summarise(latencies: list[float]) -> dict[str, float]:
+    """
+    Summarise the latencies of a step of the logins.
+
+    :param latencies: The latencies of the step in milliseconds.
+    :return: The mean, p50 and p95 latency in milliseconds.
+    """
+    latencies = sorted(latencies)
+    return {
+        "mean (ms)": statistics.fmean(latencies),
+        "p50 (ms)": latencies[len(latencies) // 2],
+        "p95 (ms)": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+async def run(latency_ms: float, logins: int) -> dict:
+    """
+    Log in to the stand-in ICAT server, served in process, one login at a time and return the latency of each step of
+    the logins.
+
+    :param latency_ms: The latency of each request to the stand-in ICAT server in milliseconds.
+    :param logins: The number of logins to make.
+    :return: The latency of authenticating, getting the username and the whole login.
+    """
+    stand_in_servers.LATENCY_SECONDS = latency_ms / 1000
+    transport = httpx.ASGITransport(app=stand_in_servers.app)
+    latencies: dict[str, list[float]] = {"authenticate": [], "get username": [], "login": []}
+    async with httpx.AsyncClient(transport=transport, base_url="http://stand-in/icat") as client:
+        with patch.object(icat_client, "_client", client):
+            for index in range(logins):
+                start = time.perf_counter()
+                session_id = await ICATAuthenticator.authenticate("simple", {"username": f"user-{index}"})
+                authenticated = time.perf_counter()
+                await ICATAuthenticator.get_username(session_id)
+                end = time.perf_counter()
+                latencies["authenticate"].append((authenticated - start) * 1000)
+                latencies["get username"].append((end - authenticated) * 1000)
+                latencies["login"].append((end - start) * 1000)
+
+    return {step: summarise(step_latencies) for step, step_latencies in latencies.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=10.0,
+        help="Latency of each request to the stand-in ICAT server",
+    )
+    parser.add_argument("--logins", type=int, default=100, help="Number of logins to make")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.latency_ms, args.logins))
+
+    print_results("Latency of logging in to ICAT", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
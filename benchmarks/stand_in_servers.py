@@ -0,0 +1,128 @@
+"""
+Stand-in ICAT and OIDC provider servers for the load test, which respond to the requests made by the SciGateway Auth API
+after a configurable delay so that it can be benchmarked without real servers.
+
+The ICAT server is served under `/icat` and the OIDC provider under `/oidc`. The delay in milliseconds is read from the
+`BENCHMARK_STAND_IN_LATENCY_MS` environment variable. Run using:
+
+    uvicorn benchmarks.stand_in_servers:app
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import json
+import os
+from typing import Annotated
+import uuid
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Form, Request, Response
+from fastapi.responses import JSONResponse
+import jwt
+
+# The client ID the SciGateway Auth API is configured with, which is the audience of the id_tokens
+CLIENT_ID = "benchmark-client"
+
+KID = "benchmark-kid"
+
+LATENCY_SECONDS = float(os.environ.get("BENCHMARK_STAND_IN_LATENCY_MS", "0")) / 1000
+
+_private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+# The usernames of the ICAT sessions that have been created indexed by session ID
+_sessions: dict[str, str] = {}
+
+app = FastAPI()
+
+
+async def _wait() -> None:
+    """
+    Wait for the configured latency to simulate the time taken by a real server.
+    """
+    if LATENCY_SECONDS > 0:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+
+def _get_issuer(request: Request) -> str:
+    """
+    Return the issuer of the stand-in OIDC provider.
+
+    :param request: The request made to the OIDC provider.
+    :return: The issuer.
+    """
+    return f"{request.base_url}oidc"
+
+
+def _session_not_found() -> JSONResponse:
+    """
+    Return the error ICAT responds with when a session cannot be found.
+
+    :return: The error response.
+    """
+    return JSONResponse({"code": "SESSION", "message": "Unable to find user by sessionid"}, status_code=403)
+
+
+@app.post("/icat/session")
+async def create_session(json_: Annotated[str, Form(alias="json")]) -> dict:
+    await _wait()
+    login = json.loads(json_)
+    credentials = {key: value for credential in login.get("credentials", []) for key, value in credential.items()}
+    session_id = str(uuid.uuid4())
+    _sessions[session_id] = f"{login['plugin']}/{credentials.get('username', 'anon')}"
+    return {"sessionId": session_id}
+
+
+@app.get("/icat/session/{session_id}")
+async def get_session(session_id: str) -> Response:
+    await _wait()
+    if session_id not in _sessions:
+        return _session_not_found()
+    return JSONResponse({"userName": _sessions[session_id], "remainingMinutes": 120})
+
+
+@app.put("/icat/session/{session_id}")
+async def refresh_session(session_id: str) -> Response:
+    await _wait()
+    if session_id not in _sessions:
+        return _session_not_found()
+    return Response(status_code=204)
+
+
+@app.get("/icat/properties")
+async def get_properties() -> dict:
+    await _wait()
+    return {
+        "authenticators": [
+            {"mnemonic": "anon", "keys": []},
+            {"mnemonic": "simple", "keys": [{"name": "username"}, {"name": "password", "hide": True}]},
+        ],
+    }
+
+
+@app.get("/oidc/.well-known/openid-configuration")
+async def get_openid_configuration(request: Request) -> dict:
+    await _wait()
+    issuer = _get_issuer(request)
+    return {"issuer": issuer, "jwks_uri": f"{issuer}/keys", "token_endpoint": f"{issuer}/token"}
+
+
+@app.get("/oidc/keys")
+async def get_keys() -> dict:
+    await _wait()
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(_private_key.public_key(), as_dict=True)
+    return {"keys": [{**jwk, "kid": KID, "use": "sig", "alg": "RS256"}]}
+
+
+@app.post("/oidc/token")
+async def create_token(request: Request, code: Annotated[str, Form()]) -> dict:
+    await _wait()
+    now = datetime.now(timezone.utc)
+    payload = {
+        "sub": f"oidc-user-{code}",
+        "iss": _get_issuer(request),
+        "aud": CLIENT_ID,
+        "iat": now,
+        "exp": now + timedelta(hours=1),
+    }
+    id_token = jwt.encode(payload, _private_key, algorithm="RS256", headers={"kid": KID})
+    return {"token_type": "Bearer", "id_token": id_token}
@@ -0,0 +1,79 @@
+"""
+Benchmark comparing how many tokens can be verified per second with and without the verified token cache, using a
+stream of verifications in which a configurable fraction are repeats of tokens that have already been verified (e.g. the
+same browser tab sending the same access token with every request).
+
+Run from the root of the repository using:
+
+    python -m benchmarks.token_verification
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import random
+import time
+from unittest.mock import patch
+
+from benchmarks.utils import print_results
+from scigateway_auth.src.jwt_handler import JWTHandler
+from scigateway_auth.src.token_cache import VerifiedTokenCache
+
+
+def create_token_stream(verifications: int, repeat_rate: float, seed: int) -> list[str]:
+    """
+    Create the sequence of tokens to verify.
+
+    :param verifications: The number of verifications in the sequence.
+    :param repeat_rate: The fraction of verifications which are repeats of a token earlier in the sequence.
+    :param seed: The seed for the random number generator so that the sequence is reproducible.
+    :return: The sequence of tokens to verify.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    exp = datetime.now(timezone.utc) + timedelta(hours=1)
+    stream: list[str] = []
+    for index in range(verifications):
+        if stream and rng.random() < repeat_rate:
+            stream.append(rng.choice(stream))
+        else:
+            payload = {"sessionId": f"session-{index}", "username": f"user-{index}", "userIsAdmin": False, "exp": exp}
+            stream.append(JWTHandler._pack_jwt(payload))
+    return stream
+
+
+def verify_stream(stream: list[str], cache_size: int) -> float:
+    """
+    Verify every token in the stream using `JWTHandler.verify_token` and return the number of verifications per second.
+
+    :param stream: The sequence of tokens to verify.
+    :param cache_size: The maximum size of the verified token cache, `0` to disable it.
+    :return: The number of verifications per second.
+    """
+    jwt_handler = JWTHandler()
+    with patch("scigateway_auth.src.jwt_handler.verified_token_cache", VerifiedTokenCache(cache_size)):
+        start = time.perf_counter()
+        for token in stream:
+            jwt_handler.verify_token(token)
+        return len(stream) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verifications", type=int, default=20000, help="Number of verifications to perform")
+    parser.add_argument("--repeat-rate", type=float, default=0.95, help="Fraction of verifications that are repeats")
+    parser.add_argument("--cache-size", type=int, default=10000, help="Maximum size of the verified token cache")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generating the sequence of tokens")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    stream = create_token_stream(args.verifications, args.repeat_rate, args.seed)
+    uncached = verify_stream(stream, 0)
+    cached = verify_stream(stream, args.cache_size)
+    print_results(
+        f"Verifications per second ({args.repeat_rate:.0%} repeats, {len(set(stream))} distinct tokens)",
+        {"without cache": uncached, "with cache": cached, "speedup": round(cached / uncached, 2)},
+        args.json,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Module for providing helpers shared by the benchmarks.
+"""
+
+import json
+import time
+from typing import Any, Callable
+
+
+def measure_ops_per_second(function: Callable[[], Any], duration_seconds: float) -> float:
+    """
+    Repeatedly call a function for (at least) the given duration and return how many calls were made per second.
+
+    :param function: The function to call.
+    :param duration_seconds: The number of seconds to keep calling the function for.
+    :return: The number of calls made per second.
+    """
+    # Warm up any lazily initialised state so that it is not included in the measurement
+    function()
+
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration_seconds
+    while True:
+        for _ in range(100):
+            function()
+        calls += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - start)
+
+
+def print_results(name: str, results: dict[str, Any], as_json: bool) -> None:
+    """
+    Print the results of a benchmark either as a human-readable table or as a JSON document.
+
+    :param name: The name of the benchmark.
+    :param results: The results of the benchmark indexed by the name of what was measured.
+    :param as_json: Whether to print the results as JSON.
+    """
+    if as_json:
+        print(json.dumps({"benchmark": name, "results": results}, indent=2))
+        return
+
+    print(name)
+    _print_values(results, 2)
+
+
+def _print_values(values: dict[str, Any], indent: int) -> None:
+    """
+    Print the values of a (nested) dictionary of results as an indented table.
+
+    :param values: The values indexed by the name of what was measured.
+    :param indent: The number of spaces to indent the values by.
+    """
+    width = max(len(key) for key in values)
+    for key, value in values.items():
+        if isinstance(value, dict):
+            print(f"{' ' * indent}{key}")
+            _print_values(value, indent + 2)
+        else:
+            formatted_value = f"{value:,.1f}" if isinstance(value, float) else str(value)
+            print(f"{' ' * indent}{key:<{width}}  {formatted_value}")
@@ -2,7 +2,7 @@ import nox
 
 # Separating Black away from the rest of the sessions
 nox.options.sessions = "lint", "safety", "tests"
-code_locations = "scigateway_auth", "test", "noxfile.py"
+code_locations = "scigateway_auth", "test", "benchmarks", "noxfile.py"
 
 
 @nox.session(reuse_venv=True)
@@ -42,3 +42,10 @@ def tests(session):
     args = session.posargs
     session.run("poetry", "install", "--with=dev", external=True)
     session.run("pytest", "--config-file=test/pytest.ini", *args)
+
+
+@nox.session(python=["3.11"], reuse_venv=True)
+def benchmarks(session):
+    args = session.posargs
+    session.run("poetry", "install", "--with=dev", external=True)
+    session.run("python", "-m", "benchmarks.load_test", *args)
@@ -3,7 +3,7 @@ Module for the overall configuration for the application.
 """
 
 from pathlib import Path
-from typing import List, Self
+from typing import List, Optional, Self
 
 from pydantic import BaseModel, ConfigDict, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -18,6 +18,12 @@ class APIConfig(BaseModel):
     allowed_cors_headers: List[str]
     allowed_cors_origins: List[str]
     allowed_cors_methods: List[str]
+    # The number of seconds after a request is received by which the requests made to ICAT and the OIDC providers while
+    # handling it, including their retries, have to finish.
+    request_deadline_seconds: float = 15.0
+    # The directory of the lock files guarding the maintenance, key and key ring files. When it is not set, the lock files
+    # are kept in a directory private to the user the app runs as in the temporary directory.
+    lock_directory: Optional[str] = None
 
 
 class MaintenanceConfig(BaseModel):
@@ -27,6 +33,25 @@ class MaintenanceConfig(BaseModel):
 
     maintenance_path: str
     scheduled_maintenance_path: str
+    # The minimum number of seconds between checks for changes to the maintenance files
+    poll_interval_seconds: float = 1.0
+    # The `Cache-Control` header returned with the maintenance states. The default makes browsers and caches revalidate
+    # their copy with a conditional request every time, which is answered with `304 Not Modified` if it is unchanged.
+    cache_control: str = "no-cache"
+    # The maximum number of clients each worker process streams the maintenance states to, and the number of seconds
+    # after which a heartbeat is sent to a client if there has been no change.
+    stream_max_subscribers: int = 10000
+    stream_heartbeat_seconds: float = 15.0
+
+
+class LoggingConfig(BaseModel):
+    """
+    Configuration model for logging.
+    """
+
+    # The fraction of the records below `WARNING` without exception information to log, indexed by the dotted name of
+    # the module logging them. Modules without a sample rate have all their records logged.
+    sample_rates: dict[str, float] = {}
 
 
 class OidcProviderConfig(BaseModel):
@@ -44,6 +69,15 @@ class OidcProviderConfig(BaseModel):
     username_claim: str = "sub"
 
 
+class PublicKeyConfig(BaseModel):
+    """
+    Configuration model for a public key that JWTs can be verified with in addition to the signing key pair.
+    """
+
+    path: str
+    jwt_algorithm: str
+
+
 class AuthenticationConfig(BaseModel):
     """
     Configuration model for the authentication.
@@ -51,10 +85,34 @@ class AuthenticationConfig(BaseModel):
 
     private_key_path: str
     public_key_path: str
+    # The minimum number of seconds between checks for changes to the key files
+    key_check_interval_seconds: float = 5.0
     jwt_algorithm: str
+    # Public keys, e.g. the previous keys after a rotation, that tokens carrying their `kid` can also be verified with
+    additional_public_keys: list[PublicKeyConfig] = []
+    # The JSON file recording the retired signing keys so that they are shared by the worker processes
+    key_ring_path: str = None
+    # The `Cache-Control` header returned with the JWK Set
+    jwks_cache_control: str = "max-age=300"
     access_token_validity_minutes: int
     refresh_token_validity_days: int
-    jwt_refresh_token_blacklist: list[str]
+    # Deprecated, the refresh tokens in the list are revoked in the revocation store at startup
+    jwt_refresh_token_blacklist: list[str] = []
+    # The SQLite database storing the revoked and used refresh tokens, which has to be shared by all the worker processes.
+    # `:memory:` keeps them in the memory of each worker process instead, which is only suitable for development.
+    revocation_store_path: Optional[str] = "./revocations/revocations.db"
+    # The minimum number of seconds between the prunes of the entries for expired tokens from the revocation store
+    revocation_store_prune_interval_seconds: float = 300.0
+    # The number of seconds a rotated refresh token can still be used for, e.g. by requests made at the same time from
+    # other tabs, before its reuse is treated as theft and all the tokens rotated from the same token are revoked
+    refresh_token_reuse_interval_seconds: float = 5.0
+    # The maximum number of verified tokens to cache the payloads of. `0` disables the cache.
+    verified_token_cache_size: int = 10000
+    # The maximum number of tokens that can be verified in one batch verification request
+    batch_verify_max_tokens: int = 10000
+    # Batches of at least this many tokens are verified in parallel by `batch_verify_processes` worker processes
+    batch_verify_parallel_threshold: int = 500
+    batch_verify_processes: int = None
     # These are the ICAT usernames of the users normally in the <icat-mnemonic>/<username> form
     admin_users: list[str]
 
@@ -62,6 +120,15 @@ class AuthenticationConfig(BaseModel):
     oidc_redirect_uri: str = None
     oidc_icat_authenticator: str = None
     oidc_icat_authenticator_token: str = None
+    # The minimum number of seconds between refetches of a provider's JWK Set triggered by an unknown `kid`
+    oidc_jwks_min_refetch_interval_seconds: float = 60.0
+    # The maximum number of unknown `kid`s to remember, and for how long, so they do not trigger refetches
+    oidc_jwks_negative_cache_size: int = 1000
+    oidc_jwks_negative_cache_ttl_seconds: float = 300.0
+    # The maximum number of times a failed request to an OIDC provider is retried, and the upper bound of the jittered
+    # delay before the first retry, which doubles with each retry
+    oidc_max_retries: int = 2
+    oidc_retry_backoff_seconds: float = 0.1
 
     @model_validator(mode="after")
     def validate_oidc(self) -> Self:
@@ -84,6 +151,39 @@ class ICATServerConfig(BaseModel):
     # `False` will disable certificate validation.
     certificate_validation: bool
     request_timeout_seconds: int
+    # The connections to the ICAT server are kept alive and shared by all requests handled by a worker process.
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 5.0
+    # Whether to use HTTP/2 when the ICAT server supports it.
+    http2: bool = False
+    # The number of seconds a successful refresh of an ICAT session is reused for by other refreshes of the same session,
+    # such as those made at the same time by the tabs a user has open. Concurrent refreshes always share one request.
+    session_refresh_coalesce_seconds: float = 2.0
+    # The lifetime of ICAT sessions, which is the `lifetimeMinutes` property of the ICAT server.
+    session_lifetime_minutes: float = 120.0
+    # The fraction of the session lifetime after a refresh of an ICAT session for which refreshing the access token does
+    # not refresh the session again, as long as the session outlives the refreshed access token. `0` always refreshes it.
+    session_refresh_skip_fraction: float = 0.5
+    # The number of seconds the list of authenticators is cached for, and for how long after that the cached list is still
+    # returned while ICAT cannot be reached. It is refreshed in the background during the last fifth of the TTL.
+    authenticators_cache_ttl_seconds: float = 300.0
+    authenticators_cache_stale_seconds: float = 86400.0
+    # Requests to the ICAT server fail fast for `circuit_breaker_open_seconds` after `circuit_breaker_failure_threshold`
+    # consecutive requests fail to connect, time out, get a server error or take longer than `slow_request_seconds`.
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_open_seconds: float = 30.0
+    slow_request_seconds: float = 2.0
+    # The number of concurrent requests to the ICAT server starts limited to `max_connections`. The limit is halved when
+    # requests fail or are slow and grows back as they succeed, but is never lowered below this.
+    min_concurrency_limit: int = 1
+    # The maximum number of times a failed request to the ICAT server is retried, and the upper bound of the jittered delay
+    # before the first retry, which doubles with each retry. Logins are only retried if they failed to connect.
+    max_retries: int = 2
+    retry_backoff_seconds: float = 0.1
+    # The maximum number of ICAT sessions whose usernames are cached, for the lifetime of the session, so that they are
+    # not looked up on ICAT again. `0` disables the cache.
+    session_username_cache_size: int = 10000
 
     model_config = ConfigDict(hide_input_in_errors=True)
 
@@ -101,6 +201,7 @@ class Config(BaseSettings):
     authentication: AuthenticationConfig
     icat_server: ICATServerConfig
     maintenance: MaintenanceConfig
+    logging: LoggingConfig = LoggingConfig()
 
     model_config = SettingsConfigDict(
         env_file=Path(__file__).parent.parent / ".env",
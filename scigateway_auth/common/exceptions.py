@@ -15,12 +15,24 @@ class ICATAuthenticationError(Exception):
     """
 
 
+class ICATUnavailableError(Exception):
+    """
+    Exception raised when ICAT cannot be reached or is not taking any more requests.
+    """
+
+
 class InvalidJWTError(Exception):
     """
     Exception raised when invalid JWT token is provided.
     """
 
 
+class InvalidKeyMaterialError(Exception):
+    """
+    Exception raised when the private and public keys cannot be loaded or are not a valid key pair.
+    """
+
+
 class InvalidMaintenanceFileError(Exception):
     """
     Exception raised when the maintenance state file does not have the correct format or value types.
@@ -33,6 +45,12 @@ class JWTRefreshError(Exception):
     """
 
 
+class KeyRotationError(Exception):
+    """
+    Exception raised when the signing keys cannot be rotated.
+    """
+
+
 class MaintenanceFileReadError(Exception):
     """
     Exception raised when the maintenance state file's data cannot be read.
@@ -45,6 +63,18 @@ class MaintenanceFileWriteError(Exception):
     """
 
 
+class MaintenanceStreamLimitError(Exception):
+    """
+    Exception raised when the maximum number of maintenance state stream subscribers has been reached.
+    """
+
+
+class RevocationStoreError(Exception):
+    """
+    Exception raised when the token revocation store cannot be read or written.
+    """
+
+
 class UsernameMismatchError(Exception):
     """
     Exception raised when the usernames in the access and refresh tokens do not match.
@@ -1,16 +1,216 @@
 """
 Module for setting up and configuring the logging system.
+
+The handlers configured in the INI file are run on a background thread: each logger that has handlers is given a
+`QueueHandler` in their place, which puts the records on a queue that a `QueueListener` passes to the original handlers,
+so that requests do not wait for the records to be written. Every record is given the ID of the request it was logged
+during, and records below `WARNING` without exception information can be sampled per module.
 """
 
+import atexit
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import functools
+import json
 import logging
 import logging.config
+import logging.handlers
 from pathlib import Path
+import queue
+import random
+import re
+from typing import Optional
+import uuid
+import zlib
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from scigateway_auth.common.config import config
 
 LOGGING_CONFIG_FILE_PATH = Path(__file__).parent.parent / "logging.ini"
 
+# Request IDs provided by clients are only used if they match this pattern, to keep them safe to log
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,128}")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+PACKAGE_ROOT = Path(__file__).parent.parent.parent
+
 
 def setup_logger() -> None:
     """
-    Set up the logger using the configuration INI file.
+    Set up the logger using the configuration INI file, moving the configured handlers onto a background thread.
     """
     logging.config.fileConfig(LOGGING_CONFIG_FILE_PATH)
+
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+    # Loggers configured with the same handlers share a queue and listener
+    queue_handlers: dict[tuple[logging.Handler, ...], logging.Handler] = {}
+    for logger in loggers:
+        handlers = tuple(handler for handler in logger.handlers if not isinstance(handler, RecordQueueHandler))
+        if not handlers:
+            continue
+
+        if handlers not in queue_handlers:
+            record_queue = queue.SimpleQueue()
+            queue_handler = RecordQueueHandler(record_queue)
+            queue_handler.addFilter(RequestIDFilter())
+            queue_handler.addFilter(SamplingFilter(config.logging.sample_rates))
+            listener = logging.handlers.QueueListener(record_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            # Write out the records still on the queue when the process exits
+            atexit.register(listener.stop)
+            queue_handlers[handlers] = queue_handler
+
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handlers[handlers])
+
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler which keeps the formatted exception information separate from the message so that the handlers on
+    the other end of the queue can format it as they are configured to, e.g. as its own field in JSON.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Prepare a record to be put on the queue by merging its arguments into the message and formatting its exception
+        information, both of which may not be picklable or may change before the record is handled.
+
+        :param record: The record to prepare.
+        :return: A prepared copy of the record.
+        """
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.message = record.getMessage()
+        prepared.msg = prepared.message
+        prepared.args = None
+        if record.exc_info and not record.exc_text:
+            prepared.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        prepared.exc_info = None
+        return prepared
+
+
+class RequestIDFilter(logging.Filter):
+    """
+    Filter which adds the ID of the current request to records as `request_id`, or `-` if a record is logged outside of
+    a request.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: A003
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Filter which only lets through a fraction of the records below `WARNING` logged by a module, as given by the sample
+    rates indexed by the module's dotted name (e.g. `scigateway_auth.src.jwt_handler`). Records from modules without a
+    sample rate, records at `WARNING` or above and records with exception information are always let through.
+
+    Records logged during a request are sampled by its ID, so the records of a request are either all let through or
+    all dropped.
+    """
+
+    def __init__(self, sample_rates: dict[str, float]) -> None:
+        """
+        Initialise the filter.
+
+        :param sample_rates: The fraction of records to let through indexed by module name.
+        """
+        super().__init__()
+        self._sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: A003
+        if not self._sample_rates or record.levelno >= logging.WARNING or record.exc_info:
+            return True
+
+        sample_rate = self._sample_rates.get(_get_module_name(record.pathname))
+        if sample_rate is None:
+            return True
+
+        request_id = request_id_var.get()
+        if request_id is None:
+            return random.random() < sample_rate  # noqa: S311
+        return zlib.crc32(request_id.encode()) / 2**32 < sample_rate
+
+
+@functools.lru_cache(maxsize=None)
+def _get_module_name(pathname: str) -> str:
+    """
+    Return the dotted name of the module at the given path.
+
+    :param pathname: The path of the module's source file.
+    :return: The dotted name of the module, or its file name without the extension if it is outside the package.
+    """
+    path = Path(pathname)
+    try:
+        return ".".join(path.resolve().relative_to(PACKAGE_ROOT).with_suffix("").parts)
+    except ValueError:
+        return path.stem
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter which outputs each record as a single line JSON object. It can be used in the INI file with
+    `class=scigateway_auth.common.logger_setup.JSONFormatter`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:  # noqa: A003
+        document = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            document["exception"] = record.exc_text
+        return json.dumps(document, default=str)
+
+
+class RequestIDMiddleware:
+    """
+    ASGI middleware which sets the ID of the request being handled for the records logged while handling it, and returns
+    it in the `X-Request-ID` header of the response. The ID is taken from the `X-Request-ID` header of the request if it
+    is valid, so that a request can be correlated across services, and is generated otherwise.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                value = value.decode("latin-1")
+                if REQUEST_ID_PATTERN.fullmatch(value):
+                    request_id = value
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -2,7 +2,8 @@
 Model for defining the API schema models.
 """
 
-from typing import Optional
+from enum import Enum
+from typing import Any, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, SecretStr
 
@@ -42,3 +43,47 @@ class ScheduledMaintenanceStateSchema(MaintenanceStateSchema):
     """
 
     severity: str = Field(description="The severity of the maintenance")
+
+
+class TokenBatchVerifyPostRequestSchema(BaseModel):
+    """
+    Schema model for a batch token verification `POST` request.
+    """
+
+    tokens: list[str] = Field(description="The JWT tokens to verify")
+
+
+class TokenRevocationPostRequestSchema(BaseModel):
+    """
+    Schema model for a token revocation `POST` request.
+    """
+
+    token: str = Field(description="The JWT refresh token to revoke")
+
+
+class UserRevocationPostRequestSchema(BaseModel):
+    """
+    Schema model for a `POST` request revoking all of a user's tokens.
+    """
+
+    username: str = Field(description="The ICAT username of the user whose JWT refresh tokens to revoke")
+
+
+class TokenVerificationStatus(str, Enum):
+    """
+    Enumeration of the possible results of verifying a JWT token.
+    """
+
+    VALID = "valid"
+    EXPIRED = "expired"
+    BAD_SIGNATURE = "bad_signature"
+    MALFORMED = "malformed"
+
+
+class TokenVerificationResultSchema(BaseModel):
+    """
+    Schema model for the result of verifying a JWT token in a batch.
+    """
+
+    status: TokenVerificationStatus = Field(description="The result of verifying the token")
+    claims: Optional[dict[str, Any]] = Field(default=None, description="The claims of the token if it is valid")
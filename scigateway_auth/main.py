@@ -2,16 +2,37 @@
 Main module contains the API entrypoint.
 """
 
+from contextlib import asynccontextmanager
 import logging
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from scigateway_auth.common.logger_setup import setup_logger
-from scigateway_auth.routers import authentication, maintenance
+from scigateway_auth.common.config import config
+from scigateway_auth.common.logger_setup import RequestIDMiddleware, setup_logger
+from scigateway_auth.routers import authentication, keys, maintenance, metrics, revocation
+from scigateway_auth.src.batch_verification import batch_token_verifier
+from scigateway_auth.src.icat_client import icat_client
+from scigateway_auth.src.metrics import mark_process_dead, MetricsMiddleware
+from scigateway_auth.src.resilience import DeadlineMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Lifespan handler for FastAPI which closes the shared connections to ICAT, stops the batch token verification
+    worker processes and removes the live metrics of the worker process when the application shuts down.
+
+    :param _: Unused
+    """
+    yield
+    await icat_client.close()
+    batch_token_verifier.close()
+    mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
 
 setup_logger()
 logger = logging.getLogger()
@@ -43,5 +64,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(DeadlineMiddleware, deadline_seconds=config.api.request_deadline_seconds)
+app.add_middleware(RequestIDMiddleware)
+# Added last so that it is the outermost middleware and measures the time spent in the other middleware as well
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(authentication.router)
+app.include_router(keys.router)
 app.include_router(maintenance.router)
+app.include_router(metrics.router)
+app.include_router(revocation.router)
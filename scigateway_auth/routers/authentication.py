@@ -3,9 +3,10 @@ Module for providing an API router which defines the authentication routes.
 """
 
 import logging
-from typing import Annotated
+from typing import Annotated, NoReturn, Optional
 
-from fastapi import APIRouter, Body, Cookie, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Body, Cookie, Depends, Header, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
@@ -13,14 +14,20 @@ from scigateway_auth.common.config import config
 from scigateway_auth.common.exceptions import (
     BlacklistedJWTError,
     ICATAuthenticationError,
+    ICATUnavailableError,
     InvalidJWTError,
     JWTRefreshError,
     OidcProviderNotFoundError,
     UsernameMismatchError,
 )
-from scigateway_auth.common.schemas import LoginDetailsPostRequestSchema
+from scigateway_auth.common.schemas import (
+    LoginDetailsPostRequestSchema,
+    TokenBatchVerifyPostRequestSchema,
+    TokenVerificationResultSchema,
+)
 from scigateway_auth.src import oidc
 from scigateway_auth.src.authentication import ICATAuthenticator
+from scigateway_auth.src.batch_verification import batch_token_verifier
 from scigateway_auth.src.jwt_handler import JWTHandler
 
 logger = logging.getLogger()
@@ -29,29 +36,76 @@ router = APIRouter(tags=["authentication"])
 
 JWTHandlerDep = Annotated[JWTHandler, Depends(JWTHandler)]
 
+IfNoneMatchHeader = Annotated[Optional[str], Header(description="Entity tags of the authenticators held by the client")]
+
+
+def _raise_icat_unavailable(exc: ICATUnavailableError) -> NoReturn:
+    """
+    Raise the HTTP exception returned when ICAT is unavailable, which tells the client to try again later.
+
+    :param exc: The exception raised because ICAT is unavailable.
+    :raises HTTPException: Always, with `503 Service Unavailable`.
+    """
+    logger.warning("ICAT is unavailable: %s", exc)
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="ICAT is unavailable, please try again later",
+        headers={"Retry-After": str(int(config.icat_server.circuit_breaker_open_seconds))},
+    ) from exc
+
+
+def _set_refresh_token_cookie(response: Response, refresh_token: str) -> None:
+    """
+    Set the JWT refresh token as an HTTP-only cookie which is only sent to the `/refresh` route.
+
+    :param response: The response to set the cookie on.
+    :param refresh_token: The JWT refresh token.
+    """
+    response.set_cookie(
+        key="scigateway:refresh_token",
+        value=refresh_token,
+        max_age=config.authentication.refresh_token_validity_days * 24 * 60 * 60,
+        secure=True,
+        httponly=True,
+        samesite="lax",
+        path=f"{config.api.root_path}/refresh",
+    )
+
 
 @router.get(
     path="/authenticators",
     summary="Get a list of valid ICAT authenticators",
-    response_description="Returns a list of valid ICAT authenticators",
+    response_description="Returns a list of valid ICAT authenticators, or 304 status code if the client's is current",
 )
-def get_authenticators():
+async def get_authenticators(if_none_match: IfNoneMatchHeader = None) -> Response:
     logger.info("Getting a list of valid ICAT authenticators")
     try:
-        return ICATAuthenticator.get_authenticators()
-    except KeyError as exc:
+        catalogue = await ICATAuthenticator.get_authenticator_catalogue()
+    except ICATUnavailableError as exc:
+        _raise_icat_unavailable(exc)
+    except ICATAuthenticationError as exc:
+        logger.exception(exc.args)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve authenticators",
         ) from exc
 
+    # Clients have to revalidate their copy, which is cheap with the entity tag
+    headers = {"ETag": catalogue.etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None:
+        # `If-None-Match` uses weak comparison as described in RFC 9110 section 13.1.2
+        entity_tags = [entity_tag.strip().removeprefix("W/") for entity_tag in if_none_match.split(",")]
+        if "*" in entity_tags or catalogue.etag in entity_tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=catalogue.content, media_type="application/json", headers=headers)
+
 
 @router.get(
     path="/oidc_providers",
     summary="Get a list of OIDC providers",
     response_description="Returns a list of OIDC providers",
 )
-def get_oidc_providers() -> JSONResponse:
+async def get_oidc_providers() -> JSONResponse:
     logger.info("Getting a list of OIDC providers")
 
     providers = {}
@@ -72,7 +126,7 @@ def get_oidc_providers() -> JSONResponse:
     summary="Login with ICAT mnemonic and credentials",
     response_description="A JWT access token including a refresh token as an HTTP-only cookie",
 )
-def login(
+async def login(
     jwt_handler: JWTHandlerDep,
     login_details: Annotated[
         LoginDetailsPostRequestSchema,
@@ -90,25 +144,20 @@ def login(
         }
 
     try:
-        icat_session_id = ICATAuthenticator.authenticate(login_details.mnemonic, credentials)
-        icat_username = ICATAuthenticator.get_username(icat_session_id)
+        icat_session_id = await ICATAuthenticator.authenticate(login_details.mnemonic, credentials)
+        icat_username = await ICATAuthenticator.get_username(icat_session_id)
+    except ICATUnavailableError as exc:
+        _raise_icat_unavailable(exc)
     except ICATAuthenticationError as exc:
         logger.exception(exc.args)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
 
-    access_token = jwt_handler.get_access_token(icat_session_id, icat_username)
-    refresh_token = jwt_handler.get_refresh_token(icat_username)
+    # Signing the tokens is CPU bound so it is run in the threadpool to avoid blocking the event loop
+    access_token = await run_in_threadpool(jwt_handler.get_access_token, icat_session_id, icat_username)
+    refresh_token = await run_in_threadpool(jwt_handler.get_refresh_token, icat_username)
 
     response = JSONResponse(content=access_token)
-    response.set_cookie(
-        key="scigateway:refresh_token",
-        value=refresh_token,
-        max_age=config.authentication.refresh_token_validity_days * 24 * 60 * 60,
-        secure=True,
-        httponly=True,
-        samesite="lax",
-        path=f"{config.api.root_path}/refresh",
-    )
+    _set_refresh_token_cookie(response, refresh_token)
     return response
 
 
@@ -117,14 +166,15 @@ def login(
     summary="Get an OIDC id_token",
     response_description="OIDC token endpoint response",
 )
-def oidc_token(
+async def oidc_token(
     provider_id: Annotated[str, "OIDC provider id"],
     code: Annotated[str, Body(description="OIDC authorization code")],
 ) -> JSONResponse:
     logger.info("Obtaining an id_token")
 
     try:
-        token_response = oidc.get_token(provider_id, code)
+        # The OIDC module uses blocking requests so it is run in the threadpool to avoid blocking the event loop
+        token_response = await run_in_threadpool(oidc.get_token, provider_id, code)
     except OidcProviderNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -139,7 +189,7 @@ def oidc_token(
     summary="Login with an OIDC id token",
     response_description="A JWT access token including a refresh token as an HTTP-only cookie",
 )
-def oidc_login(
+async def oidc_login(
     jwt_handler: JWTHandlerDep,
     provider_id: Annotated[str, "The OIDC provider id"],
     bearer_token: Annotated[HTTPAuthorizationCredentials, Depends(HTTPBearer(description="OIDC id token"))],
@@ -149,7 +199,7 @@ def oidc_login(
     id_token = bearer_token.credentials
 
     try:
-        mechanism, oidc_username = oidc.get_username(provider_id, id_token)
+        mechanism, oidc_username = await run_in_threadpool(oidc.get_username, provider_id, id_token)
     except OidcProviderNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -166,34 +216,32 @@ def oidc_login(
     }
 
     try:
-        icat_session_id = ICATAuthenticator.authenticate(config.authentication.oidc_icat_authenticator, credentials)
-        icat_username = ICATAuthenticator.get_username(icat_session_id)
+        icat_session_id = await ICATAuthenticator.authenticate(
+            config.authentication.oidc_icat_authenticator,
+            credentials,
+        )
+        icat_username = await ICATAuthenticator.get_username(icat_session_id)
+    except ICATUnavailableError as exc:
+        _raise_icat_unavailable(exc)
     except ICATAuthenticationError as exc:
         logger.exception(exc.args)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
 
-    access_token = jwt_handler.get_access_token(icat_session_id, icat_username)
-    refresh_token = jwt_handler.get_refresh_token(icat_username)
+    # Signing the tokens is CPU bound so it is run in the threadpool to avoid blocking the event loop
+    access_token = await run_in_threadpool(jwt_handler.get_access_token, icat_session_id, icat_username)
+    refresh_token = await run_in_threadpool(jwt_handler.get_refresh_token, icat_username)
 
     response = JSONResponse(content=access_token)
-    response.set_cookie(
-        key="scigateway:refresh_token",
-        value=refresh_token,
-        max_age=config.authentication.refresh_token_validity_days * 24 * 60 * 60,
-        secure=True,
-        httponly=True,
-        samesite="lax",
-        path=f"{config.api.root_path}/refresh",
-    )
+    _set_refresh_token_cookie(response, refresh_token)
     return response
 
 
 @router.post(
     path="/refresh",
     summary="Generate an updated JWT access token using the JWT refresh token",
-    response_description="A JWT access token",
+    response_description="A JWT access token including the rotated refresh token as an HTTP-only cookie",
 )
-def refresh_access_token(
+async def refresh_access_token(
     jwt_handler: JWTHandlerDep,
     token: Annotated[str, Body(description="The JWT access token to refresh", embed=True)],
     refresh_token: Annotated[
@@ -206,8 +254,12 @@ def refresh_access_token(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No JWT refresh token found")
 
     try:
-        access_token = jwt_handler.refresh_access_token(token, refresh_token)
-        return JSONResponse(content=access_token)
+        access_token, rotated_refresh_token = await jwt_handler.refresh_access_token(token, refresh_token)
+        response = JSONResponse(content=access_token)
+        _set_refresh_token_cookie(response, rotated_refresh_token)
+        return response
+    except ICATUnavailableError as exc:
+        _raise_icat_unavailable(exc)
     except (BlacklistedJWTError, InvalidJWTError, JWTRefreshError, UsernameMismatchError) as exc:
         message = "Unable to refresh access token"
         logger.exception(message)
@@ -223,7 +275,7 @@ def verify_token(
     jwt_handler: JWTHandlerDep,
     token: Annotated[str, Body(description="The JWT token to verify", embed=True)],
 ) -> Response:
-    logger.info("Verifying a JWT token")
+    logger.debug("Verifying a JWT token")
     try:
         jwt_handler.verify_token(token)
         return Response(status_code=status.HTTP_200_OK)
@@ -231,3 +283,22 @@ def verify_token(
         message = "Invalid JWT token provided"
         logger.exception(message)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=message) from exc
+
+
+@router.post(
+    path="/verify/batch",
+    summary="Verify a batch of JWT tokens",
+    response_description="The result of verifying each token, in the same order as the tokens",
+)
+async def verify_tokens(
+    batch: Annotated[TokenBatchVerifyPostRequestSchema, Body(description="The JWT tokens to verify")],
+) -> list[TokenVerificationResultSchema]:
+    logger.info("Verifying a batch of JWT tokens")
+    if len(batch.tokens) > config.authentication.batch_verify_max_tokens:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch cannot contain more than {config.authentication.batch_verify_max_tokens} tokens",
+        )
+
+    # Verifying a large batch is CPU bound so it is run in the threadpool to avoid blocking the event loop
+    return await run_in_threadpool(batch_token_verifier.verify, batch.tokens)
@@ -0,0 +1,66 @@
+"""
+Module for providing an API router which defines the routes publishing the public keys that JWTs are verified with, so
+that other services can verify tokens themselves instead of calling `/verify`, and the route for rotating the keys.
+"""
+
+import logging
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from scigateway_auth.common.config import config
+from scigateway_auth.common.exceptions import InvalidJWTError, KeyRotationError, UserNotAdminError
+from scigateway_auth.src.jwt_handler import JWTHandler
+from scigateway_auth.src.key_material import key_material
+
+logger = logging.getLogger()
+
+router = APIRouter(tags=["keys"])
+
+IfNoneMatchHeader = Annotated[Optional[str], Header(description="Entity tags of the JWK Set held by the client")]
+
+
+@router.get(
+    path="/.well-known/jwks.json",
+    summary="Get the JWK Set of the public keys that JWTs are signed with",
+    response_description="Returns the JWK Set, or 304 status code (no response body) if the client's copy is current",
+)
+async def get_jwks(if_none_match: IfNoneMatchHeader = None) -> Response:
+    logger.debug("Getting the JWK Set")
+    keys = key_material.get()
+    headers = {"ETag": keys.jwks_etag, "Cache-Control": config.authentication.jwks_cache_control}
+    if if_none_match is not None:
+        # `If-None-Match` uses weak comparison as described in RFC 9110 section 13.1.2
+        entity_tags = [entity_tag.strip().removeprefix("W/") for entity_tag in if_none_match.split(",")]
+        if "*" in entity_tags or keys.jwks_etag in entity_tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=keys.jwks, media_type="application/jwk-set+json", headers=headers)
+
+
+@router.post(
+    path="/keys/rotate",
+    summary="Rotate the keys that JWTs are signed with",
+    response_description="The ID of the new signing key",
+)
+def rotate_keys(
+    bearer_token: Annotated[HTTPAuthorizationCredentials, Depends(HTTPBearer(description="Access token"))],
+) -> JSONResponse:
+    logger.info("Rotating the signing keys")
+    try:
+        payload = JWTHandler().verify_token(bearer_token.credentials)
+        if not payload.get("userIsAdmin"):
+            raise UserNotAdminError("Key rotation attempted by non-admin user")
+        signing_key = key_material.rotate()
+    except (InvalidJWTError, UserNotAdminError) as exc:
+        message = "Unable to rotate keys"
+        logger.exception(message)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=message) from exc
+    except KeyRotationError as exc:
+        logger.exception("Failed to rotate keys")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to rotate keys",
+        ) from exc
+    return JSONResponse(content={"kid": signing_key.kid})
@@ -2,23 +2,31 @@
 Module for providing an API router which defines the maintenance routes.
 """
 
+from email.utils import format_datetime, parsedate_to_datetime
 import logging
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from scigateway_auth.common.config import config
 from scigateway_auth.common.exceptions import (
     InvalidJWTError,
     InvalidMaintenanceFileError,
     MaintenanceFileReadError,
     MaintenanceFileWriteError,
+    MaintenanceStreamLimitError,
     UserNotAdminError,
 )
 from scigateway_auth.common.schemas import MaintenanceStateSchema, ScheduledMaintenanceStateSchema
 from scigateway_auth.src.jwt_handler import JWTHandler
-from scigateway_auth.src.maintenance import MaintenanceMode, ScheduledMaintenanceMode
+from scigateway_auth.src.maintenance import CachedMaintenanceState, MaintenanceMode, ScheduledMaintenanceMode
+from scigateway_auth.src.maintenance_stream import (
+    maintenance_broadcaster,
+    MaintenanceStateBroadcaster,
+    scheduled_maintenance_broadcaster,
+)
 
 logger = logging.getLogger()
 
@@ -28,6 +36,10 @@ MaintenanceModeDep = Annotated[MaintenanceMode, Depends(MaintenanceMode)]
 
 ScheduledMaintenanceModeDep = Annotated[ScheduledMaintenanceMode, Depends(ScheduledMaintenanceMode)]
 
+IfNoneMatchHeader = Annotated[Optional[str], Header(description="Entity tags of the state held by the client")]
+
+IfModifiedSinceHeader = Annotated[Optional[str], Header(description="Last-Modified date of the client's state")]
+
 
 def _verify_user_is_admin(access_token: str) -> None:
     """
@@ -41,15 +53,97 @@ def _verify_user_is_admin(access_token: str) -> None:
         raise UserNotAdminError("Maintenance state update attempted by non-admin user")
 
 
+def _is_not_modified(
+    cached_state: CachedMaintenanceState,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> bool:
+    """
+    Evaluate the conditional request headers against the maintenance state as described in RFC 9110 section 13.2.2.
+
+    :param cached_state: The maintenance state held in memory.
+    :param if_none_match: The value of the `If-None-Match` header.
+    :param if_modified_since: The value of the `If-Modified-Since` header.
+    :return: `True` if the client's copy of the maintenance state is current, `False` otherwise.
+    """
+    if if_none_match is not None:
+        # `If-None-Match` uses weak comparison and takes precedence over `If-Modified-Since`
+        entity_tags = [entity_tag.strip().removeprefix("W/") for entity_tag in if_none_match.split(",")]
+        return "*" in entity_tags or cached_state.etag in entity_tags
+
+    if if_modified_since is not None:
+        try:
+            return cached_state.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            # Invalid dates must be ignored
+            return False
+
+    return False
+
+
+def _create_maintenance_state_response(
+    cached_state: CachedMaintenanceState,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> Response:
+    """
+    Create the response for a maintenance state, which is `304 Not Modified` if the client's copy is current.
+
+    :param cached_state: The maintenance state held in memory.
+    :param if_none_match: The value of the `If-None-Match` header.
+    :param if_modified_since: The value of the `If-Modified-Since` header.
+    :return: The response containing the serialised maintenance state or the `304 Not Modified` response.
+    """
+    headers = {
+        "ETag": cached_state.etag,
+        "Last-Modified": format_datetime(cached_state.last_modified, usegmt=True),
+        "Cache-Control": config.maintenance.cache_control,
+    }
+    if _is_not_modified(cached_state, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached_state.content, media_type="application/json", headers=headers)
+
+
+def _create_stream_response(broadcaster: MaintenanceStateBroadcaster) -> StreamingResponse:
+    """
+    Create the response which streams the events of a maintenance state broadcaster.
+
+    :param broadcaster: The broadcaster to subscribe to.
+    :raises HTTPException: If the maximum number of subscribers has been reached.
+    :return: The response streaming the server-sent events.
+    """
+    try:
+        stream = broadcaster.stream()
+    except MaintenanceStreamLimitError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": str(int(config.maintenance.stream_heartbeat_seconds))},
+        ) from exc
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        # Stop proxies such as nginx from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     path="/maintenance",
     summary="Get the maintenance state",
     response_description="Returns the maintenance state",
+    response_model=MaintenanceStateSchema,
 )
-def get_maintenance_state(maintenance_mode: MaintenanceModeDep) -> MaintenanceStateSchema:
+def get_maintenance_state(
+    maintenance_mode: MaintenanceModeDep,
+    if_none_match: IfNoneMatchHeader = None,
+    if_modified_since: IfModifiedSinceHeader = None,
+) -> Response:
     logger.info("Getting maintenance state")
     try:
-        return maintenance_mode.get_maintenance_state()
+        cached_state = maintenance_mode.get_cached_maintenance_state()
+        return _create_maintenance_state_response(cached_state, if_none_match, if_modified_since)
     except (InvalidMaintenanceFileError, MaintenanceFileReadError) as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -57,6 +151,18 @@ def get_maintenance_state(maintenance_mode: MaintenanceModeDep) -> MaintenanceSt
         ) from exc
 
 
+@router.get(
+    path="/maintenance/stream",
+    summary="Stream the maintenance state",
+    response_description="Server-sent events containing the maintenance state, sent when it is first requested and "
+    "then whenever it changes",
+    response_class=StreamingResponse,
+)
+async def stream_maintenance_state() -> StreamingResponse:
+    logger.info("Streaming maintenance state")
+    return _create_stream_response(maintenance_broadcaster)
+
+
 @router.put(
     path="/maintenance",
     summary="Update the maintenance state",
@@ -71,6 +177,7 @@ def update_maintenance_state(
     try:
         _verify_user_is_admin(bearer_token.credentials)
         maintenance_mode.update_maintenance_state(maintenance)
+        maintenance_broadcaster.notify()
         return JSONResponse(status_code=status.HTTP_200_OK, content="Maintenance state successfully updated")
     except (InvalidJWTError, UserNotAdminError) as exc:
         message = "Unable to update maintenance state"
@@ -87,13 +194,17 @@ def update_maintenance_state(
     path="/scheduled_maintenance",
     summary="Get the scheduled maintenance state",
     response_description="Returns the scheduled maintenance state",
+    response_model=ScheduledMaintenanceStateSchema,
 )
 def get_scheduled_maintenance_state(
     scheduled_maintenance_mode: ScheduledMaintenanceModeDep,
-) -> ScheduledMaintenanceStateSchema:
+    if_none_match: IfNoneMatchHeader = None,
+    if_modified_since: IfModifiedSinceHeader = None,
+) -> Response:
     logger.info("Getting scheduled maintenance state")
     try:
-        return scheduled_maintenance_mode.get_maintenance_state()
+        cached_state = scheduled_maintenance_mode.get_cached_maintenance_state()
+        return _create_maintenance_state_response(cached_state, if_none_match, if_modified_since)
     except (InvalidMaintenanceFileError, MaintenanceFileReadError) as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -101,6 +212,18 @@ def get_scheduled_maintenance_state(
         ) from exc
 
 
+@router.get(
+    path="/scheduled_maintenance/stream",
+    summary="Stream the scheduled maintenance state",
+    response_description="Server-sent events containing the scheduled maintenance state, sent when it is first "
+    "requested and then whenever it changes",
+    response_class=StreamingResponse,
+)
+async def stream_scheduled_maintenance_state() -> StreamingResponse:
+    logger.info("Streaming scheduled maintenance state")
+    return _create_stream_response(scheduled_maintenance_broadcaster)
+
+
 @router.put(
     path="/scheduled_maintenance",
     summary="Update the scheduled maintenance state",
@@ -115,6 +238,7 @@ def update_scheduled_maintenance_state(
     try:
         _verify_user_is_admin(bearer_token.credentials)
         scheduled_maintenance_mode.update_maintenance_state(scheduled_maintenance)
+        scheduled_maintenance_broadcaster.notify()
         return JSONResponse(status_code=status.HTTP_200_OK, content="Scheduled maintenance state successfully updated")
     except (InvalidJWTError, UserNotAdminError) as exc:
         message = "Unable to update scheduled maintenance state"
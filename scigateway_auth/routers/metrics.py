@@ -0,0 +1,25 @@
+"""
+Module for providing an API router which defines the route for scraping the Prometheus metrics.
+"""
+
+import logging
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from scigateway_auth.src.metrics import generate_metrics
+
+logger = logging.getLogger()
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    path="/metrics",
+    summary="Get the Prometheus metrics",
+    response_description="The metrics in the Prometheus text format",
+    include_in_schema=False,
+)
+def get_metrics() -> Response:
+    logger.debug("Getting the Prometheus metrics")
+    return Response(content=generate_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,88 @@
+"""
+Module for providing an API router which defines the routes for revoking JWT refresh tokens.
+"""
+
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from scigateway_auth.common.exceptions import InvalidJWTError, RevocationStoreError, UserNotAdminError
+from scigateway_auth.common.schemas import TokenRevocationPostRequestSchema, UserRevocationPostRequestSchema
+from scigateway_auth.src.jwt_handler import JWTHandler
+
+logger = logging.getLogger()
+
+router = APIRouter(prefix="/revocations", tags=["revocation"])
+
+JWTHandlerDep = Annotated[JWTHandler, Depends(JWTHandler)]
+
+BearerTokenDep = Annotated[HTTPAuthorizationCredentials, Depends(HTTPBearer(description="Access token"))]
+
+
+def _verify_user_is_admin(jwt_handler: JWTHandler, access_token: str) -> None:
+    """
+    Verify the user's JWT access token is valid and ensure they are an admin.
+
+    :param jwt_handler: The JWT handler to verify the access token with.
+    :param access_token: The user's JWT access token.
+    :raises HTTPException: If the access token is invalid or the user is not an admin.
+    """
+    try:
+        payload = jwt_handler.verify_token(access_token)
+        if not payload.get("userIsAdmin"):
+            raise UserNotAdminError("Token revocation attempted by non-admin user")
+    except (InvalidJWTError, UserNotAdminError) as exc:
+        message = "Unable to revoke tokens"
+        logger.exception(message)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=message) from exc
+
+
+@router.post(
+    path="/token",
+    summary="Revoke a JWT refresh token",
+    response_description="200 status code if the JWT refresh token was successfully revoked",
+)
+def revoke_token(
+    jwt_handler: JWTHandlerDep,
+    revocation: TokenRevocationPostRequestSchema,
+    bearer_token: BearerTokenDep,
+) -> JSONResponse:
+    logger.info("Revoking a JWT refresh token")
+    _verify_user_is_admin(jwt_handler, bearer_token.credentials)
+    try:
+        jwt_handler.revoke_refresh_token(revocation.token)
+    except InvalidJWTError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JWT refresh token") from exc
+    except RevocationStoreError as exc:
+        logger.exception("Failed to revoke JWT refresh token")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to revoke JWT refresh token",
+        ) from exc
+    return JSONResponse(content="JWT refresh token successfully revoked")
+
+
+@router.post(
+    path="/user",
+    summary="Revoke all the JWT refresh tokens issued to a user",
+    response_description="200 status code if the user's JWT refresh tokens were successfully revoked",
+)
+def revoke_user_tokens(
+    jwt_handler: JWTHandlerDep,
+    revocation: UserRevocationPostRequestSchema,
+    bearer_token: BearerTokenDep,
+) -> JSONResponse:
+    logger.info("Revoking all the JWT refresh tokens of a user")
+    _verify_user_is_admin(jwt_handler, bearer_token.credentials)
+    try:
+        jwt_handler.revoke_user_refresh_tokens(revocation.username)
+    except RevocationStoreError as exc:
+        logger.exception("Failed to revoke the user's JWT refresh tokens")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to revoke the user's JWT refresh tokens",
+        ) from exc
+    return JSONResponse(content="User's JWT refresh tokens successfully revoked")
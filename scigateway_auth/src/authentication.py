@@ -2,32 +2,52 @@
 Module for providing a class for handling authentication.
 """
 
+from dataclasses import dataclass
+import hashlib
 import json
 import logging
 from typing import Any
 
-import requests
+import httpx
 
 from scigateway_auth.common.config import config
 from scigateway_auth.common.exceptions import ICATAuthenticationError
+from scigateway_auth.src.icat_client import icat_client
+from scigateway_auth.src.metrics import observe_upstream_request
+from scigateway_auth.src.session_cache import session_username_cache
+from scigateway_auth.src.single_flight_cache import async_single_flight_ttl_cache
 
 logger = logging.getLogger()
 
 
+@dataclass(frozen=True)
+class AuthenticatorCatalogue:
+    """
+    The list of ICAT authenticators together with its serialised form.
+    """
+
+    authenticators: list[dict[str, Any]]
+    # The list serialised as JSON ready to be returned in a response
+    content: bytes
+    # A strong entity tag derived from the serialised list
+    etag: str
+
+
 class ICATAuthenticator:
     """
     Class for managing authentication against an ICAT authenticator.
     """
 
     @staticmethod
-    def authenticate(mnemonic: str, credentials: dict[str, str] | None = None) -> str:
+    async def authenticate(mnemonic: str, credentials: dict[str, str] | None = None) -> str:
         """
         Sends an authentication request to the ICAT authenticator and returns a session ID.
 
         :param mnemonic: The ICAT mnemonic to use to authenticate.
-        :param credentials: The ICAT credentials to authenticate with.
+        :param credentials: The ICAT credentials to authenticate with, or `None` to authenticate anonymously.
         :raises ICATAuthenticationError: If there is a problem with the ICAT authenticator or the login details are
             invalid.
+        :raises ICATUnavailableError: If ICAT is unavailable.
         :return: The ICAT session ID.
         """
         logger.info("Authenticating at %s with mnemonic: %s", config.icat_server.url, mnemonic)
@@ -42,67 +62,97 @@ class ICATAuthenticator:
 
         data = {"json": json.dumps(json_payload)}
 
-        response = requests.post(
-            f"{config.icat_server.url}/session",
-            data=data,
-            verify=config.icat_server.certificate_validation,
-            timeout=config.icat_server.request_timeout_seconds,
-        )
+        with observe_upstream_request("icat", "authenticate"):
+            response = await icat_client.request("POST", "/session", data=data)
         if response.status_code == 200:
             return response.json()["sessionId"]
         else:
             raise ICATAuthenticationError(response.json()["message"])
 
     @staticmethod
-    def get_username(session_id: str) -> str:
+    async def get_username(session_id: str) -> str:
         """
-        Sends a request to ICAT to retrieve the user's username from a session ID.
+        Sends a request to ICAT to retrieve the user's username from a session ID. The username is cached for the
+        lifetime of the session, so the request is only sent the first time the username of a session is retrieved.
 
         :param session_id: The session ID of the user who we want to get the username for.
         :raises ICATAuthenticationError: If there is a problem with the ICAT authenticator or the session ID is invalid.
+        :raises ICATUnavailableError: If ICAT is unavailable.
         :return: The user's ICAT username.
         """
+        username = session_username_cache.get(session_id)
+        if username is not None:
+            return username
+
         logger.info("Retrieving username for session ID '%s' at %s", session_id, config.icat_server.url)
-        response = requests.get(
-            f"{config.icat_server.url}/session/{session_id}",
-            verify=config.icat_server.certificate_validation,
-            timeout=config.icat_server.request_timeout_seconds,
-        )
+        with observe_upstream_request("icat", "get_username"):
+            response = await icat_client.request("GET", f"/session/{session_id}")
         if response.status_code == 200:
-            return response.json()["userName"]
+            username = response.json()["userName"]
+            session_username_cache.put(session_id, username)
+            return username
         else:
             raise ICATAuthenticationError(response.json()["message"])
 
     @staticmethod
-    def get_authenticators() -> list[dict[str, Any]]:
+    async def get_authenticators() -> list[dict[str, Any]]:
         """
         Sends a request to ICAT to get the properties and parses the response to a list of authenticators.
 
+        :raises ICATAuthenticationError: If the request fails or the response does not list the authenticators.
+        :raises ICATUnavailableError: If ICAT is unavailable.
         :return: The list of ICAT authenticator mnemonics and their friendly names.
         """
         logger.info("Querying ICAT at %s to get its list of mnemonics", config.icat_server.url)
-        response = requests.get(
-            f"{config.icat_server.url}/properties",
-            verify=config.icat_server.certificate_validation,
-            timeout=config.icat_server.request_timeout_seconds,
+        try:
+            with observe_upstream_request("icat", "get_authenticators"):
+                response = await icat_client.request("GET", "/properties")
+            properties = response.json()
+            return properties["authenticators"]
+        except (httpx.HTTPError, KeyError, TypeError, ValueError) as exc:
+            raise ICATAuthenticationError("Failed to retrieve authenticators") from exc
+
+    @staticmethod
+    @async_single_flight_ttl_cache(
+        ttl_seconds=config.icat_server.authenticators_cache_ttl_seconds,
+        refresh_ahead_seconds=config.icat_server.authenticators_cache_ttl_seconds / 5,
+        stale_seconds=config.icat_server.authenticators_cache_stale_seconds,
+    )
+    async def get_authenticator_catalogue() -> AuthenticatorCatalogue:
+        """
+        Get the list of ICAT authenticators together with its serialised form. The list is cached for
+        `authenticators_cache_ttl_seconds`, refreshed in the background before it expires, and the previous list is used
+        for up to `authenticators_cache_stale_seconds` if refreshing it fails.
+
+        :raises ICATAuthenticationError: If the request fails or the response does not list the authenticators.
+        :raises ICATUnavailableError: If ICAT is unavailable.
+        :return: The list of ICAT authenticators together with its serialised form.
+        """
+        authenticators = await ICATAuthenticator.get_authenticators()
+        content = json.dumps(authenticators, separators=(",", ":")).encode()
+        return AuthenticatorCatalogue(
+            authenticators=authenticators,
+            content=content,
+            etag='"' + hashlib.sha256(content).hexdigest() + '"',
         )
-        properties = response.json()
-        return properties["authenticators"]
 
     @staticmethod
-    def refresh(session_id: str) -> None:
+    @async_single_flight_ttl_cache(ttl_seconds=config.icat_server.session_refresh_coalesce_seconds)
+    async def refresh(session_id: str) -> None:
         """
-        Sends a request to ICAT to refresh a session ID.
+        Sends a request to ICAT to refresh a session ID. Concurrent refreshes of the same session ID share one request,
+        and a successful refresh is reused for `session_refresh_coalesce_seconds`. The cached username of the session
+        is kept for as long as the refreshed session lasts, or removed if the session cannot be refreshed.
 
         :param session_id: The session ID to refresh.
         :raises ICATAuthenticationError: If there is a problem with the ICAT authenticator or the session ID cannot be
             refreshed.
+        :raises ICATUnavailableError: If ICAT is unavailable.
         """
         logger.info("Refreshing session ID %s at %s", session_id, config.icat_server.url)
-        response = requests.put(
-            f"{config.icat_server.url}/session/{session_id}",
-            verify=config.icat_server.certificate_validation,
-            timeout=config.icat_server.request_timeout_seconds,
-        )
+        with observe_upstream_request("icat", "refresh"):
+            response = await icat_client.request("PUT", f"/session/{session_id}")
         if response.status_code != 204:
+            session_username_cache.invalidate(session_id)
             raise ICATAuthenticationError("The session ID was unable to be refreshed")
+        session_username_cache.extend(session_id)
@@ -0,0 +1,114 @@
+"""
+Module for providing a class for verifying batches of JWTs.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from typing import Any, Iterator, Optional
+
+from scigateway_auth.common.config import config
+from scigateway_auth.common.schemas import TokenVerificationResultSchema, TokenVerificationStatus
+from scigateway_auth.src.batch_verification_worker import classify_token, initialise_worker, verify_tokens
+from scigateway_auth.src.jwt_handler import JWTHandler
+from scigateway_auth.src.key_material import key_material, LoadedKeys
+
+logger = logging.getLogger()
+
+
+class BatchTokenVerifier:
+    """
+    Class for verifying batches of JWTs.
+
+    Small batches are verified in the calling thread, using the verified token cache. Batches of at least
+    `batch_verify_parallel_threshold` tokens are split into chunks which are verified in parallel by a pool of worker
+    processes, so that the signature checks are spread across the available cores. The workers are given the keys of
+    this process when they start, and are replaced when the keys change.
+    """
+
+    def __init__(self, processes: Optional[int], parallel_threshold: int) -> None:
+        """
+        Initialise the batch token verifier.
+
+        :param processes: The number of worker processes to verify large batches with. `None` uses the number of CPUs.
+        :param parallel_threshold: The minimum number of tokens in a batch for it to be verified in parallel.
+        """
+        self._processes = processes or os.cpu_count() or 1
+        self._parallel_threshold = parallel_threshold
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # The version of the keys the worker processes of the pool were given
+        self._pool_key_version: Optional[int] = None
+
+    def verify(self, tokens: list[str]) -> list[TokenVerificationResultSchema]:
+        """
+        Verify a batch of JWTs.
+
+        :param tokens: The JWT tokens to verify.
+        :return: The result of verifying each token, in the same order as the tokens.
+        """
+        logger.info("Verifying a batch of %s JWT tokens", len(tokens))
+        if self._processes < 2 or len(tokens) < self._parallel_threshold:
+            results = [classify_token(JWTHandler.get_verified_payload, token) for token in tokens]
+        else:
+            chunk_size = math.ceil(len(tokens) / self._processes)
+            chunks = [tokens[index : index + chunk_size] for index in range(0, len(tokens), chunk_size)]  # noqa: E203
+            results = [
+                result for chunk_results in self._verify_in_pool(key_material.get(), chunks) for result in chunk_results
+            ]
+
+        return [TokenVerificationResultSchema(status=status, claims=claims) for status, claims in results]
+
+    def close(self) -> None:
+        """
+        Shut down the pool of worker processes if it has been started.
+        """
+        with self._lock:
+            if self._pool is not None:
+                logger.info("Shutting down the batch token verification worker processes")
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def _verify_in_pool(
+        self,
+        keys: LoadedKeys,
+        chunks: list[list[str]],
+    ) -> Iterator[list[tuple[TokenVerificationStatus, Optional[dict[str, Any]]]]]:
+        """
+        Submit the chunks of tokens to the pool of worker processes, starting the pool if it has not been started yet or
+        replacing it if it was started with a previous version of the keys.
+
+        The chunks are submitted while holding the lock so that the pool cannot be replaced, and so shut down, before
+        they have been submitted. A pool which is shut down without waiting still verifies the chunks submitted to it.
+
+        :param keys: The keys the worker processes verify the tokens with.
+        :param chunks: The chunks of tokens to verify.
+        :return: An iterator over the results of verifying each chunk, in the same order as the chunks.
+        """
+        with self._lock:
+            if self._pool is not None and self._pool_key_version != keys.version:
+                logger.info("Replacing the batch token verification worker processes as the keys have changed")
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+            if self._pool is None:
+                logger.info("Starting %s batch token verification worker processes", self._processes)
+                verification_keys = {kid: (key.algorithm_name, key.jwk) for kid, key in keys.verification_keys.items()}
+                # Use spawn rather than fork as forking a process which is running threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    self._processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=initialise_worker,
+                    initargs=(verification_keys, keys.signing_key.kid),
+                )
+                self._pool_key_version = keys.version
+            return self._pool.map(verify_tokens, chunks)
+
+
+batch_token_verifier = BatchTokenVerifier(
+    config.authentication.batch_verify_processes,
+    config.authentication.batch_verify_parallel_threshold,
+)
@@ -0,0 +1,77 @@
+"""
+Module for providing the functions run by the worker processes which verify batches of JWTs.
+
+The worker processes are spawned, so they import the module of the functions they run afresh. This module only imports
+PyJWT, the schemas and the shared JWT verification function so that the workers do not load the keys from the key files,
+open the revocation store or import the blacklist of their own. Instead, the process which starts them passes them the
+public keys it verifies tokens with, including the retired keys that may only be held in its memory.
+"""
+
+from typing import Any, Callable, Optional
+
+import jwt
+
+from scigateway_auth.common.schemas import TokenVerificationStatus
+from scigateway_auth.src.jwt_keys import JWTKey, verify_jwt
+
+# The public keys of the worker process, indexed by their IDs
+_verification_keys: dict[str, JWTKey] = {}
+# The key that tokens without a `kid` are verified with
+_signing_key: Optional[JWTKey] = None
+
+
+def initialise_worker(verification_keys: dict[str, tuple[str, dict[str, Any]]], signing_kid: str) -> None:
+    """
+    Parse the public keys passed to a worker process when it starts.
+
+    :param verification_keys: The JWT algorithm and the JWK of each public key, indexed by the ID of the key.
+    :param signing_kid: The ID of the key that tokens without a `kid` are verified with.
+    """
+    global _signing_key
+    _verification_keys.clear()
+    for kid, (algorithm_name, jwk) in verification_keys.items():
+        algorithm = jwt.get_algorithm_by_name(algorithm_name)
+        _verification_keys[kid] = JWTKey(kid, algorithm_name, algorithm, None, algorithm.from_jwk(jwk), jwk)
+    _signing_key = _verification_keys[signing_kid]
+
+
+def verify_tokens(tokens: list[str]) -> list[tuple[TokenVerificationStatus, Optional[dict[str, Any]]]]:
+    """
+    Verify each of the tokens with the public keys of the worker process and classify the result.
+
+    :param tokens: The JWT tokens to verify.
+    :return: The status and, for valid tokens, the claims of each token.
+    """
+    return [classify_token(_verify_token, token) for token in tokens]
+
+
+def classify_token(
+    verify: Callable[[str], dict[str, Any]],
+    token: str,
+) -> tuple[TokenVerificationStatus, Optional[dict[str, Any]]]:
+    """
+    Verify a token and classify the result. Invalid tokens are expected in a batch, so they are not logged.
+
+    :param verify: The function which verifies the token and returns its payload.
+    :param token: The JWT token to verify.
+    :return: The status and, for a valid token, the claims of the token.
+    """
+    try:
+        return TokenVerificationStatus.VALID, verify(token)
+    except jwt.ExpiredSignatureError:
+        return TokenVerificationStatus.EXPIRED, None
+    except jwt.InvalidSignatureError:
+        return TokenVerificationStatus.BAD_SIGNATURE, None
+    except Exception:
+        return TokenVerificationStatus.MALFORMED, None
+
+
+def _verify_token(token: str) -> dict[str, Any]:
+    """
+    Verify a token with the public keys of the worker process.
+
+    :param token: The JWT token to verify.
+    :raises jwt.InvalidTokenError: If the token is invalid.
+    :return: The payload of the token.
+    """
+    return verify_jwt(token, _verification_keys, _signing_key)
@@ -0,0 +1,157 @@
+"""
+Module for providing helpers for reading and writing files that are shared by the worker processes, so that a file is
+never seen partially written and changes to it can be detected cheaply.
+"""
+
+from contextlib import contextmanager
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import stat
+import tempfile
+from typing import Iterator
+
+from scigateway_auth.common.config import config
+
+logger = logging.getLogger()
+
+
+def get_file_signature(path: str) -> tuple[int, int, int]:
+    """
+    Return the signature of a file which changes whenever the file is modified or replaced.
+
+    :param path: The path to the file.
+    :return: The signature of the file.
+    """
+    stat_result = os.stat(path)
+    return stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+
+
+def get_lock_directory() -> str:
+    """
+    Return the directory of the lock files, creating it if it does not exist.
+
+    Unless `lock_directory` is configured, the lock files are kept in a directory in the temporary directory which is
+    private to the user the application runs as, rather than next to the files they guard, as the directories of the
+    files may not be writable by the application. The directory is only used if it is owned by that user and nobody
+    else can write to it, so that another user cannot plant lock files in it.
+
+    :raises OSError: If the directory cannot be created or is not private to the user the application runs as.
+    :return: The path to the directory of the lock files.
+    """
+    if config.api.lock_directory is not None:
+        return config.api.lock_directory
+
+    directory = os.path.join(tempfile.gettempdir(), f"scigateway-auth-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+
+    stat_result = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(stat_result.st_mode)
+        or stat_result.st_uid != os.getuid()
+        or stat_result.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    ):
+        raise PermissionError(errno.EPERM, "The lock directory is not private to the application", directory)
+    return directory
+
+
+def get_lock_path(path: str) -> str:
+    """
+    Return the path to the lock file guarding a file, which is named after a digest of the real path to the file.
+
+    :param path: The path to the file to lock.
+    :raises OSError: If the lock directory cannot be created or is not private to the user the application runs as.
+    :return: The path to the lock file.
+    """
+    path_digest = hashlib.sha256(os.path.realpath(path).encode()).hexdigest()[:16]
+    return os.path.join(get_lock_directory(), f"scigateway-auth-{path_digest}.lock")
+
+
+@contextmanager
+def lock_file(path: str, operation: int) -> Iterator[None]:
+    """
+    Context manager which holds an advisory lock guarding a file for all the processes which use the same lock
+    directory.
+
+    The lock is taken on a separate lock file rather than on the file itself because the file is replaced on every
+    update. The lock file is created readable and writable only by the user the application runs as and is never opened
+    through a symbolic link.
+
+    Readers only need the shared lock to avoid seeing a file which is being written in place, as the file is otherwise
+    replaced atomically. So when the lock file cannot be opened because the lock directory is not writable, a shared
+    lock falls back to reading without the lock rather than failing the read.
+
+    :param path: The path to the file to lock.
+    :param operation: `fcntl.LOCK_SH` for a shared lock or `fcntl.LOCK_EX` for an exclusive lock.
+    :raises OSError: If the lock file cannot be opened or created for an exclusive lock.
+    """
+    try:
+        lock_fd = os.open(get_lock_path(path), os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+    except OSError as exc:
+        if operation != fcntl.LOCK_SH or exc.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+            raise
+        logger.warning("Unable to open the lock file guarding %s so reading it without the lock: %s", path, exc)
+        yield
+        return
+
+    try:
+        fcntl.flock(lock_fd, operation)
+        yield
+    finally:
+        # Closing the file releases the lock
+        os.close(lock_fd)
+
+
+def replace_file(path: str, content: bytes) -> None:
+    """
+    Atomically replace the content of a file by writing it to a temporary file in the same directory, flushing it to
+    disk and renaming it over the file.
+
+    :param path: The path to the file to replace.
+    :param content: The new content of the file.
+    """
+    directory, file_name = os.path.split(os.path.abspath(path))
+    temp_fd, temp_path = tempfile.mkstemp(prefix=f".{file_name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(temp_fd, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            # Keep the permissions of the file rather than the restrictive ones the temporary file is created with
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    # Flush the rename to disk as well, not all file systems support this for directories
+    try:
+        directory_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+    except OSError:
+        pass
+
+
+def write_file(path: str, content: bytes) -> None:
+    """
+    Write the content of a file in place and flush it to disk. This must only be done while holding an exclusive lock
+    on the file so that readers do not see it partially written.
+
+    :param path: The path to the file to write.
+    :param content: The new content of the file.
+    """
+    with open(path, "wb") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
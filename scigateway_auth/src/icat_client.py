@@ -0,0 +1,180 @@
+"""
+Module for providing an asynchronous HTTP client for sending requests to ICAT.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+import httpx
+
+from scigateway_auth.common.config import config
+from scigateway_auth.common.exceptions import ICATUnavailableError
+from scigateway_auth.src.metrics import (
+    UPSTREAM_CIRCUIT_OPEN,
+    UPSTREAM_CONCURRENCY_LIMIT,
+    UPSTREAM_REQUESTS_REJECTED,
+    UPSTREAM_RETRIES,
+)
+from scigateway_auth.src.resilience import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    get_remaining_timeout,
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUS_CODES,
+    RetryPolicy,
+)
+
+logger = logging.getLogger()
+
+
+class ICATClient:
+    """
+    Class for sending requests to ICAT over a pool of kept-alive connections shared by all requests in the process.
+
+    The underlying `httpx.AsyncClient` is created on first use so that it is bound to the event loop serving the
+    application.
+
+    When ICAT is failing or slow, requests to it fail fast with `ICATUnavailableError` instead of waiting for
+    `request_timeout_seconds`: a circuit breaker stops sending requests after repeated failures, and an adaptive limit on
+    the number of concurrent requests sheds the requests that ICAT cannot keep up with. This keeps the requests which do
+    not need ICAT from being held up by the ones that do.
+
+    Requests which fail because of a transient error are retried with jittered exponential backoff, within the deadline
+    of the request being handled. Requests which are not idempotent, such as logins, are only retried if they failed to
+    connect, as ICAT cannot have received them.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialise the ICAT client.
+        """
+        self._client: Optional[httpx.AsyncClient] = None
+        self.circuit_breaker = CircuitBreaker(
+            "ICAT",
+            config.icat_server.circuit_breaker_failure_threshold,
+            config.icat_server.circuit_breaker_open_seconds,
+        )
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            "ICAT",
+            config.icat_server.min_concurrency_limit,
+            config.icat_server.max_connections,
+        )
+        self.retry_policy = RetryPolicy(config.icat_server.max_retries, config.icat_server.retry_backoff_seconds)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Return the shared HTTP client, creating it if it does not exist yet.
+
+        :return: The shared HTTP client.
+        """
+        if self._client is None:
+            logger.info("Creating HTTP client for ICAT at %s", config.icat_server.url)
+            self._client = httpx.AsyncClient(
+                base_url=config.icat_server.url,
+                verify=config.icat_server.certificate_validation,
+                timeout=config.icat_server.request_timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=config.icat_server.max_connections,
+                    max_keepalive_connections=config.icat_server.max_keepalive_connections,
+                    keepalive_expiry=config.icat_server.keepalive_expiry_seconds,
+                ),
+                http2=config.icat_server.http2,
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request to ICAT.
+
+        :param method: The HTTP method of the request.
+        :param path: The path of the request relative to the ICAT URL.
+        :param kwargs: Any other arguments to be passed to `httpx.AsyncClient.request`.
+        :raises ICATUnavailableError: If ICAT is considered to be unavailable, too many requests to it are in progress,
+            it cannot be reached, or the deadline of the request being handled has passed.
+        :return: The response from ICAT.
+        """
+        idempotent = method in IDEMPOTENT_METHODS
+        retry = 0
+        while True:
+            timeout = get_remaining_timeout(config.icat_server.request_timeout_seconds)
+            if timeout <= 0:
+                raise ICATUnavailableError("The deadline for the request to ICAT has passed")
+
+            try:
+                response = await self._send(method, path, timeout=timeout, **kwargs)
+            except httpx.TransportError as exc:
+                retryable = idempotent or isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+                delay = self.retry_policy.get_delay(retry) if retryable else None
+                if delay is None:
+                    raise ICATUnavailableError(f"ICAT cannot be reached: {exc!r}") from exc
+                logger.warning("Retrying %s request to ICAT in %.3f seconds after error: %r", method, delay, exc)
+            else:
+                delay = None
+                if idempotent and response.status_code in RETRYABLE_STATUS_CODES:
+                    delay = self.retry_policy.get_delay(retry)
+                if delay is None:
+                    return response
+                logger.warning(
+                    "Retrying %s request to ICAT in %.3f seconds after status code %s",
+                    method,
+                    delay,
+                    response.status_code,
+                )
+
+            UPSTREAM_RETRIES.labels("icat").inc()
+            await asyncio.sleep(delay)
+            retry += 1
+
+    async def _send(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a single request to ICAT through the concurrency limiter and circuit breaker, recording its result.
+
+        :param method: The HTTP method of the request.
+        :param path: The path of the request relative to the ICAT URL.
+        :param kwargs: Any other arguments to be passed to `httpx.AsyncClient.request`.
+        :raises ICATUnavailableError: If ICAT is considered to be unavailable or too many requests to it are in progress.
+        :raises httpx.TransportError: If ICAT cannot be reached.
+        :return: The response from ICAT.
+        """
+        if not self.concurrency_limiter.try_acquire():
+            UPSTREAM_REQUESTS_REJECTED.labels("icat", "concurrency_limit").inc()
+            raise ICATUnavailableError("Too many requests to ICAT are in progress")
+        permit = self.circuit_breaker.allow_call()
+        if permit is None:
+            self.concurrency_limiter.release(time.monotonic(), None)
+            UPSTREAM_REQUESTS_REJECTED.labels("icat", "circuit_open").inc()
+            raise ICATUnavailableError("ICAT is unavailable")
+
+        started_at = time.monotonic()
+        succeeded = None
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            # Client errors, such as invalid credentials, show that ICAT is working
+            succeeded = response.status_code < 500
+            return response
+        except httpx.TransportError:
+            succeeded = False
+            raise
+        finally:
+            # A slow response counts as a failure as it is a sign that ICAT is overloaded
+            if succeeded and time.monotonic() - started_at >= config.icat_server.slow_request_seconds:
+                succeeded = False
+            self.circuit_breaker.record_result(permit, succeeded)
+            self.concurrency_limiter.release(started_at, succeeded)
+            UPSTREAM_CIRCUIT_OPEN.labels("icat").set(self.circuit_breaker.is_open)
+            UPSTREAM_CONCURRENCY_LIMIT.labels("icat").set(self.concurrency_limiter.limit)
+
+    async def close(self) -> None:
+        """
+        Close the shared HTTP client and its connections. A new client is created if a request is sent afterwards.
+        """
+        if self._client is not None:
+            logger.info("Closing HTTP client for ICAT")
+            await self._client.aclose()
+            self._client = None
+
+
+icat_client = ICATClient()
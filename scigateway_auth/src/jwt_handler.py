@@ -4,20 +4,25 @@ Module for providing a class for handling JWTs.
 
 from datetime import datetime, timedelta, timezone
 import logging
+import time
 from typing import Any, Optional
+import uuid
 
-from cryptography.hazmat.primitives import serialization
-import jwt
+from fastapi.concurrency import run_in_threadpool
 
 from scigateway_auth.common.config import config
-from scigateway_auth.common.constants import PRIVATE_KEY, PUBLIC_KEY
 from scigateway_auth.common.exceptions import (
     BlacklistedJWTError,
+    ICATUnavailableError,
     InvalidJWTError,
     JWTRefreshError,
     UsernameMismatchError,
 )
 from scigateway_auth.src.authentication import ICATAuthenticator
+from scigateway_auth.src.key_material import key_material
+from scigateway_auth.src.metrics import JWT_OPERATION_DURATION
+from scigateway_auth.src.revocation import get_token_id, revocation_store
+from scigateway_auth.src.token_cache import verified_token_cache
 
 logger = logging.getLogger()
 
@@ -29,111 +34,220 @@ class JWTHandler:
 
     def get_access_token(self, icat_session_id: str, icat_username: str) -> str:
         """
-        Generate a payload and return a signed JWT access token.
+        Generate a payload and return a signed JWT access token for a newly created ICAT session.
 
         :param icat_session_id: The ICAT session ID.
         :param icat_username: The user's ICAT username.
         :return: The signed JWT access token.
         """
         logger.info("Getting an access token")
+        now = datetime.now(timezone.utc)
         payload = {
             "sessionId": icat_session_id,
             "username": icat_username,
             "userIsAdmin": self._is_user_admin(icat_username),
-            "exp": datetime.now(timezone.utc) + timedelta(minutes=config.authentication.access_token_validity_minutes),
+            "exp": now + timedelta(minutes=config.authentication.access_token_validity_minutes),
+            # The session was just created, which counts as refreshing it
+            "sessionRefreshedAt": int(now.timestamp()),
         }
         return self._pack_jwt(payload)
 
     def get_refresh_token(self, icat_username: str) -> str:
         """
-        Generate a payload and return a signed JWT refresh token.
+        Generate a payload and return a signed JWT refresh token, which starts a new family of refresh tokens.
 
         :param icat_username: The user's ICAT username.
         :return: The signed JWT refresh token.
         """
         logger.info("Getting a refresh token")
-        return self._pack_jwt(
-            {
-                "username": icat_username,
-                "exp": datetime.now(timezone.utc) + timedelta(days=config.authentication.refresh_token_validity_days),
-            },
-        )
+        expires_at = datetime.now(timezone.utc) + timedelta(days=config.authentication.refresh_token_validity_days)
+        return self._pack_refresh_token(icat_username, uuid.uuid4().hex, expires_at)
 
-    def refresh_access_token(self, access_token: str, refresh_token: str):
+    async def refresh_access_token(self, access_token: str, refresh_token: str) -> tuple[str, str]:
         """
-        Refresh the JWT access token by updating its expiry time, provided that the JWT refresh token is valid.
+        Refresh the JWT access token by updating its expiry time, provided that the JWT refresh token is valid, and
+        rotate the JWT refresh token.
+
+        The ICAT session is only refreshed if it was last refreshed, as recorded in the `sessionRefreshedAt` claim of the
+        access token, more than `session_refresh_skip_fraction` of its lifetime ago or it would otherwise expire before
+        the refreshed access token.
+
+        The JWT refresh token can only be used once: the rotated refresh token belongs to the same family and expires at
+        the same time. If a refresh token is used again after `refresh_token_reuse_interval_seconds`, it is assumed to
+        have been stolen and its whole family is revoked.
 
         :param access_token: The JWT access token to refresh.
         :param refresh_token: The JWT refresh token.
+        :raises BlacklistedJWTError: If the JWT refresh token has been revoked or reused.
+        :raises ICATUnavailableError: If ICAT is unavailable, in which case the JWT refresh token is not used up.
         :raises JWTRefreshError: If the JWT access token cannot be refreshed.
         :raises UsernameMismatchError: If the usernames in the access and refresh tokens do not match
-        :return: JWT access token with an updated expiry time.
+        :return: JWT access token with an updated expiry time and the rotated JWT refresh token.
         """
         logger.info("Refreshing access token")
 
-        if self._is_refresh_token_blacklisted(refresh_token):
-            raise BlacklistedJWTError(f"Attempted refresh from token in blacklist: {refresh_token}")
+        # Verifying and signing the tokens and reading and writing the revocation store block, so they are run in the
+        # threadpool to avoid blocking the event loop while the ICAT session is refreshed asynchronously
+        refresh_token_payload = await run_in_threadpool(self._verify_refresh_token, refresh_token)
+        # The refresh token is used up before ICAT is reached, so that concurrent requests with the same refresh token
+        # cannot all succeed outside the reuse interval while they wait for ICAT
+        is_first_use = await run_in_threadpool(self._use_refresh_token, refresh_token, refresh_token_payload)
 
-        refresh_token_payload = self.verify_token(refresh_token)
         try:
-            access_token_payload = self._get_jwt_payload(access_token, {"verify_exp": False})
+            access_token_payload = await run_in_threadpool(self._get_jwt_payload, access_token, {"verify_exp": False})
             if access_token_payload["username"] != refresh_token_payload["username"]:
                 raise UsernameMismatchError("The usernames in the access and refresh tokens do not match")
 
-            access_token_payload["exp"] = datetime.now(timezone.utc) + timedelta(
-                minutes=config.authentication.access_token_validity_minutes,
-            )
-            ICATAuthenticator.refresh(access_token_payload["sessionId"])
-            return self._pack_jwt(access_token_payload)
+            now = datetime.now(timezone.utc)
+            access_token_payload["exp"] = now + timedelta(minutes=config.authentication.access_token_validity_minutes)
+            if self._is_icat_session_refresh_due(access_token_payload, now):
+                await ICATAuthenticator.refresh(access_token_payload["sessionId"])
+                access_token_payload["sessionRefreshedAt"] = int(now.timestamp())
+            else:
+                logger.debug("Skipping the refresh of the recently refreshed ICAT session")
+        except ICATUnavailableError:
+            # Only the request which used up the refresh token releases it, so that it can be retried once ICAT is
+            # available again
+            if is_first_use:
+                token_id = get_token_id(refresh_token, refresh_token_payload)
+                await run_in_threadpool(revocation_store.release_token, token_id)
+            raise
         except Exception as exc:
             message = "Unable to refresh access token"
             logger.exception(message)
             raise JWTRefreshError(message) from exc
 
+        return await run_in_threadpool(self._rotate_tokens, refresh_token, refresh_token_payload, access_token_payload)
+
+    def revoke_refresh_token(self, refresh_token: str) -> None:
+        """
+        Revoke a JWT refresh token so that it can no longer be used to refresh access tokens.
+
+        :param refresh_token: The JWT refresh token to revoke.
+        :raises InvalidJWTError: If the JWT refresh token was not signed by this service.
+        """
+        logger.info("Revoking a refresh token")
+        try:
+            # Expired tokens can be revoked too, e.g. when revoking a list of tokens, although they are already unusable
+            payload = self._get_jwt_payload(refresh_token, {"verify_exp": False})
+        except Exception as exc:
+            message = "Invalid JWT token"
+            logger.exception(message)
+            raise InvalidJWTError(message) from exc
+        revocation_store.revoke_token(get_token_id(refresh_token, payload), payload["exp"])
+
+    def revoke_user_refresh_tokens(self, icat_username: str) -> None:
+        """
+        Revoke all the JWT refresh tokens issued to a user up to now.
+
+        :param icat_username: The user's ICAT username.
+        """
+        logger.info("Revoking all the refresh tokens of a user")
+        revocation_store.revoke_user(icat_username)
+
     def verify_token(self, token: str) -> dict[str, Any]:
         """
         Verify that the provided JWT token is valid. Do this by checking that it was signed by the corresponding
-        private key and has not expired.
+        private key and has not expired. Tokens that have already been verified are looked up in the verified token
+        cache instead of checking their signature again.
 
         :param token: The JWT token to be verified.
         :raises InvalidJWTError: If the JWT token is invalid.
         :return: The payload of the verified JWT token.
         """
-        logger.info("Verifying JWT token is valid")
+        logger.debug("Verifying JWT token is valid")
         try:
-            return self._get_jwt_payload(token)
+            return self.get_verified_payload(token)
         except Exception as exc:
             message = "Invalid JWT token"
             logger.exception(message)
             raise InvalidJWTError(message) from exc
 
+    @staticmethod
+    def get_verified_payload(token: str) -> dict[str, Any]:
+        """
+        Return the payload of the provided JWT token once it has been verified, looking it up in the verified token
+        cache if it has already been verified. Unlike `verify_token`, this does not log invalid tokens.
+
+        :param token: The JWT token to be verified.
+        :raises jwt.InvalidTokenError: If the JWT token is invalid.
+        :return: The payload of the verified JWT token.
+        """
+        key_version = key_material.get().version
+        payload = verified_token_cache.get(token, key_version)
+        if payload is None:
+            payload = JWTHandler._get_jwt_payload(token)
+            verified_token_cache.put(token, payload, key_version)
+        return payload
+
     @staticmethod
     def _get_jwt_payload(token: str, jwt_decode_options: Optional[dict] = None) -> dict[str, Any]:
         """
-        Decode the provided JWT token and get its payload.
+        Decode the provided JWT token and get its payload, verifying it with the key identified by the `kid` in its
+        header.
 
         :param token: The JWT token to decode and get payload from.
         :param jwt_decode_options: Any options to be passed to the `decode` method.
         :return: The payload from the provided JWT token.
         """
-        logger.info("Decoding JWT token")
-        return jwt.decode(
-            token,
-            PUBLIC_KEY,
-            algorithms=[config.authentication.jwt_algorithm],
-            options=jwt_decode_options,
-        )
+        logger.debug("Decoding JWT token")
+        with JWT_OPERATION_DURATION.labels("verify").time():
+            return key_material.get().verify(token, jwt_decode_options)
+
+    @staticmethod
+    def _get_refresh_token_family_id(refresh_token: str, refresh_token_payload: dict[str, Any]) -> str:
+        """
+        Get the ID of the family of the provided refresh token. Refresh tokens issued before they were rotated do not
+        have a `fam` claim, so they start a family identified by their own ID.
+
+        :param refresh_token: The JWT refresh token.
+        :param refresh_token_payload: The verified payload of the JWT refresh token.
+        :return: The ID of the family of the refresh token.
+        """
+        family_id = refresh_token_payload.get("fam")
+        if isinstance(family_id, str):
+            return family_id
+        return get_token_id(refresh_token, refresh_token_payload)
 
     @staticmethod
-    def _is_refresh_token_blacklisted(refresh_token: str) -> bool:
+    def _is_icat_session_refresh_due(access_token_payload: dict[str, Any], now: datetime) -> bool:
+        """
+        Check if the ICAT session of the provided access token has to be refreshed, which is when it was last refreshed
+        more than `session_refresh_skip_fraction` of its lifetime ago, or when it would expire before the access token.
+
+        :param access_token_payload: The payload of the JWT access token with its updated expiry time.
+        :param now: The current time.
+        :return: `True` if the ICAT session has to be refreshed, `False` otherwise.
         """
-        Check if the provided refresh token is in the blacklist configuration to determine whether the token is valid
+        refreshed_at = access_token_payload.get("sessionRefreshedAt")
+        # Access tokens issued before the claim was added do not record when their session was refreshed
+        if not isinstance(refreshed_at, int):
+            return True
+
+        session_lifetime_seconds = config.icat_server.session_lifetime_minutes * 60
+        skip_seconds = config.icat_server.session_refresh_skip_fraction * session_lifetime_seconds
+        return (
+            now.timestamp() - refreshed_at >= skip_seconds
+            or refreshed_at + session_lifetime_seconds <= access_token_payload["exp"].timestamp()
+        )
+
+    @classmethod
+    def _is_refresh_token_revoked(cls, refresh_token: str, refresh_token_payload: dict[str, Any]) -> bool:
+        """
+        Check if the provided refresh token has been revoked, either on its own, together with the other refresh tokens
+        of its family or together with all the other refresh tokens of its user, to determine whether the token is valid
         for refreshing access tokens.
 
         :param refresh_token: The JWT refresh token to be checked.
-        :return: `True` if the refresh token is blacklisted, `False` otherwise.
+        :param refresh_token_payload: The verified payload of the JWT refresh token.
+        :return: `True` if the refresh token has been revoked, `False` otherwise.
         """
-        return refresh_token in config.authentication.jwt_refresh_token_blacklist
+        return revocation_store.is_revoked(
+            get_token_id(refresh_token, refresh_token_payload),
+            refresh_token_payload["username"],
+            refresh_token_payload.get("iat"),
+            cls._get_refresh_token_family_id(refresh_token, refresh_token_payload),
+        )
 
     @staticmethod
     def _is_user_admin(username: str) -> bool:
@@ -149,12 +263,94 @@ class JWTHandler:
     @staticmethod
     def _pack_jwt(payload: dict) -> str:
         """
-        Pack the provided payload into a JWT token and sign it.
+        Pack the provided payload into a JWT token and sign it with the signing key.
 
         :param payload: The payload to be packed.
         :return: The encoded and signed JWT token.
         """
         logger.debug("Packing payload into a JWT token")
-        bytes_key = bytes(PRIVATE_KEY, encoding="utf8")
-        loaded_private_key = serialization.load_ssh_private_key(bytes_key, password=None)
-        return jwt.encode(payload, loaded_private_key, algorithm=config.authentication.jwt_algorithm)
+        with JWT_OPERATION_DURATION.labels("sign").time():
+            return key_material.get().signing_key.sign(payload)
+
+    @classmethod
+    def _pack_refresh_token(cls, icat_username: str, family_id: str, expires_at: datetime | int) -> str:
+        """
+        Generate a payload and return a signed JWT refresh token belonging to the provided family.
+
+        :param icat_username: The user's ICAT username.
+        :param family_id: The ID of the family of the refresh token.
+        :param expires_at: The time the refresh token expires at.
+        :return: The signed JWT refresh token.
+        """
+        return cls._pack_jwt(
+            {
+                "jti": uuid.uuid4().hex,
+                "fam": family_id,
+                "username": icat_username,
+                "iat": datetime.now(timezone.utc),
+                "exp": expires_at,
+            },
+        )
+
+    @classmethod
+    def _rotate_tokens(
+        cls,
+        refresh_token: str,
+        refresh_token_payload: dict[str, Any],
+        access_token_payload: dict[str, Any],
+    ) -> tuple[str, str]:
+        """
+        Sign the refreshed access token and the refresh token rotated from the provided one.
+
+        :param refresh_token: The JWT refresh token being used.
+        :param refresh_token_payload: The verified payload of the JWT refresh token.
+        :param access_token_payload: The payload of the refreshed JWT access token.
+        :return: The signed JWT access token and the rotated JWT refresh token.
+        """
+        rotated_refresh_token = cls._pack_refresh_token(
+            refresh_token_payload["username"],
+            cls._get_refresh_token_family_id(refresh_token, refresh_token_payload),
+            refresh_token_payload["exp"],
+        )
+        return cls._pack_jwt(access_token_payload), rotated_refresh_token
+
+    @classmethod
+    def _use_refresh_token(cls, refresh_token: str, refresh_token_payload: dict[str, Any]) -> bool:
+        """
+        Record that the provided refresh token has been used, revoking its family if it has already been used more than
+        `refresh_token_reuse_interval_seconds` ago.
+
+        :param refresh_token: The JWT refresh token being used.
+        :param refresh_token_payload: The verified payload of the JWT refresh token.
+        :raises BlacklistedJWTError: If the refresh token has already been used.
+        :return: Whether this is the first use of the refresh token.
+        """
+        used_at = revocation_store.use_token(
+            get_token_id(refresh_token, refresh_token_payload),
+            refresh_token_payload["exp"],
+        )
+        if used_at is None:
+            return True
+        if time.time() - used_at <= config.authentication.refresh_token_reuse_interval_seconds:
+            return False
+
+        logger.warning("Refresh token reused, revoking its family")
+        revocation_store.revoke_family(
+            cls._get_refresh_token_family_id(refresh_token, refresh_token_payload),
+            refresh_token_payload["exp"],
+        )
+        raise BlacklistedJWTError("Attempted refresh with a refresh token which has already been used")
+
+    def _verify_refresh_token(self, refresh_token: str) -> dict[str, Any]:
+        """
+        Verify that the provided JWT refresh token is valid and has not been revoked.
+
+        :param refresh_token: The JWT refresh token to be verified.
+        :raises BlacklistedJWTError: If the JWT refresh token has been revoked.
+        :raises InvalidJWTError: If the JWT refresh token is invalid.
+        :return: The payload of the verified JWT refresh token.
+        """
+        refresh_token_payload = self.verify_token(refresh_token)
+        if self._is_refresh_token_revoked(refresh_token, refresh_token_payload):
+            raise BlacklistedJWTError("Attempted refresh with a revoked refresh token")
+        return refresh_token_payload
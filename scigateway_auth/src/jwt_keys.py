@@ -0,0 +1,89 @@
+"""
+Module for providing the class of the keys used to sign and verify JWTs and the function that verifies JWTs with them.
+
+This module only imports PyJWT so that the worker processes which verify batches of JWTs can verify them in exactly the
+same way as this service does, without loading the keys from the key files.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+
+import jwt
+from jwt.algorithms import Algorithm
+
+
+@dataclass(frozen=True)
+class JWTKey:
+    """
+    A parsed key together with the JWT algorithm it is used with and its ID.
+    """
+
+    kid: str
+    algorithm_name: str
+    algorithm: Algorithm
+    # `None` for keys which are only used to verify tokens
+    private_key: Optional[Any]
+    public_key: Any
+    # The public key as a JWK, as published in the JWK Set
+    jwk: dict[str, Any]
+
+    def sign(self, payload: dict[str, Any]) -> str:
+        """
+        Encode the provided payload into a JWT signed with this key, with the ID of the key in its header.
+
+        :param payload: The payload to encode.
+        :return: The encoded and signed JWT.
+        """
+        return jwt.encode(payload, self.private_key, algorithm=self.algorithm_name, headers={"kid": self.kid})
+
+    def verify(self, token: str, options: Optional[dict] = None) -> dict[str, Any]:
+        """
+        Decode the provided JWT and verify that it was signed with this key.
+
+        :param token: The JWT to decode.
+        :param options: Any options to be passed to PyJWT's `decode` function.
+        :raises jwt.InvalidTokenError: If the JWT is invalid.
+        :return: The payload of the JWT.
+        """
+        return jwt.decode(token, self.public_key, algorithms=[self.algorithm_name], options=options)
+
+
+def get_verification_key(token: str, verification_keys: Mapping[str, JWTKey], signing_key: JWTKey) -> JWTKey:
+    """
+    Return the key to verify the provided JWT with, as identified by the `kid` in its header. Tokens without a `kid` are
+    verified with the signing key.
+
+    :param token: The JWT to return the key for.
+    :param verification_keys: All the keys tokens can be verified with, indexed by their ID.
+    :param signing_key: The key that tokens are signed with.
+    :raises jwt.InvalidTokenError: If the header of the JWT cannot be decoded.
+    :raises jwt.InvalidSignatureError: If the JWT was signed with a key that is not in the verification keys.
+    :return: The key to verify the JWT with.
+    """
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        return signing_key
+    try:
+        return verification_keys[kid]
+    except (KeyError, TypeError) as exc:
+        raise jwt.InvalidSignatureError(f"Token was signed with an unknown key: {kid!r}") from exc
+
+
+def verify_jwt(
+    token: str,
+    verification_keys: Mapping[str, JWTKey],
+    signing_key: JWTKey,
+    options: Optional[dict] = None,
+) -> dict[str, Any]:
+    """
+    Decode the provided JWT and verify it with the key identified by the `kid` in its header, or the signing key if it
+    has none.
+
+    :param token: The JWT to decode.
+    :param verification_keys: All the keys tokens can be verified with, indexed by their ID.
+    :param signing_key: The key that tokens are signed with.
+    :param options: Any options to be passed to PyJWT's `decode` function.
+    :raises jwt.InvalidTokenError: If the JWT is invalid.
+    :return: The payload of the JWT.
+    """
+    return get_verification_key(token, verification_keys, signing_key).verify(token, options)
@@ -2,8 +2,15 @@
 Module for providing classes for handling maintenance modes.
 """
 
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import errno
+import fcntl
+import hashlib
 import json
 import logging
+import threading
+import time
 from typing import Type, Union
 
 from pydantic import ValidationError
@@ -15,15 +22,47 @@ from scigateway_auth.common.exceptions import (
     MaintenanceFileWriteError,
 )
 from scigateway_auth.common.schemas import MaintenanceStateSchema, ScheduledMaintenanceStateSchema
+from scigateway_auth.src.file_utils import get_file_signature, lock_file, replace_file, write_file
 
 logger = logging.getLogger()
 
 
+@dataclass(frozen=True)
+class CachedMaintenanceState:
+    """
+    A maintenance state read from a file, together with its serialised form and the version of the file it was read
+    from.
+    """
+
+    state: Union[MaintenanceStateSchema, ScheduledMaintenanceStateSchema]
+    # The state serialised as JSON ready to be returned in a response
+    content: bytes
+    # A strong entity tag derived from the serialised state
+    etag: str
+    # The modification time of the file (to the second, as used in HTTP dates)
+    last_modified: datetime
+    # The inode, modification time in nanoseconds and size in bytes of the file when it was read
+    file_signature: tuple[int, int, int]
+
+
 class MaintenanceBase:
     """
     Base class for managing maintenance states.
+
+    The maintenance states are held in memory and shared by all the instances in the process. The file is checked for
+    changes at most once every `poll_interval_seconds` and is only read and validated again when it has changed.
+
+    Updates are written to a temporary file which is then renamed over the maintenance file, so that the file is never
+    seen partially written. Writers hold an exclusive advisory lock and readers a shared one, which serialises updates
+    from different worker processes and covers the fallback of writing in place when the file cannot be replaced. As
+    the signature of the file changes on every update, the other worker processes pick up the new state the next time
+    they check the file.
     """
 
+    _cached_states: dict[str, CachedMaintenanceState] = {}
+    _next_checks: dict[str, float] = {}
+    _lock = threading.Lock()
+
     def __init__(
         self,
         config_path: str,
@@ -53,17 +92,60 @@ class MaintenanceBase:
 
     def get_maintenance_state(self) -> Union[MaintenanceStateSchema, ScheduledMaintenanceStateSchema]:
         """
-        Read and return the maintenance state from the file.
+        Return the maintenance state, reading it from the file if it has changed since it was last read.
 
         :raises InvalidMaintenanceFileError: If the maintenance file is incorrectly formatted.
         :raises MaintenanceFileReadError: If the maintenance file cannot be found or read.
         :return: The maintenance state.
         """
+        return self.get_cached_maintenance_state().state
+
+    def get_cached_maintenance_state(self) -> CachedMaintenanceState:
+        """
+        Return the maintenance state held in memory along with its serialised form and the validators used for
+        conditional requests, first checking whether the file has changed if it has not been checked within the poll
+        interval.
+
+        :raises InvalidMaintenanceFileError: If the maintenance file is incorrectly formatted.
+        :raises MaintenanceFileReadError: If the maintenance file cannot be found or read.
+        :return: The maintenance state held in memory.
+        """
+        cached_state = self._cached_states.get(self._config_path)
+        now = time.monotonic()
+        if cached_state is not None and now < self._next_checks.get(self._config_path, 0.0):
+            return cached_state
+
+        with self._lock:
+            cached_state = self._cached_states.get(self._config_path)
+            try:
+                file_signature = get_file_signature(self._config_path)
+            except OSError as exc:
+                message = f"An error occurred while trying to find and read the {self._state_description} file"
+                logger.exception(message)
+                raise MaintenanceFileReadError(message) from exc
+
+            if cached_state is None or cached_state.file_signature != file_signature:
+                cached_state = self._read_state(file_signature)
+                self._cached_states[self._config_path] = cached_state
+
+            self._next_checks[self._config_path] = now + config.maintenance.poll_interval_seconds
+            return cached_state
+
+    def _read_state(self, file_signature: tuple[int, int, int]) -> CachedMaintenanceState:
+        """
+        Read and validate the maintenance state from the file.
+
+        :param file_signature: The signature of the file taken before reading it.
+        :raises InvalidMaintenanceFileError: If the maintenance file is incorrectly formatted.
+        :raises MaintenanceFileReadError: If the maintenance file cannot be found or read.
+        :return: The maintenance state read from the file.
+        """
         logger.info("Attempting to get %s state", self._state_description)
         try:
-            with open(self._config_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                return self._state_schema_class(**data)
+            with lock_file(self._config_path, fcntl.LOCK_SH):
+                with open(self._config_path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            state = self._state_schema_class(**data)
         except (OSError, json.JSONDecodeError, TypeError) as exc:
             message = f"An error occurred while trying to find and read the {self._state_description} file"
             logger.exception(message)
@@ -73,6 +155,15 @@ class MaintenanceBase:
             logger.exception(message)
             raise InvalidMaintenanceFileError(message) from exc
 
+        content = state.model_dump_json().encode()
+        return CachedMaintenanceState(
+            state=state,
+            content=content,
+            etag='"' + hashlib.sha256(content).hexdigest() + '"',
+            last_modified=datetime.fromtimestamp(file_signature[1] // 1_000_000_000, tz=timezone.utc),
+            file_signature=file_signature,
+        )
+
     def update_maintenance_state(
         self,
         maintenance_state: Union[MaintenanceStateSchema, ScheduledMaintenanceStateSchema],
@@ -85,9 +176,21 @@ class MaintenanceBase:
         """
         logger.info("Attempting to update %s state", self._state_description)
         try:
-            with open(self._config_path, "w") as file:
-                json.dump(maintenance_state.model_dump(), file)
+            content = json.dumps(maintenance_state.model_dump()).encode()
+            with lock_file(self._config_path, fcntl.LOCK_EX):
+                try:
+                    replace_file(self._config_path, content)
+                except OSError as exc:
+                    # The file cannot be replaced when it is bind mounted into a container on its own or when its
+                    # directory is not writable, in which case it is written in place while holding the lock instead
+                    if exc.errno not in (errno.EBUSY, errno.EXDEV, errno.EACCES, errno.EPERM, errno.EROFS):
+                        raise
+                    logger.warning("Unable to replace the %s file so writing to it in place", self._state_description)
+                    write_file(self._config_path, content)
             logger.info("The %s file was successfully updated", self._state_description)
+            # Make sure the next get reads the new state rather than waiting for the poll interval to pass
+            with self._lock:
+                self._next_checks.pop(self._config_path, None)
         except (OSError, OverflowError, TypeError, ValueError) as exc:
             message = f"An error occurred while trying to find and update the {self._state_description} file"
             logger.exception(message)
@@ -0,0 +1,150 @@
+"""
+Module for providing a class for streaming changes to a maintenance state to clients as server-sent events.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+from scigateway_auth.common.config import config
+from scigateway_auth.common.exceptions import (
+    InvalidMaintenanceFileError,
+    MaintenanceFileReadError,
+    MaintenanceStreamLimitError,
+)
+from scigateway_auth.src.maintenance import MaintenanceBase, MaintenanceMode, ScheduledMaintenanceMode
+
+logger = logging.getLogger()
+
+
+class MaintenanceStateBroadcaster:
+    """
+    Class for broadcasting a maintenance state to server-sent event subscribers.
+
+    A single watcher task per process checks the maintenance state for changes, either when it is notified of an update
+    or every `poll_interval_seconds` to pick up external edits of the file, and fans each change out to all the
+    subscribers. Each subscriber has a queue which only holds the latest event, so a slow subscriber skips intermediate
+    states rather than making the queue grow.
+    """
+
+    def __init__(self, maintenance_mode: MaintenanceBase) -> None:
+        """
+        Initialise the broadcaster.
+
+        :param maintenance_mode: The maintenance mode whose state is broadcast.
+        """
+        self._maintenance_mode = maintenance_mode
+        self._subscribers: set[asyncio.Queue[bytes]] = set()
+        self._event: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        """
+        Return the number of current subscribers.
+
+        :return: The number of current subscribers.
+        """
+        return len(self._subscribers)
+
+    def stream(self) -> AsyncIterator[bytes]:
+        """
+        Create the stream of events for a new subscriber, checking that the maximum number of subscribers has not been
+        reached so that the client can be turned away before the response starts.
+
+        :raises MaintenanceStreamLimitError: If the maximum number of subscribers has been reached.
+        :return: An async iterator of server-sent events.
+        """
+        if len(self._subscribers) >= config.maintenance.stream_max_subscribers:
+            raise MaintenanceStreamLimitError("The maximum number of maintenance state subscribers has been reached")
+        return self._stream()
+
+    def notify(self) -> None:
+        """
+        Notify the watcher task that the maintenance state has been updated so that it checks for the change straight
+        away. This can be called from any thread.
+        """
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _stream(self) -> AsyncIterator[bytes]:
+        """
+        Yield the events for a subscriber, sending a heartbeat comment when there has been no event for
+        `stream_heartbeat_seconds`. The subscriber is only added once the stream is iterated and is removed when the
+        stream is closed, so a stream which is never iterated because the client disconnected first does not leak.
+
+        :return: An async iterator of server-sent events.
+        """
+        queue = self._subscribe()
+        try:
+            # Tell the client how long to wait before reconnecting
+            yield f"retry: {int(config.maintenance.stream_heartbeat_seconds * 1000)}\n\n".encode()
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=config.maintenance.stream_heartbeat_seconds)
+                except TimeoutError:
+                    yield b": heartbeat\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+    def _subscribe(self) -> asyncio.Queue[bytes]:
+        """
+        Add a subscriber, starting the watcher task if it is not running. This must be called from the event loop.
+
+        :return: The queue the subscriber's events are put on.
+        """
+        queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=1)
+        if self._event is not None:
+            queue.put_nowait(self._event)
+        self._subscribers.add(queue)
+
+        if self._watcher is None or self._watcher.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._watcher = self._loop.create_task(self._watch())
+        return queue
+
+    async def _watch(self) -> None:
+        """
+        Check the maintenance state for changes and publish them until there are no subscribers left.
+        """
+        logger.info("Starting to watch the maintenance state for changes")
+        while self._subscribers:
+            await self._check_for_change()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=config.maintenance.poll_interval_seconds)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+        logger.info("Stopped watching the maintenance state for changes as there are no subscribers")
+
+    async def _check_for_change(self) -> None:
+        """
+        Publish the maintenance state to all the subscribers if it has changed since it was last published.
+        """
+        try:
+            # Checking the file blocks, including while an update holds its lock, so it is done in a thread to avoid
+            # blocking the event loop. The subscribers' queues are not thread safe so the events are published here.
+            cached_state = await asyncio.to_thread(self._maintenance_mode.get_cached_maintenance_state)
+        except (InvalidMaintenanceFileError, MaintenanceFileReadError):
+            # The error has already been logged, keep the subscribers on the last good state
+            return
+
+        if cached_state.etag == self._etag:
+            return
+
+        self._etag = cached_state.etag
+        self._event = b"id: " + cached_state.etag.strip('"').encode() + b"\ndata: " + cached_state.content + b"\n\n"
+        for queue in self._subscribers:
+            if queue.full():
+                # Drop the event the subscriber has not consumed yet as it has been superseded by this one
+                queue.get_nowait()
+            queue.put_nowait(self._event)
+
+
+maintenance_broadcaster = MaintenanceStateBroadcaster(MaintenanceMode())
+
+scheduled_maintenance_broadcaster = MaintenanceStateBroadcaster(ScheduledMaintenanceMode())
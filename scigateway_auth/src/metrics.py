@@ -0,0 +1,184 @@
+"""
+Module for providing the Prometheus metrics of the application, the middleware which records the metrics of the requests
+it handles, and helpers for recording the metrics of the calls it makes.
+
+When the `PROMETHEUS_MULTIPROC_DIR` environment variable is set before the application starts, `prometheus_client`
+writes the metrics of each worker process to files in that directory and `generate_metrics` aggregates them, so that
+the metrics are the same whichever worker serves the scrape.
+"""
+
+from contextlib import contextmanager
+import logging
+import os
+import time
+from typing import Iterator
+
+from anyio import to_thread
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    generate_latest,
+    Histogram,
+    multiprocess,
+    REGISTRY,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger()
+
+# Buckets for operations which take well under a millisecond to a few tens of milliseconds
+FAST_OPERATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+HTTP_REQUESTS = Counter(
+    "scigateway_auth_http_requests_total",
+    "Number of HTTP requests handled",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "scigateway_auth_http_request_duration_seconds",
+    "Time taken to handle HTTP requests",
+    ["method", "route", "status"],
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "scigateway_auth_upstream_request_duration_seconds",
+    "Time taken by requests made to ICAT and the OIDC providers",
+    ["upstream", "operation", "outcome"],
+)
+JWT_OPERATION_DURATION = Histogram(
+    "scigateway_auth_jwt_operation_duration_seconds",
+    "Time taken to sign and verify JWTs",
+    ["operation"],
+    buckets=FAST_OPERATION_BUCKETS,
+)
+UPSTREAM_REQUESTS_REJECTED = Counter(
+    "scigateway_auth_upstream_requests_rejected_total",
+    "Number of requests to upstream services which were not sent because they are unavailable or overloaded",
+    ["upstream", "reason"],
+)
+UPSTREAM_RETRIES = Counter(
+    "scigateway_auth_upstream_retries_total",
+    "Number of requests to upstream services which were retried after a transient error",
+    ["upstream"],
+)
+UPSTREAM_CIRCUIT_OPEN = Gauge(
+    "scigateway_auth_upstream_circuit_open",
+    "Whether the circuit to the upstream service is open in any worker process",
+    ["upstream"],
+    multiprocess_mode="livemax",
+)
+UPSTREAM_CONCURRENCY_LIMIT = Gauge(
+    "scigateway_auth_upstream_concurrency_limit",
+    "Maximum number of concurrent requests to the upstream service",
+    ["upstream"],
+    multiprocess_mode="livesum",
+)
+CACHE_LOOKUPS = Counter(
+    "scigateway_auth_cache_lookups_total",
+    "Number of lookups in the caches by result",
+    ["cache", "result"],
+)
+THREADPOOL_THREADS_IN_USE = Gauge(
+    "scigateway_auth_threadpool_threads_in_use",
+    "Number of threads of the threadpool running blocking calls",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_TASKS_WAITING = Gauge(
+    "scigateway_auth_threadpool_tasks_waiting",
+    "Number of blocking calls waiting for a thread of the threadpool",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_CAPACITY = Gauge(
+    "scigateway_auth_threadpool_capacity",
+    "Maximum number of threads of the threadpool",
+    multiprocess_mode="livesum",
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware which records the number and duration of the HTTP requests by method, route and status, and samples
+    the usage of the threadpool at the start and end of each request.
+
+    Requests are labelled with the path template of the route they matched (e.g. `/oidc_login/{provider_id}`) so that
+    the number of label values is bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        _sample_threadpool()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), str(status_code))
+            HTTP_REQUESTS.labels(*labels).inc()
+            HTTP_REQUEST_DURATION.labels(*labels).observe(duration)
+            _sample_threadpool()
+
+
+def _sample_threadpool() -> None:
+    """
+    Record the usage of the threadpool that blocking calls are run in. This must be called from the event loop.
+    """
+    limiter = to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    THREADPOOL_THREADS_IN_USE.set(statistics.borrowed_tokens)
+    THREADPOOL_TASKS_WAITING.set(statistics.tasks_waiting)
+    THREADPOOL_CAPACITY.set(limiter.total_tokens)
+
+
+@contextmanager
+def observe_upstream_request(upstream: str, operation: str) -> Iterator[None]:
+    """
+    Context manager which records the duration of a request to an upstream service and whether it raised an error.
+
+    :param upstream: The name of the upstream service, `icat` or `oidc`.
+    :param operation: The name of the operation the request performs.
+    """
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        yield
+        outcome = "success"
+    finally:
+        UPSTREAM_REQUEST_DURATION.labels(upstream, operation, outcome).observe(time.perf_counter() - start)
+
+
+def generate_metrics() -> bytes:
+    """
+    Return the metrics in the Prometheus text format, aggregated across all the worker processes in multiprocess mode.
+
+    :return: The metrics.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    """
+    Remove the live gauges of this worker process from the aggregated metrics when it shuts down, if running in
+    multiprocess mode.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        logger.info("Removing the metrics of the worker process with PID %s", os.getpid())
+        multiprocess.mark_process_dead(os.getpid())
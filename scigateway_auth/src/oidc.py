@@ -2,19 +2,89 @@
 OIDC module.
 """
 
-from cachetools.func import ttl_cache
+from collections import OrderedDict
+from functools import partial
+import logging
+import threading
+import time
+from typing import Callable
+
 import jwt
 import requests
+from urllib3.exceptions import ConnectTimeoutError
 
 from scigateway_auth.common.config import config, OidcProviderConfig
 from scigateway_auth.common.exceptions import InvalidJWTError, OidcProviderNotFoundError
+from scigateway_auth.src.metrics import observe_upstream_request, UPSTREAM_RETRIES
+from scigateway_auth.src.resilience import (
+    get_remaining_timeout,
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUS_CODES,
+    RetryPolicy,
+)
+from scigateway_auth.src.single_flight_cache import single_flight_ttl_cache
 
 # Amount of leeway (in seconds) when validating exp & iat
 LEEWAY = 5
 
-# Timeout for HTTP requests (in seconds)
+# Timeout for HTTP requests (in seconds), which is cut short by the deadline of the request being handled
 TIMEOUT = 10
 
+RETRY_POLICY = RetryPolicy(config.authentication.oidc_max_retries, config.authentication.oidc_retry_backoff_seconds)
+
+logger = logging.getLogger()
+
+
+def _is_retryable(method: str, exc: requests.RequestException) -> bool:
+    """
+    Check whether a failed request to an OIDC provider is worth retrying. Requests which are not idempotent, such as
+    exchanging a single use authorization code, are only retried if they failed to connect, as the provider cannot have
+    received them.
+
+    :param method: The HTTP method of the request.
+    :param exc: The exception the request failed with.
+    :return: `True` if the request should be retried, `False` otherwise.
+    """
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    if isinstance(exc, requests.ConnectTimeout) or isinstance(reason, ConnectTimeoutError):
+        return True
+    if method not in IDEMPOTENT_METHODS:
+        return False
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is not None and exc.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def _request_with_retries(method: str, send: Callable[..., requests.Response]) -> requests.Response:
+    """
+    Send a request to an OIDC provider, retrying it with jittered exponential backoff if it fails because of a transient
+    error, within the deadline of the request being handled.
+
+    :param method: The HTTP method of the request.
+    :param send: The function which sends the request when called with the `timeout` to use.
+    :raises RequestException: If a HTTP request did not succeed or returned an error.
+    :return: The successful response.
+    """
+    retry = 0
+    while True:
+        timeout = get_remaining_timeout(TIMEOUT)
+        if timeout <= 0:
+            raise requests.Timeout("The deadline for the request to the OIDC provider has passed")
+
+        try:
+            r = send(timeout=timeout)
+            r.raise_for_status()
+            return r
+        except requests.RequestException as exc:
+            delay = RETRY_POLICY.get_delay(retry) if _is_retryable(method, exc) else None
+            if delay is None:
+                raise
+            logger.warning("Retrying %s request to OIDC provider in %.3f seconds after error: %r", method, delay, exc)
+
+        UPSTREAM_RETRIES.labels("oidc").inc()
+        time.sleep(delay)
+        retry += 1
+
 
 def get_provider_config(provider_id: str) -> OidcProviderConfig:
     """
@@ -30,11 +100,12 @@ def get_provider_config(provider_id: str) -> OidcProviderConfig:
         raise OidcProviderNotFoundError from None
 
 
-@ttl_cache(ttl=(24 * 60 * 60))
+@single_flight_ttl_cache(ttl_seconds=(24 * 60 * 60), refresh_ahead_seconds=(60 * 60), stale_seconds=(24 * 60 * 60))
 def get_well_known_config(provider_id: str) -> dict:
     """
     Retreives the OIDC provider's configuration from its .well-known/openid-configuration endpoint.
-    Caches the response for 24 hours.
+    Caches the response for 24 hours, refreshing it in the background from an hour before it expires. Only one request
+    per provider is made at a time, and the previous response is used for up to 24 hours if refreshing it fails.
 
     :param provider_id: The ID of the OIDC provider.
     :raises OidcProviderNotFoundError: If there is no OIDC provider config for the given provider_id.
@@ -42,16 +113,20 @@ def get_well_known_config(provider_id: str) -> dict:
     :return: The OIDC provider's configuration.
     """
     provider_config = get_provider_config(provider_id)
-    r = requests.get(provider_config.configuration_url, verify=provider_config.verify_cert, timeout=TIMEOUT)
-    r.raise_for_status()
+    with observe_upstream_request("oidc", "get_well_known_config"):
+        r = _request_with_retries(
+            "GET",
+            partial(requests.get, provider_config.configuration_url, verify=provider_config.verify_cert),
+        )
     return r.json()
 
 
-@ttl_cache(ttl=(2 * 60 * 60))
+@single_flight_ttl_cache(ttl_seconds=(2 * 60 * 60), refresh_ahead_seconds=(10 * 60), stale_seconds=(2 * 60 * 60))
 def get_jwks(provider_id: str) -> jwt.PyJWKSet:
     """
     Retreives an OIDC provider's JWK Set.
-    Caches the response for 2 hours.
+    Caches the response for 2 hours, refreshing it in the background from 10 minutes before it expires. Only one request
+    per provider is made at a time, and the previous response is used for up to 2 hours if refreshing it fails.
 
     :param provider_id: The ID of the OIDC provider.
     :raises OidcProviderNotFoundError: If there is no OIDC provider config for the given provider_id.
@@ -62,13 +137,107 @@ def get_jwks(provider_id: str) -> jwt.PyJWKSet:
     well_known_config = get_well_known_config(provider_id)
     jwks_uri = well_known_config["jwks_uri"]
 
-    r = requests.get(jwks_uri, verify=provider_config.verify_cert, timeout=TIMEOUT)
-    r.raise_for_status()
+    with observe_upstream_request("oidc", "get_jwks"):
+        r = _request_with_retries("GET", partial(requests.get, jwks_uri, verify=provider_config.verify_cert))
     jwks_config = r.json()
 
     return jwt.PyJWKSet(jwks_config["keys"])
 
 
+class JWKSKeyStore:
+    """
+    Store of the keys in the OIDC providers' JWK Sets, indexed by `kid`.
+
+    A `kid` which is not in a provider's cached JWK Set, for example because the provider has rotated its keys, triggers
+    a refetch of the JWK Set. Refetches are limited to one per provider every `oidc_jwks_min_refetch_interval_seconds`,
+    and a `kid` which is still unknown after a refetch is remembered in a bounded negative cache for
+    `oidc_jwks_negative_cache_ttl_seconds`, so that tokens with made up `kid`s cannot be used to make the service flood
+    the provider with requests.
+    """
+
+    def __init__(
+        self,
+        min_refetch_interval_seconds: float,
+        negative_cache_size: int,
+        negative_cache_ttl_seconds: float,
+    ) -> None:
+        """
+        Initialise the key store.
+
+        :param min_refetch_interval_seconds: The minimum number of seconds between refetches of a provider's JWK Set.
+        :param negative_cache_size: The maximum number of unknown `kid`s to remember.
+        :param negative_cache_ttl_seconds: The number of seconds to remember an unknown `kid` for.
+        """
+        self._min_refetch_interval_seconds = min_refetch_interval_seconds
+        self._negative_cache_size = negative_cache_size
+        self._negative_cache_ttl_seconds = negative_cache_ttl_seconds
+        self._lock = threading.Lock()
+        # The JWK Set each index was built from, so the index is rebuilt when the cached JWK Set is replaced
+        self._indexes: dict[str, tuple[jwt.PyJWKSet, dict[str, jwt.PyJWK]]] = {}
+        self._last_refetches: dict[str, float] = {}
+        self._unknown_kids: OrderedDict[tuple[str, str], float] = OrderedDict()
+
+    def get_key(self, provider_id: str, kid: str) -> jwt.PyJWK:
+        """
+        Return the key with the given `kid` from an OIDC provider's JWK Set, refetching the JWK Set if the `kid` is not
+        in it and it has not been refetched within the minimum refetch interval.
+
+        :param provider_id: The ID of the OIDC provider.
+        :param kid: The ID of the key.
+        :raises KeyError: If the key is not in the provider's JWK Set.
+        :raises OidcProviderNotFoundError: If there is no OIDC provider config for the given provider_id.
+        :raises RequestException: If a HTTP request did not succeed or returned an error.
+        :return: The key.
+        """
+        key = self._get_index(provider_id, get_jwks(provider_id)).get(kid)
+        if key is not None:
+            return key
+
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._unknown_kids.get((provider_id, kid))
+            if expires_at is not None and now < expires_at:
+                raise KeyError(kid)
+
+            last_refetch = self._last_refetches.get(provider_id)
+            if last_refetch is not None and now - last_refetch < self._min_refetch_interval_seconds:
+                raise KeyError(kid)
+            self._last_refetches[provider_id] = now
+
+        logger.info("Refetching the JWK Set of OIDC provider %s as it does not contain the key %s", provider_id, kid)
+        key = self._get_index(provider_id, get_jwks.refresh(provider_id)).get(kid)
+        if key is not None:
+            return key
+
+        with self._lock:
+            self._unknown_kids.pop((provider_id, kid), None)
+            self._unknown_kids[(provider_id, kid)] = now + self._negative_cache_ttl_seconds
+            while len(self._unknown_kids) > self._negative_cache_size:
+                self._unknown_kids.popitem(last=False)
+        raise KeyError(kid)
+
+    def _get_index(self, provider_id: str, jwks: jwt.PyJWKSet) -> dict[str, jwt.PyJWK]:
+        """
+        Return the keys of a JWK Set indexed by `kid`, building the index if the JWK Set has been replaced.
+
+        :param provider_id: The ID of the OIDC provider.
+        :param jwks: The provider's current JWK Set.
+        :return: The keys indexed by `kid`.
+        """
+        indexed = self._indexes.get(provider_id)
+        if indexed is None or indexed[0] is not jwks:
+            indexed = (jwks, {key.key_id: key for key in jwks.keys if key.key_id is not None})
+            self._indexes[provider_id] = indexed
+        return indexed[1]
+
+
+jwks_key_store = JWKSKeyStore(
+    config.authentication.oidc_jwks_min_refetch_interval_seconds,
+    config.authentication.oidc_jwks_negative_cache_size,
+    config.authentication.oidc_jwks_negative_cache_ttl_seconds,
+)
+
+
 def get_token(provider_id: str, code: str) -> dict:
     """
     Call the OIDC provider's token endpoint.
@@ -86,20 +255,22 @@ def get_token(provider_id: str, code: str) -> dict:
     if provider_config.client_secret is None:
         raise OidcProviderNotFoundError from None
 
-    r = requests.post(
-        url=token_endpoint,
-        data={
-            "grant_type": "authorization_code",
-            "client_id": provider_config.client_id,
-            "client_secret": provider_config.client_secret,
-            "code": code,
-            "redirect_uri": config.authentication.oidc_redirect_uri,
-        },
-        verify=provider_config.verify_cert,
-        timeout=TIMEOUT,
-    )
-
-    r.raise_for_status()
+    with observe_upstream_request("oidc", "get_token"):
+        r = _request_with_retries(
+            "POST",
+            partial(
+                requests.post,
+                url=token_endpoint,
+                data={
+                    "grant_type": "authorization_code",
+                    "client_id": provider_config.client_id,
+                    "client_secret": provider_config.client_secret,
+                    "code": code,
+                    "redirect_uri": config.authentication.oidc_redirect_uri,
+                },
+                verify=provider_config.verify_cert,
+            ),
+        )
     return r.json()
 
 
@@ -121,7 +292,7 @@ def get_username(provider_id: str, id_token: str) -> tuple[str, str]:
 
         try:
             kid = unverified_header["kid"]
-            key = get_jwks(provider_id)[kid]
+            key = jwks_key_store.get_key(provider_id, kid)
         except KeyError as exc:
             raise InvalidJWTError("Invalid OIDC id_token") from exc
 
@@ -0,0 +1,266 @@
+"""
+Module for providing classes which protect the application from an upstream service that is failing or slow, so that
+requests which depend on the service fail fast instead of piling up, and requests which do not depend on it stay fast.
+
+It also provides the deadline of the request being handled, which bounds the time spent on the requests made to the
+upstream services while handling it including their retries, and the policy the retries are made with.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+import logging
+import random
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger()
+
+# The methods which can safely be repeated, so requests with them can be retried even if they may have been received
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# The status codes of responses to requests which are worth retrying, as the upstream service may be able to respond
+# to another attempt
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+# The monotonic time by which the request being handled has to be finished, or `None` outside of a request
+request_deadline_var: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def get_remaining_timeout(timeout: float) -> float:
+    """
+    Return the timeout to use for a request to an upstream service, which is cut short so that the request ends before
+    the deadline of the request being handled.
+
+    :param timeout: The timeout to use if there is no deadline or the deadline is further away.
+    :return: The timeout in seconds, which is zero or less if the deadline has passed.
+    """
+    deadline = request_deadline_var.get()
+    if deadline is None:
+        return timeout
+    return min(timeout, deadline - time.monotonic())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Policy for retrying requests to an upstream service with exponential backoff and full jitter, so that the clients
+    retrying at the same time spread their retries out rather than sending them together.
+    """
+
+    # The maximum number of times a request is retried after the first attempt
+    max_retries: int
+    # The upper bound of the delay before the first retry, which is doubled for each retry after that
+    backoff_seconds: float
+    # The upper bound of the delay before any retry
+    max_backoff_seconds: float = 2.0
+
+    def get_delay(self, retry: int) -> Optional[float]:
+        """
+        Return the number of seconds to wait before a retry, chosen at random up to the backoff of the retry.
+
+        :param retry: The number of the retry, starting at `0` for the first retry.
+        :return: The delay, or `None` if the request should not be retried because it has been retried `max_retries`
+            times or the deadline of the request being handled would pass during the delay.
+        """
+        if retry >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2**retry))  # noqa: S311
+        if get_remaining_timeout(float("inf")) <= delay:
+            return None
+        return delay
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware which sets the deadline of each request to `deadline_seconds` after it is received, so that the
+    requests made to the upstream services while handling it, and their retries, are given up on once the deadline has
+    passed rather than each being given their full timeout.
+    """
+
+    def __init__(self, app: ASGIApp, deadline_seconds: float) -> None:
+        self.app = app
+        self.deadline_seconds = deadline_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = request_deadline_var.set(time.monotonic() + self.deadline_seconds)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline_var.reset(token)
+
+
+@dataclass(frozen=True)
+class CallPermit:
+    """
+    Permission given by a circuit breaker to make a call, which is handed back with the result of the call.
+    """
+
+    # Whether the call is the trial call of a half-open circuit
+    is_trial: bool
+
+
+class CircuitBreaker:
+    """
+    Class for tracking the health of an upstream service and deciding whether calls to it should be made.
+
+    The circuit is closed while the calls succeed. After `failure_threshold` consecutive calls fail, it opens and no
+    calls are made for `open_seconds`. After that, a single trial call is let through while the circuit is half-open: the
+    circuit closes again if it succeeds and opens for another `open_seconds` if it fails.
+
+    The state is not shared between threads, so it must only be used from a single event loop.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float) -> None:
+        """
+        Initialise the circuit breaker, with the circuit closed.
+
+        :param name: The name of the upstream service, used in the log messages.
+        :param failure_threshold: The number of consecutive failed calls after which the circuit opens.
+        :param open_seconds: The number of seconds the circuit stays open for before a trial call is let through.
+        """
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._open_seconds = open_seconds
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Return whether the circuit is open or half-open, i.e. whether the service is considered to be unavailable.
+
+        :return: `True` if the circuit is open or half-open, `False` if it is closed.
+        """
+        return self._opened_at is not None
+
+    def allow_call(self) -> Optional[CallPermit]:
+        """
+        Return whether a call should be made. The permit of each allowed call must be passed to `record_result` with
+        the result of the call.
+
+        :return: A permit to make the call if the circuit is closed, or it is half-open and this is the trial call,
+            `None` otherwise.
+        """
+        if self._opened_at is None:
+            return CallPermit(is_trial=False)
+        if self._trial_in_progress or time.monotonic() - self._opened_at < self._open_seconds:
+            return None
+        self._trial_in_progress = True
+        return CallPermit(is_trial=True)
+
+    def record_result(self, permit: CallPermit, succeeded: Optional[bool]) -> None:
+        """
+        Record the result of a call which was allowed by `allow_call`. Only the trial call ends the trial, so that the
+        result of a call which was started before the circuit opened does not let another trial call through.
+
+        :param permit: The permit returned by `allow_call` for the call.
+        :param succeeded: Whether the call succeeded, or `None` if it ended without telling anything about the health of
+            the service, e.g. because it was cancelled.
+        """
+        if permit.is_trial:
+            self._trial_in_progress = False
+        if succeeded is None:
+            return
+
+        if succeeded:
+            self._consecutive_failures = 0
+            if self._opened_at is not None:
+                logger.info("Closing the circuit to %s as it has recovered", self._name)
+                self._opened_at = None
+            return
+
+        self._consecutive_failures += 1
+        if permit.is_trial or (self._opened_at is None and self._consecutive_failures >= self._failure_threshold):
+            logger.warning(
+                "Opening the circuit to %s for %s seconds after %s consecutive failed calls",
+                self._name,
+                self._open_seconds,
+                self._consecutive_failures,
+            )
+            self._opened_at = time.monotonic()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Class for limiting the number of concurrent calls to an upstream service, adapting the limit to how the service is
+    coping using additive increase, multiplicative decrease (AIMD).
+
+    The limit starts at `max_limit`. Each healthy call raises it by `1 / limit`, i.e. by one for each limit's worth of
+    healthy calls, up to `max_limit`. An unhealthy call, one which failed or was slow, multiplies it by `backoff_ratio`,
+    down to `min_limit`. Only the calls started after the last decrease can decrease it again, so that a burst of calls
+    which were all made to a struggling service only decreases it once.
+
+    The state is not shared between threads, so it must only be used from a single event loop.
+    """
+
+    def __init__(self, name: str, min_limit: int, max_limit: int, backoff_ratio: float = 0.5) -> None:
+        """
+        Initialise the limiter, with the limit at `max_limit`.
+
+        :param name: The name of the upstream service, used in the log messages.
+        :param min_limit: The lowest the limit can be decreased to.
+        :param max_limit: The highest the limit can be increased to.
+        :param backoff_ratio: The ratio the limit is multiplied by when a call is unhealthy.
+        """
+        self._name = name
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._backoff_ratio = backoff_ratio
+        self._limit = float(max_limit)
+        self._in_flight = 0
+        self._last_decrease_at = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        """
+        Return the current limit.
+
+        :return: The maximum number of concurrent calls.
+        """
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Return the number of calls in progress.
+
+        :return: The number of calls in progress.
+        """
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot for a call if the limit has not been reached. Each slot taken must be given back with `release`.
+
+        :return: `True` if a slot was taken, `False` if the limit has been reached.
+        """
+        if self._in_flight >= self.limit:
+            return False
+        self._in_flight += 1
+        return True
+
+    def release(self, started_at: float, healthy: Optional[bool]) -> None:
+        """
+        Give back the slot of a call and adapt the limit to how healthy the call was.
+
+        :param started_at: The monotonic time the call was started at.
+        :param healthy: Whether the call succeeded in good time, or `None` if it ended without telling anything about the
+            health of the service, in which case the limit is left as it is.
+        """
+        self._in_flight -= 1
+        if healthy is None:
+            return
+
+        if healthy:
+            self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+        elif started_at > self._last_decrease_at:
+            self._limit = max(self._min_limit, self._limit * self._backoff_ratio)
+            self._last_decrease_at = time.monotonic()
+            logger.warning("Decreased the limit of concurrent calls to %s to %s", self._name, self.limit)
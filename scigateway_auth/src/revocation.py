@@ -0,0 +1,285 @@
+"""
+Module for providing a class for storing which refresh tokens have been revoked or used.
+
+Revocations are stored in an SQLite database so that they are shared by all the worker processes, survive restarts and
+are looked up by index rather than by scanning a list. A single token is revoked by its ID (its `jti` claim, or the
+digest of the token for tokens issued without one), a family of tokens by the ID of the family, and all of a user's
+tokens by recording the time before which the tokens issued to them are no longer accepted. The refresh tokens which
+have been used are recorded in the same way, so that the reuse of a rotated refresh token can be detected. Entries are
+pruned once the tokens they apply to have expired, so the database only holds the entries that still matter.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+import jwt
+
+from scigateway_auth.common.config import config
+from scigateway_auth.common.exceptions import RevocationStoreError
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    token_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at ON revoked_tokens (expires_at);
+CREATE TABLE IF NOT EXISTS revoked_users (
+    username TEXT PRIMARY KEY,
+    revoked_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_users_expires_at ON revoked_users (expires_at);
+CREATE TABLE IF NOT EXISTS revoked_families (
+    family_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_families_expires_at ON revoked_families (expires_at);
+CREATE TABLE IF NOT EXISTS used_tokens (
+    token_id TEXT PRIMARY KEY,
+    used_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS used_tokens_expires_at ON used_tokens (expires_at);
+"""
+
+# The tables which are pruned of the entries for expired tokens
+PRUNED_TABLES = ("revoked_tokens", "revoked_users", "revoked_families", "used_tokens")
+
+
+def get_token_id(token: str, payload: dict[str, Any]) -> str:
+    """
+    Return the ID of a token, which is its `jti` claim, or the digest of the token if it was issued without one.
+
+    :param token: The token.
+    :param payload: The payload of the token.
+    :return: The ID of the token.
+    """
+    jti = payload.get("jti")
+    if isinstance(jti, str):
+        return jti
+    return "sha256:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationStore:
+    """
+    Class for revoking refresh tokens and checking whether they have been revoked, and for recording when they are used.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        token_validity_seconds: float,
+        prune_interval_seconds: float = 300.0,
+    ) -> None:
+        """
+        Initialise the store, creating the database if it does not exist and pruning the expired revocations.
+
+        :param path: The path to the SQLite database, whose directory is created if it does not exist, or `None` or
+            `:memory:` to only keep the revocations in the memory of this process.
+        :param token_validity_seconds: The number of seconds the tokens are valid for, after which the revocation of all
+            of a user's tokens no longer applies to any token.
+        :param prune_interval_seconds: The minimum number of seconds between the prunes of the expired entries made when
+            recording the use of a token.
+        :raises RevocationStoreError: If the database cannot be opened or created.
+        """
+        self._token_validity_seconds = token_validity_seconds
+        self._prune_interval_seconds = prune_interval_seconds
+        self._next_prune = 0.0
+        # The connection is shared by the threads of this process, which take turns using it
+        self._lock = threading.Lock()
+        path = path or ":memory:"
+        try:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Autocommit mode, each statement is its own transaction
+            self._connection = sqlite3.connect(
+                path,
+                timeout=5.0,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            if path != ":memory:":
+                # Let readers carry on while another process is writing
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+        except (OSError, sqlite3.Error) as exc:
+            raise RevocationStoreError(f"Cannot open revocation store at {path}: {exc}") from exc
+        self.prune()
+
+    def revoke_token(self, token_id: str, expires_at: float) -> None:
+        """
+        Revoke a token.
+
+        :param token_id: The ID of the token.
+        :param expires_at: The time the token expires at, in seconds since the epoch, after which the revocation can be
+            pruned.
+        :raises RevocationStoreError: If the revocation cannot be stored.
+        """
+        logger.info("Revoking token %s", token_id)
+        self._execute(
+            "INSERT INTO revoked_tokens (token_id, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (token_id) DO UPDATE SET expires_at = max(expires_at, excluded.expires_at)",
+            (token_id, expires_at),
+        )
+        self.prune()
+
+    def revoke_family(self, family_id: str, expires_at: float) -> None:
+        """
+        Revoke a family of tokens, which are the tokens rotated from the same token.
+
+        :param family_id: The ID of the family.
+        :param expires_at: The time the last token of the family expires at, in seconds since the epoch, after which the
+            revocation can be pruned.
+        :raises RevocationStoreError: If the revocation cannot be stored.
+        """
+        logger.info("Revoking token family %s", family_id)
+        self._execute(
+            "INSERT INTO revoked_families (family_id, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (family_id) DO UPDATE SET expires_at = max(expires_at, excluded.expires_at)",
+            (family_id, expires_at),
+        )
+        self.prune()
+
+    def revoke_user(self, username: str) -> None:
+        """
+        Revoke all the tokens issued to a user up to now.
+
+        :param username: The username of the user.
+        :raises RevocationStoreError: If the revocation cannot be stored.
+        """
+        logger.info("Revoking all the tokens of user %s", username)
+        # `iat` is in whole seconds, so tokens issued later in the same second as the revocation are revoked as well
+        revoked_at = float(int(time.time()))
+        self._execute(
+            "INSERT INTO revoked_users (username, revoked_at, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET revoked_at = excluded.revoked_at, expires_at = excluded.expires_at",
+            (username, revoked_at, revoked_at + self._token_validity_seconds),
+        )
+        self.prune()
+
+    def is_revoked(
+        self,
+        token_id: str,
+        username: str,
+        issued_at: Optional[float],
+        family_id: Optional[str] = None,
+    ) -> bool:
+        """
+        Check whether a token has been revoked, either on its own, together with the other tokens of its family or
+        together with all the other tokens of its user.
+
+        :param token_id: The ID of the token.
+        :param username: The username of the user the token was issued to.
+        :param issued_at: The time the token was issued at, in seconds since the epoch, or `None` if it is unknown, in
+            which case it is treated as having been issued before any revocation of the user's tokens.
+        :param family_id: The ID of the family of the token, or `None` if it does not belong to one.
+        :raises RevocationStoreError: If the revocations cannot be read.
+        :return: `True` if the token has been revoked, `False` otherwise.
+        """
+        rows, _ = self._execute(
+            "SELECT EXISTS (SELECT 1 FROM revoked_tokens WHERE token_id = ?) "
+            "OR EXISTS (SELECT 1 FROM revoked_families WHERE family_id = ?) "
+            "OR EXISTS (SELECT 1 FROM revoked_users WHERE username = ? AND revoked_at >= ?)",
+            (token_id, family_id, username, issued_at if issued_at is not None else 0.0),
+        )
+        return bool(rows[0][0])
+
+    def use_token(self, token_id: str, expires_at: float) -> Optional[float]:
+        """
+        Record that a token has been used, unless it has been used before.
+
+        :param token_id: The ID of the token.
+        :param expires_at: The time the token expires at, in seconds since the epoch, after which the record can be
+            pruned.
+        :raises RevocationStoreError: If the use cannot be recorded.
+        :return: The time the token was first used at, in seconds since the epoch, if it has been used before, or `None`
+            if this is its first use.
+        """
+        # A use is recorded on every refresh, so the expired uses are pruned from time to time here rather than only when
+        # a token is revoked, which may rarely happen
+        if time.monotonic() >= self._next_prune:
+            self.prune()
+
+        # Inserting is atomic across the worker processes, so only one of them can record the first use of a token
+        _, inserted = self._execute(
+            "INSERT INTO used_tokens (token_id, used_at, expires_at) VALUES (?, ?, ?) ON CONFLICT (token_id) DO NOTHING",
+            (token_id, time.time(), expires_at),
+        )
+        if inserted:
+            return None
+        rows, _ = self._execute("SELECT used_at FROM used_tokens WHERE token_id = ?", (token_id,))
+        # The record may have just been pruned, in which case the token has expired and cannot be used anyway
+        return rows[0][0] if rows else None
+
+    def release_token(self, token_id: str) -> None:
+        """
+        Delete the record of the use of a token, so that it can be used again as if it had not been used.
+
+        :param token_id: The ID of the token.
+        :raises RevocationStoreError: If the record cannot be deleted.
+        """
+        self._execute("DELETE FROM used_tokens WHERE token_id = ?", (token_id,))
+
+    def prune(self) -> None:
+        """
+        Delete the entries which no longer apply to any token because the tokens have expired.
+
+        :raises RevocationStoreError: If the entries cannot be deleted.
+        """
+        self._next_prune = time.monotonic() + self._prune_interval_seconds
+        now = time.time()
+        for table in PRUNED_TABLES:
+            _, deleted = self._execute(f"DELETE FROM {table} WHERE expires_at < ?", (now,))  # noqa: S608
+            if deleted:
+                logger.info("Pruned %s expired entries from %s", deleted, table)
+
+    def _execute(self, sql: str, parameters: tuple) -> tuple[list[tuple], int]:
+        """
+        Execute an SQL statement.
+
+        :param sql: The SQL statement.
+        :param parameters: The parameters of the SQL statement.
+        :raises RevocationStoreError: If the statement fails.
+        :return: The rows returned by the statement and the number of rows it modified.
+        """
+        try:
+            with self._lock:
+                cursor = self._connection.execute(sql, parameters)
+                return cursor.fetchall(), cursor.rowcount
+        except sqlite3.Error as exc:
+            raise RevocationStoreError(f"Revocation store error: {exc}") from exc
+
+
+def _import_blacklist(store: RevocationStore, blacklist: list[str]) -> None:
+    """
+    Revoke the refresh tokens in the deprecated blacklist configuration.
+
+    :param store: The store to revoke the tokens in.
+    :param blacklist: The blacklisted refresh tokens.
+    """
+    for token in blacklist:
+        try:
+            payload = jwt.decode(token, options={"verify_signature": False})
+        except jwt.InvalidTokenError:
+            logger.warning("Ignoring a blacklisted refresh token which cannot be decoded")
+            continue
+        store.revoke_token(get_token_id(token, payload), payload.get("exp", float("inf")))
+
+
+try:
+    revocation_store = RevocationStore(
+        config.authentication.revocation_store_path,
+        config.authentication.refresh_token_validity_days * 24 * 60 * 60,
+        config.authentication.revocation_store_prune_interval_seconds,
+    )
+    _import_blacklist(revocation_store, config.authentication.jwt_refresh_token_blacklist)
+except RevocationStoreError as exc:
+    sys.exit(str(exc))
@@ -0,0 +1,124 @@
+"""
+Module for providing a class for caching the usernames of ICAT sessions.
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from scigateway_auth.common.config import config
+from scigateway_auth.src.metrics import CACHE_LOOKUPS
+
+
+class SessionUsernameCache:
+    """
+    Bounded least recently used cache of the usernames of ICAT sessions, so that looking up the username of the same
+    session again does not send a request to ICAT.
+
+    Entries are keyed by the SHA-256 digest of the session ID so that the session IDs themselves are not held in memory.
+    An entry expires `ttl_seconds` after it was added or its session was last refreshed, which should be the lifetime of
+    the ICAT sessions, and is removed as soon as its session fails to be refreshed.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        """
+        Initialise the cache.
+
+        :param max_size: The maximum number of entries to hold. A value of `0` disables the cache.
+        :param ttl_seconds: The number of seconds an entry is held for after it was added or its session was refreshed.
+        """
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # The monotonic time each entry expires at and the username, ordered from least to most recently used
+        self._entries: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Return the username of a session if it is in the cache and has not expired.
+
+        :param session_id: The ICAT session ID.
+        :return: The username, or `None` if it is not in the cache.
+        """
+        digest = _get_digest(session_id)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                CACHE_LOOKUPS.labels("session_username", "miss").inc()
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            CACHE_LOOKUPS.labels("session_username", "hit").inc()
+            return entry[1]
+
+    def put(self, session_id: str, username: str) -> None:
+        """
+        Add the username of a session to the cache, evicting the least recently used entry if the cache is full.
+
+        :param session_id: The ICAT session ID.
+        :param username: The username of the user the session belongs to.
+        """
+        if self._max_size <= 0:
+            return
+
+        digest = _get_digest(session_id)
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + self._ttl_seconds, username)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def extend(self, session_id: str) -> None:
+        """
+        Extend the expiry of the entry of a session which has been refreshed, if it is in the cache.
+
+        :param session_id: The ICAT session ID.
+        """
+        digest = _get_digest(session_id)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries[digest] = (time.monotonic() + self._ttl_seconds, entry[1])
+
+    def invalidate(self, session_id: str) -> None:
+        """
+        Remove the entry of a session, e.g. because it could not be refreshed and may no longer exist.
+
+        :param session_id: The ICAT session ID.
+        """
+        with self._lock:
+            self._entries.pop(_get_digest(session_id), None)
+
+    def clear(self) -> None:
+        """
+        Remove all the entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+def _get_digest(session_id: str) -> bytes:
+    """
+    Return the digest of a session ID to be used as its key in the cache.
+
+    :param session_id: The ICAT session ID.
+    :return: The SHA-256 digest of the session ID.
+    """
+    return hashlib.sha256(session_id.encode()).digest()
+
+
+session_username_cache = SessionUsernameCache(
+    config.icat_server.session_username_cache_size,
+    config.icat_server.session_lifetime_minutes * 60,
+)
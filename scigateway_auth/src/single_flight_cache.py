@@ -0,0 +1,374 @@
+"""
+Module for providing decorators for caching the results of slow calls, such as fetches from an OIDC provider, with
+request coalescing and background refreshes, and for coalescing the calls of coroutine functions, such as requests to
+ICAT, and caching their results for a short time.
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+import functools
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+from scigateway_auth.src.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger()
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class _CacheEntry(Generic[T]):
+    """
+    A cached result together with the monotonic time at which it expires.
+    """
+
+    value: T
+    expires_at: float
+
+
+class SingleFlightTTLCache(Generic[T]):
+    """
+    Cache of the results of a function, keyed by its positional arguments, which are held for `ttl_seconds`.
+
+    - Only one call of the function runs per key at a time. Callers which miss the cache while a call is in progress
+      wait for its result rather than making their own call.
+    - Once a result is within `refresh_ahead_seconds` of expiring, it is refreshed in a background thread while callers
+      continue to be given the current result.
+    - For `stale_seconds` after a result has expired, callers are given the expired result while it is refreshed in the
+      background. This also keeps the previous result in use while the refreshes fail.
+
+    Callers only wait for the function when there is no result or the result is older than the stale window.
+    """
+
+    def __init__(
+        self,
+        function: Callable[..., T],
+        ttl_seconds: float,
+        refresh_ahead_seconds: float,
+        stale_seconds: float,
+    ) -> None:
+        """
+        Initialise the cache.
+
+        :param function: The function whose results to cache.
+        :param ttl_seconds: The number of seconds a result is fresh for.
+        :param refresh_ahead_seconds: The number of seconds before a result expires at which to refresh it.
+        :param stale_seconds: The number of seconds after a result expires for which it may still be returned while it
+            is refreshed.
+        """
+        functools.update_wrapper(self, function)
+        self._function = function
+        self._name = getattr(function, "__name__", repr(function))
+        self._ttl_seconds = ttl_seconds
+        self._refresh_ahead_seconds = refresh_ahead_seconds
+        self._stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, _CacheEntry[T]] = {}
+        self._in_flight: dict[Hashable, Future] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def __call__(self, *args: Any) -> T:
+        """
+        Return the cached result of calling the function with the given arguments, calling it if there is no usable
+        result.
+
+        :param args: The positional arguments to call the function with.
+        :return: The result of the function.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(args)
+            if entry is not None and now < entry.expires_at + self._stale_seconds:
+                if now >= entry.expires_at - self._refresh_ahead_seconds and args not in self._in_flight:
+                    future = Future()
+                    self._in_flight[args] = future
+                    self.refreshes += 1
+                    threading.Thread(target=self._refresh, args=(args, future), daemon=True).start()
+
+                if now < entry.expires_at:
+                    self.hits += 1
+                    CACHE_LOOKUPS.labels(self._name, "hit").inc()
+                else:
+                    self.stale_hits += 1
+                    CACHE_LOOKUPS.labels(self._name, "stale_hit").inc()
+                return entry.value
+
+            self.misses += 1
+            CACHE_LOOKUPS.labels(self._name, "miss").inc()
+            future, is_leader = self._join_or_start_call(args)
+
+        if is_leader:
+            self._call(args, future)
+        return future.result()
+
+    def refresh(self, *args: Any) -> T:
+        """
+        Call the function with the given arguments and cache its result regardless of whether there is a usable result,
+        joining a call which is already in progress rather than making another one.
+
+        :param args: The positional arguments to call the function with.
+        :return: The result of the function.
+        """
+        with self._lock:
+            future, is_leader = self._join_or_start_call(args)
+
+        if is_leader:
+            self._call(args, future)
+        return future.result()
+
+    def cache_clear(self) -> None:
+        """
+        Remove all the cached results. Calls which are in progress are not affected.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _join_or_start_call(self, args: tuple) -> tuple[Future, bool]:
+        """
+        Return the future of the call with the given arguments which is in progress, or register a new one which the
+        caller must then make. This must be called while holding the lock.
+
+        :param args: The positional arguments to call the function with.
+        :return: The future of the call and whether the caller must make the call.
+        """
+        future = self._in_flight.get(args)
+        if future is not None:
+            return future, False
+
+        future = Future()
+        self._in_flight[args] = future
+        return future, True
+
+    def _refresh(self, args: tuple, future: Future) -> None:
+        """
+        Refresh the cached result for the given arguments in the background, logging any error.
+
+        :param args: The positional arguments to call the function with.
+        :param future: The future to set the result of the call on.
+        """
+        self._call(args, future)
+        if future.exception() is not None:
+            logger.error(
+                "Failed to refresh the cached result of %s, the previous result is still in use",
+                self._name,
+                exc_info=future.exception(),
+            )
+
+    def _call(self, args: tuple, future: Future) -> None:
+        """
+        Call the function, cache the result and set it on the future that other callers are waiting on.
+
+        :param args: The positional arguments to call the function with.
+        :param future: The future to set the result of the call on.
+        """
+        try:
+            value = self._function(*args)
+        except Exception as exc:
+            with self._lock:
+                self.errors += 1
+                del self._in_flight[args]
+            future.set_exception(exc)
+            return
+
+        with self._lock:
+            self._entries[args] = _CacheEntry(value, time.monotonic() + self._ttl_seconds)
+            del self._in_flight[args]
+        future.set_result(value)
+
+
+def single_flight_ttl_cache(
+    ttl_seconds: float,
+    refresh_ahead_seconds: float = 0.0,
+    stale_seconds: float = 0.0,
+) -> Callable[[Callable[..., T]], SingleFlightTTLCache[T]]:
+    """
+    Decorator for caching the results of a function in a `SingleFlightTTLCache`.
+
+    :param ttl_seconds: The number of seconds a result is fresh for.
+    :param refresh_ahead_seconds: The number of seconds before a result expires at which to refresh it.
+    :param stale_seconds: The number of seconds after a result expires for which it may still be returned while it is
+        refreshed.
+    :return: The decorator.
+    """
+
+    def decorator(function: Callable[..., T]) -> SingleFlightTTLCache[T]:
+        return SingleFlightTTLCache(function, ttl_seconds, refresh_ahead_seconds, stale_seconds)
+
+    return decorator
+
+
+class AsyncSingleFlightTTLCache(Generic[T]):
+    """
+    Cache of the results of a coroutine function, keyed by its positional arguments, which are held for `ttl_seconds`.
+
+    - Only one call of the function runs per key at a time. Callers which miss the cache while a call is in progress
+      await its result rather than making their own call, and get its exception if it fails. Failed calls are not
+      cached. Each call runs in its own task, so a caller which is cancelled does not cancel it for the others.
+    - Once a result is within `refresh_ahead_seconds` of expiring, it is refreshed in a background task while callers
+      continue to be given the current result.
+    - For `stale_seconds` after a result has expired, callers are given the expired result while it is refreshed in the
+      background. This also keeps the previous result in use while the refreshes fail.
+
+    The calls are coalesced within the event loop of the process, so it must only be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        function: Callable[..., Awaitable[T]],
+        ttl_seconds: float,
+        refresh_ahead_seconds: float,
+        stale_seconds: float,
+    ) -> None:
+        """
+        Initialise the cache.
+
+        :param function: The coroutine function whose results to cache.
+        :param ttl_seconds: The number of seconds a result is fresh for.
+        :param refresh_ahead_seconds: The number of seconds before a result expires at which to refresh it.
+        :param stale_seconds: The number of seconds after a result expires for which it may still be returned while it
+            is refreshed.
+        """
+        functools.update_wrapper(self, function)
+        self._function = function
+        self._name = getattr(function, "__name__", repr(function))
+        self._ttl_seconds = ttl_seconds
+        self._refresh_ahead_seconds = refresh_ahead_seconds
+        self._stale_seconds = stale_seconds
+        # Ordered by expiry, as every result is held for the same time
+        self._entries: OrderedDict[Hashable, _CacheEntry[T]] = OrderedDict()
+        # The calls in progress, which also keeps a reference to their tasks as the event loop only keeps weak ones
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    async def __call__(self, *args: Any) -> T:
+        """
+        Return the cached result of calling the function with the given arguments, calling it if there is no usable
+        result and no call in progress.
+
+        :param args: The positional arguments to call the function with.
+        :return: The result of the function.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(args)
+        if entry is not None and now < entry.expires_at + self._stale_seconds:
+            if now >= entry.expires_at - self._refresh_ahead_seconds and args not in self._in_flight:
+                self.refreshes += 1
+                self._start_call(args).add_done_callback(self._log_refresh_error)
+
+            if now < entry.expires_at:
+                self.hits += 1
+                CACHE_LOOKUPS.labels(self._name, "hit").inc()
+            else:
+                self.stale_hits += 1
+                CACHE_LOOKUPS.labels(self._name, "stale_hit").inc()
+            return entry.value
+
+        task = self._in_flight.get(args)
+        if task is not None:
+            self.coalesced += 1
+            CACHE_LOOKUPS.labels(self._name, "coalesced").inc()
+        else:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(self._name, "miss").inc()
+            task = self._start_call(args)
+        # Shielded so that a caller which is cancelled, including the one which started the call, does not cancel the
+        # call for the other callers
+        return await asyncio.shield(task)
+
+    def cache_clear(self) -> None:
+        """
+        Remove all the cached results. Calls which are in progress are not affected.
+        """
+        self._entries.clear()
+
+    def _start_call(self, args: tuple) -> asyncio.Task:
+        """
+        Start a call with the given arguments in its own task and register it as in progress, so that other callers
+        wait for it rather than making their own call.
+
+        :param args: The positional arguments to call the function with.
+        :return: The task running the call.
+        """
+        task = asyncio.create_task(self._call(args))
+        self._in_flight[args] = task
+        return task
+
+    def _log_refresh_error(self, task: asyncio.Task) -> None:
+        """
+        Log the error of a call which refreshed a cached result in the background.
+
+        :param task: The task which ran the call.
+        """
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Failed to refresh the cached result of %s, the previous result is still in use",
+                self._name,
+                exc_info=task.exception(),
+            )
+
+    async def _call(self, args: tuple) -> T:
+        """
+        Call the function and cache the result.
+
+        :param args: The positional arguments to call the function with.
+        :return: The result of the function.
+        """
+        try:
+            value = await self._function(*args)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            del self._in_flight[args]
+
+        self._entries.pop(args, None)
+        self._entries[args] = _CacheEntry(value, time.monotonic() + self._ttl_seconds)
+        self._prune()
+        return value
+
+    def _prune(self) -> None:
+        """
+        Remove the cached results which can no longer be returned, so that the cache does not grow with keys which are
+        not used again.
+        """
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now < entry.expires_at + self._stale_seconds:
+                break
+            del self._entries[key]
+
+
+def async_single_flight_ttl_cache(
+    ttl_seconds: float,
+    refresh_ahead_seconds: float = 0.0,
+    stale_seconds: float = 0.0,
+) -> Callable[[Callable[..., Awaitable[T]]], AsyncSingleFlightTTLCache[T]]:
+    """
+    Decorator for caching the results of a coroutine function in an `AsyncSingleFlightTTLCache`.
+
+    :param ttl_seconds: The number of seconds a result is fresh for.
+    :param refresh_ahead_seconds: The number of seconds before a result expires at which to refresh it.
+    :param stale_seconds: The number of seconds after a result expires for which it may still be returned while it is
+        refreshed.
+    :return: The decorator.
+    """
+
+    def decorator(function: Callable[..., Awaitable[T]]) -> AsyncSingleFlightTTLCache[T]:
+        return AsyncSingleFlightTTLCache(function, ttl_seconds, refresh_ahead_seconds, stale_seconds)
+
+    return decorator
@@ -0,0 +1,139 @@
+"""
+Module for providing a class for caching the payloads of JWTs that have already been verified.
+"""
+
+from collections import OrderedDict
+import hashlib
+import heapq
+import threading
+import time
+from typing import Any, Optional
+
+from scigateway_auth.common.config import config
+from scigateway_auth.src.metrics import CACHE_LOOKUPS
+
+
+class VerifiedTokenCache:
+    """
+    Bounded least recently used cache of the payloads of verified JWTs.
+
+    Entries are keyed by the SHA-256 digest of the token so that the tokens themselves are not held in memory, and an
+    entry is never returned at or after the token's own `exp`. The cache is cleared whenever the version of the keys
+    used to verify the tokens changes so that tokens signed by a replaced key are verified again.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Initialise the cache.
+
+        :param max_size: The maximum number of entries to hold. A value of `0` disables the cache.
+        """
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[bytes, tuple[float, dict[str, Any]]] = OrderedDict()
+        # Min-heap of (exp, digest) used to evict entries once their tokens expire
+        self._expiry_heap: list[tuple[float, bytes]] = []
+        self._key_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str, key_version: int) -> Optional[dict[str, Any]]:
+        """
+        Return a copy of the payload of a previously verified token if it has not expired.
+
+        :param token: The JWT token to look up.
+        :param key_version: The version of the keys the token is being verified with.
+        :return: A copy of the token's payload, or `None` if it is not in the cache.
+        """
+        digest = _get_digest(token)
+        with self._lock:
+            if key_version != self._key_version:
+                self._clear(key_version)
+
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                CACHE_LOOKUPS.labels("verified_token", "miss").inc()
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            CACHE_LOOKUPS.labels("verified_token", "hit").inc()
+            return dict(entry[1])
+
+    def put(self, token: str, payload: dict[str, Any], key_version: int) -> None:
+        """
+        Add the payload of a verified token to the cache. Tokens without a numeric `exp` claim are not cached.
+
+        :param token: The verified JWT token.
+        :param payload: The payload of the verified token.
+        :param key_version: The version of the keys the token was verified with.
+        """
+        exp = payload.get("exp")
+        if self._max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+
+        digest = _get_digest(token)
+        with self._lock:
+            if key_version != self._key_version:
+                self._clear(key_version)
+
+            self._evict_expired(time.time())
+            self._entries[digest] = (exp, dict(payload))
+            self._entries.move_to_end(digest)
+            heapq.heappush(self._expiry_heap, (exp, digest))
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+            # Entries evicted as least recently used leave stale items in the heap, so rebuild it when it gets too big
+            if len(self._expiry_heap) > 2 * self._max_size:
+                self._expiry_heap = [(entry_exp, key) for key, (entry_exp, _) in self._entries.items()]
+                heapq.heapify(self._expiry_heap)
+
+    def clear(self) -> None:
+        """
+        Remove all the entries from the cache.
+        """
+        with self._lock:
+            self._clear(self._key_version)
+
+    def _clear(self, key_version: Optional[int]) -> None:
+        """
+        Remove all the entries from the cache and record the version of the keys the new entries are verified with. The
+        lock must be held when calling this method.
+
+        :param key_version: The version of the keys the new entries are verified with.
+        """
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._key_version = key_version
+
+    def _evict_expired(self, now: float) -> None:
+        """
+        Remove the entries whose tokens have expired. The lock must be held when calling this method.
+
+        :param now: The current time as a UNIX timestamp.
+        """
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            exp, digest = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] == exp:
+                del self._entries[digest]
+
+
+def _get_digest(token: str) -> bytes:
+    """
+    Return the digest of a token to be used as its key in the cache.
+
+    :param token: The JWT token.
+    :return: The SHA-256 digest of the token.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+verified_token_cache = VerifiedTokenCache(config.authentication.verified_token_cache_size)
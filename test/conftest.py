@@ -0,0 +1,15 @@
+"""
+Fixtures shared by the tests.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    """
+    Fixture which makes the tests marked with `pytest.mark.anyio` run on the asyncio event loop only.
+
+    :return: The name of the backend to run the async tests on.
+    """
+    return "asyncio"
@@ -2,15 +2,22 @@
 Unit tests for the `ICATAuthenticator` class.
 """
 
-from unittest.mock import Mock, patch
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock, patch
 
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import httpx
 import pytest
 
-from scigateway_auth.common.config import config
-from scigateway_auth.common.exceptions import ICATAuthenticationError
+from scigateway_auth.common.exceptions import ICATAuthenticationError, ICATUnavailableError
+from scigateway_auth.routers import authentication as authentication_router
 from scigateway_auth.src.authentication import ICATAuthenticator
+from scigateway_auth.src.session_cache import session_username_cache
 
 
+@pytest.mark.anyio
 class TestICATAuthenticator:
     """
     Test suite for the `ICATAuthenticator` class.
@@ -22,6 +29,16 @@ class TestICATAuthenticator:
     session_id = "test-session-id"
     credentials = {"username": username, "password": password}
 
+    @pytest.fixture(autouse=True)
+    def clear_refresh_cache(self) -> None:
+        """
+        Fixture which clears the cached session refreshes, authenticators and usernames so that each test sends its own
+        requests.
+        """
+        ICATAuthenticator.refresh.cache_clear()
+        ICATAuthenticator.get_authenticator_catalogue.cache_clear()
+        session_username_cache.clear()
+
     def create_mock_response(self, status_code: int, json_data: dict = None) -> Mock:
         """
         Helper function to create a mock response with a given status code and JSON data.
@@ -35,79 +52,234 @@ class TestICATAuthenticator:
         mock_response.json.return_value = json_data
         return mock_response
 
-    @patch("requests.post")
-    def test_authenticate_success(self, mock_post):
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_authenticate_success(self, mock_request):
         """
         Test that `authenticate` method successfully returns a session ID when authentication is successful.
         """
-        mock_post.return_value = self.create_mock_response(200, {"sessionId": self.session_id})
-        session_id = ICATAuthenticator.authenticate(self.mnemonic, self.credentials)
+        mock_request.return_value = self.create_mock_response(200, {"sessionId": self.session_id})
+        session_id = await ICATAuthenticator.authenticate(self.mnemonic, self.credentials)
         assert session_id == self.session_id
 
-    @patch("requests.post")
-    def test_authenticate_failure(self, mock_post):
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_authenticate_failure(self, mock_request):
         """
         Test that `authenticate` method raises an `ICATAuthenticationError` on authentication failure.
         """
         json_data = {"code": "SESSION", "message": "Error logging in. Please try again later"}
-        mock_post.return_value = self.create_mock_response(400, json_data)
+        mock_request.return_value = self.create_mock_response(400, json_data)
         with pytest.raises(ICATAuthenticationError) as exc:
-            ICATAuthenticator.authenticate(self.mnemonic, self.credentials)
+            await ICATAuthenticator.authenticate(self.mnemonic, self.credentials)
         assert str(exc.value) == json_data["message"]
 
-    @patch("requests.get")
-    def test_get_username_success(self, mock_get):
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_get_username_success(self, mock_request):
         """
         Test that `get_username` method successfully returns the username when provided a valid session ID.
         """
-        mock_get.return_value = self.create_mock_response(200, {"userName": self.username, "remainingMinutes": 60})
-        username = ICATAuthenticator.get_username(self.session_id)
+        mock_request.return_value = self.create_mock_response(200, {"userName": self.username, "remainingMinutes": 60})
+        username = await ICATAuthenticator.get_username(self.session_id)
         assert username == self.username
 
-    @patch("requests.get")
-    def test_get_username_failure(self, mock_get):
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_get_username_failure(self, mock_request):
         """
         Test that `get_username` method raises an `ICATAuthenticationError` when the session ID is invalid.
         """
         json_data = {"code": "SESSION", "message": f"Unable to find user by sessionid: {self.username}"}
-        mock_get.return_value = self.create_mock_response(400, json_data)
+        mock_request.return_value = self.create_mock_response(400, json_data)
         with pytest.raises(ICATAuthenticationError) as exc:
-            ICATAuthenticator.get_username("mocked_session_id")
+            await ICATAuthenticator.get_username("mocked_session_id")
         assert str(exc.value) == json_data["message"]
 
-    @patch("requests.get")
-    def test_get_authenticators(self, mock_get):
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_get_username_cached(self, mock_request):
+        """
+        Test that `get_username` method only sends a request to ICAT the first time the username of a session is
+        retrieved.
+        """
+        mock_request.side_effect = [
+            self.create_mock_response(200, {"userName": self.username}),
+            self.create_mock_response(200, {"userName": "other-username"}),
+        ]
+
+        assert await ICATAuthenticator.get_username(self.session_id) == self.username
+        assert await ICATAuthenticator.get_username(self.session_id) == self.username
+        assert await ICATAuthenticator.get_username("other-session-id") == "other-username"
+
+        assert mock_request.await_count == 2
+
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_get_authenticators(self, mock_request):
         """
         Test that `get_authenticators` method returns a list of authenticators when the request is successful.
         """
         json_data = {"authenticators": [{"mnemonic": "anon", "keys": []}]}
-        mock_get.return_value = self.create_mock_response(200, json_data)
-        authenticators = ICATAuthenticator.get_authenticators()
+        mock_request.return_value = self.create_mock_response(200, json_data)
+        authenticators = await ICATAuthenticator.get_authenticators()
         assert authenticators == json_data["authenticators"]
 
-    @patch("requests.put")
-    def test_refresh_success(self, mock_put):
+    @pytest.mark.parametrize(
+        "request_kwargs",
+        [
+            pytest.param({"side_effect": httpx.ConnectError("test-error")}, id="connection error"),
+            pytest.param({"return_value": Mock(json=Mock(return_value={"message": "test-error"}))}, id="bad response"),
+        ],
+    )
+    async def test_get_authenticators_failure(self, request_kwargs):
+        """
+        Test that `get_authenticators` method raises an `ICATAuthenticationError` when ICAT cannot be reached or does not
+        list the authenticators.
+        """
+        with patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock, **request_kwargs):
+            with pytest.raises(ICATAuthenticationError) as exc:
+                await ICATAuthenticator.get_authenticators()
+        assert str(exc.value) == "Failed to retrieve authenticators"
+
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_get_authenticator_catalogue(self, mock_request):
+        """
+        Test that `get_authenticator_catalogue` method serialises the authenticators and caches them.
+        """
+        json_data = {"authenticators": [{"mnemonic": "anon", "keys": []}]}
+        mock_request.return_value = self.create_mock_response(200, json_data)
+
+        catalogue = await ICATAuthenticator.get_authenticator_catalogue()
+
+        assert catalogue.content == b'[{"mnemonic":"anon","keys":[]}]'
+        assert catalogue.etag.startswith('"') and len(catalogue.etag) == 66
+        assert await ICATAuthenticator.get_authenticator_catalogue() is catalogue
+        mock_request.assert_awaited_once_with("GET", "/properties")
+
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_get_authenticator_catalogue_stale(self, mock_request):
+        """
+        Test that `get_authenticator_catalogue` method returns the expired authenticators while ICAT cannot be reached.
+        """
+        json_data = {"authenticators": [{"mnemonic": "anon", "keys": []}]}
+        mock_request.return_value = self.create_mock_response(200, json_data)
+        catalogue = await ICATAuthenticator.get_authenticator_catalogue()
+        mock_request.side_effect = httpx.ConnectError("test-error")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 600):
+            assert await ICATAuthenticator.get_authenticator_catalogue() is catalogue
+            # Let the background refresh fail, the event loop's clock being patched too
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert mock_request.await_count == 2
+            assert await ICATAuthenticator.get_authenticator_catalogue() is catalogue
+
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_refresh_success(self, mock_request):
         """
         Test that `refresh` method successfully completes without errors when the session ID is valid.
         """
-        mock_put.return_value = self.create_mock_response(204, {})
-        ICATAuthenticator.refresh(self.session_id)
+        mock_request.return_value = self.create_mock_response(204, {})
+        await ICATAuthenticator.refresh(self.session_id)
 
-        mock_put.assert_called_once_with(
-            f"{config.icat_server.url}/session/{self.session_id}",
-            verify=config.icat_server.certificate_validation,
-            timeout=config.icat_server.request_timeout_seconds,
-        )
+        mock_request.assert_awaited_once_with("PUT", f"/session/{self.session_id}")
+
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_refresh_concurrent(self, mock_request):
+        """
+        Test that concurrent and recent refreshes of the same session ID share one request to ICAT.
+        """
+        mock_request.return_value = self.create_mock_response(204, {})
+
+        await asyncio.gather(*(ICATAuthenticator.refresh(self.session_id) for _ in range(5)))
+        await ICATAuthenticator.refresh(self.session_id)
+
+        mock_request.assert_awaited_once_with("PUT", f"/session/{self.session_id}")
 
-    @patch("requests.put")
-    def test_refresh_failure(self, mock_put):
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_refresh_failure(self, mock_request):
         """
         Test that `refresh` method raises an `ICATAuthenticationError` when the session ID is invalid.
         """
-        mock_put.return_value = self.create_mock_response(
+        mock_request.return_value = self.create_mock_response(
             403,
             {"code": "SESSION", "message": "Unable to find user by sessionid: invalid-session-id"},
         )
         with pytest.raises(ICATAuthenticationError) as exc:
-            ICATAuthenticator.refresh("invalid-session-id")
+            await ICATAuthenticator.refresh("invalid-session-id")
         assert str(exc.value) == "The session ID was unable to be refreshed"
+
+    @patch("scigateway_auth.src.authentication.icat_client.request", new_callable=AsyncMock)
+    async def test_refresh_failure_invalidates_username(self, mock_request):
+        """
+        Test that the cached username of a session is removed when the session cannot be refreshed, so that it is looked
+        up on ICAT again.
+        """
+        session_username_cache.put(self.session_id, self.username)
+        mock_request.return_value = self.create_mock_response(403, {"code": "SESSION", "message": "Session expired"})
+
+        with pytest.raises(ICATAuthenticationError):
+            await ICATAuthenticator.refresh(self.session_id)
+
+        assert session_username_cache.get(self.session_id) is None
+
+
+class TestAuthenticatorsRoute:
+    """
+    Unit tests for the route returning the list of ICAT authenticators.
+    """
+
+    authenticators = [{"mnemonic": "anon", "keys": []}]
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        """
+        Fixture which creates a test client for an app with the authentication routes, with no cached authenticators.
+
+        :return: The test client.
+        """
+        ICATAuthenticator.get_authenticator_catalogue.cache_clear()
+        app = FastAPI()
+        app.include_router(authentication_router.router)
+        return TestClient(app)
+
+    @patch("scigateway_auth.src.authentication.ICATAuthenticator.get_authenticators", new_callable=AsyncMock)
+    def test_get_authenticators(self, mock_get_authenticators, client):
+        """
+        Test that the authenticators are returned with their entity tag, and are only fetched from ICAT once.
+        """
+        mock_get_authenticators.return_value = self.authenticators
+
+        response = client.get("/authenticators")
+        etag = response.headers["etag"]
+        not_modified_response = client.get("/authenticators", headers={"If-None-Match": f"W/{etag}"})
+
+        assert response.json() == self.authenticators
+        assert response.headers["cache-control"] == "no-cache"
+        assert (not_modified_response.status_code, not_modified_response.content) == (304, b"")
+        mock_get_authenticators.assert_awaited_once()
+
+    @patch(
+        "scigateway_auth.src.authentication.ICATAuthenticator.get_authenticators",
+        new_callable=AsyncMock,
+        side_effect=ICATAuthenticationError("Failed to retrieve authenticators"),
+    )
+    def test_get_authenticators_failure(self, mock_get_authenticators, client):
+        """
+        Test that `500 Internal Server Error` is returned when ICAT does not list the authenticators and there are no
+        cached authenticators.
+        """
+        response = client.get("/authenticators")
+
+        assert response.status_code == 500
+        assert response.json() == {"detail": "Failed to retrieve authenticators"}
+
+    @patch(
+        "scigateway_auth.src.authentication.ICATAuthenticator.get_authenticators",
+        new_callable=AsyncMock,
+        side_effect=ICATUnavailableError("ICAT is unavailable"),
+    )
+    def test_get_authenticators_icat_unavailable(self, mock_get_authenticators, client):
+        """
+        Test that `503 Service Unavailable` is returned when ICAT is unavailable and there are no cached authenticators.
+        """
+        response = client.get("/authenticators")
+
+        assert response.status_code == 503
+        assert response.json() == {"detail": "ICAT is unavailable, please try again later"}
+        assert "retry-after" in response.headers
@@ -0,0 +1,129 @@
+"""
+Unit tests for the `BatchTokenVerifier` class.
+"""
+
+import dataclasses
+import logging
+from unittest.mock import patch
+
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+from scigateway_auth.common.schemas import TokenVerificationStatus
+from scigateway_auth.src.batch_verification import BatchTokenVerifier
+from scigateway_auth.src.key_material import _create_jwt_key, key_material
+from test.mock_data import EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN
+
+BAD_SIGNATURE_TOKEN = VALID_ACCESS_TOKEN_NON_ADMIN[:-4] + (
+    "AAAA" if VALID_ACCESS_TOKEN_NON_ADMIN[-4:] != "AAAA" else "BBBB"
+)
+
+TOKENS = [
+    VALID_ACCESS_TOKEN_NON_ADMIN,
+    EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+    BAD_SIGNATURE_TOKEN,
+    "not-a-token",
+    VALID_REFRESH_TOKEN,
+]
+
+EXPECTED_STATUSES = [
+    TokenVerificationStatus.VALID,
+    TokenVerificationStatus.EXPIRED,
+    TokenVerificationStatus.BAD_SIGNATURE,
+    TokenVerificationStatus.MALFORMED,
+    TokenVerificationStatus.VALID,
+]
+
+
+class TestBatchTokenVerifier:
+    """
+    Unit tests for the `BatchTokenVerifier` class.
+    """
+
+    def test_verify(self):
+        """
+        Test that `verify` returns the status of each token in order, and the claims of the valid tokens.
+        """
+        batch_token_verifier = BatchTokenVerifier(processes=1, parallel_threshold=500)
+
+        results = batch_token_verifier.verify(TOKENS)
+
+        assert [result.status for result in results] == EXPECTED_STATUSES
+        assert results[0].claims == {
+            "sessionId": "test-session-id",
+            "username": "test-username",
+            "userIsAdmin": False,
+            "exp": 253402300799,
+        }
+        assert results[4].claims == {"username": "test-username", "exp": 253402300799}
+        assert all(result.claims is None for result in results[1:4])
+
+    def test_verify_in_parallel(self):
+        """
+        Test that `verify` returns the same results in the same order when the batch is verified by worker processes.
+        """
+        batch_token_verifier = BatchTokenVerifier(processes=2, parallel_threshold=2)
+
+        try:
+            results = batch_token_verifier.verify(TOKENS * 2)
+        finally:
+            batch_token_verifier.close()
+
+        assert [result.status for result in results] == EXPECTED_STATUSES * 2
+
+    def test_invalid_tokens_are_not_logged(self, caplog):
+        """
+        Test that the invalid tokens of a batch are classified without logging an error for each of them.
+        """
+        batch_token_verifier = BatchTokenVerifier(processes=1, parallel_threshold=500)
+
+        with caplog.at_level(logging.DEBUG):
+            batch_token_verifier.verify(TOKENS[1:4] * 10)
+
+        assert not [record for record in caplog.records if record.levelno >= logging.WARNING or record.exc_info]
+
+    def test_verify_in_parallel_with_keys_of_process(self):
+        """
+        Test that the worker processes verify tokens with the keys of the process which starts them, such as retired
+        keys only held in its memory, and are replaced when the keys change.
+        """
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        retired_key = _create_jwt_key("EdDSA", private_key.public_key(), private_key)
+        token = retired_key.sign({"username": "test-username", "exp": 253402300799})
+        keys = key_material.get()
+        keys_with_retired_key = dataclasses.replace(
+            keys,
+            verification_keys={**keys.verification_keys, retired_key.kid: retired_key},
+            version=keys.version + 1,
+        )
+        batch_token_verifier = BatchTokenVerifier(processes=2, parallel_threshold=2)
+
+        try:
+            with patch("scigateway_auth.src.batch_verification.key_material.get", return_value=keys):
+                before = batch_token_verifier.verify([token] * 4)
+            with patch("scigateway_auth.src.batch_verification.key_material.get", return_value=keys_with_retired_key):
+                after = batch_token_verifier.verify([token] * 4)
+        finally:
+            batch_token_verifier.close()
+
+        assert [result.status for result in before] == [TokenVerificationStatus.BAD_SIGNATURE] * 4
+        assert [result.status for result in after] == [TokenVerificationStatus.VALID] * 4
+
+    def test_verify_in_pool_replaced_during_verification(self):
+        """
+        Test that the chunks submitted to a pool of worker processes are still verified when the pool is replaced, as
+        the keys have changed, before their results are collected.
+        """
+        keys = key_material.get()
+        new_keys = dataclasses.replace(keys, version=keys.version + 1)
+        batch_token_verifier = BatchTokenVerifier(processes=2, parallel_threshold=2)
+
+        try:
+            results = batch_token_verifier._verify_in_pool(keys, [TOKENS, TOKENS])
+            new_results = batch_token_verifier._verify_in_pool(new_keys, [TOKENS])
+            statuses = [status for chunk_results in results for status, _ in chunk_results]
+            new_statuses = [status for chunk_results in new_results for status, _ in chunk_results]
+        finally:
+            batch_token_verifier.close()
+
+        assert statuses == EXPECTED_STATUSES * 2
+        assert new_statuses == EXPECTED_STATUSES
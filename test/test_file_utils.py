@@ -0,0 +1,122 @@
+"""
+Unit tests for the `file_utils` module.
+"""
+
+import errno
+import fcntl
+import os
+from pathlib import Path
+import stat
+from unittest.mock import patch
+
+import pytest
+
+from scigateway_auth.src.file_utils import get_lock_path, lock_file
+
+
+class TestLockFile:
+    """
+    Unit tests for the `lock_file` context manager.
+    """
+
+    @pytest.fixture(autouse=True)
+    def temp_directory(self, tmp_path: Path) -> Path:
+        """
+        Fixture which makes the default lock directory be created in a temporary directory of the test.
+
+        :return: The path to the temporary directory.
+        """
+        temp_directory = tmp_path / "tmp"
+        temp_directory.mkdir()
+        with patch("scigateway_auth.src.file_utils.tempfile.gettempdir", return_value=str(temp_directory)):
+            yield temp_directory
+
+    @pytest.fixture
+    def file_path(self, tmp_path: Path) -> Path:
+        """
+        Fixture which creates a file to lock in a temporary directory.
+
+        :return: The path to the file.
+        """
+        file_path = tmp_path / "test.json"
+        file_path.write_text("{}")
+        return file_path
+
+    def test_lock_file_in_private_directory(self, file_path, temp_directory):
+        """
+        Test that the lock file is created in a directory private to the user in the temporary directory, only readable
+        and writable by its owner, and not next to the file.
+        """
+        with lock_file(str(file_path), fcntl.LOCK_EX):
+            pass
+
+        lock_directory = temp_directory / f"scigateway-auth-{os.getuid()}"
+        assert os.path.dirname(get_lock_path(str(file_path))) == str(lock_directory)
+        assert stat.S_IMODE(os.stat(lock_directory).st_mode) == 0o700
+        assert stat.S_IMODE(os.stat(get_lock_path(str(file_path))).st_mode) == 0o600
+        assert sorted(os.listdir(file_path.parent)) == ["test.json", "tmp"]
+
+    def test_lock_file_in_lock_directory(self, file_path, tmp_path):
+        """
+        Test that the lock file is created in the lock directory when one is configured.
+        """
+        lock_directory = tmp_path / "locks"
+        lock_directory.mkdir()
+
+        with patch("scigateway_auth.src.file_utils.config.api.lock_directory", new=str(lock_directory)):
+            with lock_file(str(file_path), fcntl.LOCK_EX):
+                pass
+
+        assert [path.name.startswith("scigateway-auth-") for path in lock_directory.iterdir()] == [True]
+
+    def test_lock_file_in_read_only_directory(self, tmp_path):
+        """
+        Test that a file in a read-only directory can be locked, as the lock file is not created next to it.
+        """
+        directory = tmp_path / "read-only"
+        directory.mkdir()
+        (directory / "test.json").write_text("{}")
+        directory.chmod(0o555)
+
+        with lock_file(str(directory / "test.json"), fcntl.LOCK_EX):
+            pass
+
+        assert os.listdir(directory) == ["test.json"]
+
+    def test_lock_directory_not_private(self, file_path, temp_directory):
+        """
+        Test that the default lock directory is not used if other users can write to it.
+        """
+        lock_directory = temp_directory / f"scigateway-auth-{os.getuid()}"
+        lock_directory.mkdir()
+        lock_directory.chmod(0o777)
+
+        with pytest.raises(PermissionError):
+            with lock_file(str(file_path), fcntl.LOCK_EX):
+                pass
+
+    def test_lock_file_is_not_followed_if_symlink(self, file_path, tmp_path):
+        """
+        Test that a lock file which has been replaced by a symbolic link is not opened.
+        """
+        target_path = tmp_path / "target"
+        Path(get_lock_path(str(file_path))).symlink_to(target_path)
+
+        with pytest.raises(OSError):
+            with lock_file(str(file_path), fcntl.LOCK_EX):
+                pass
+        assert not target_path.exists()
+
+    @pytest.mark.parametrize("error", [errno.EACCES, errno.EROFS])
+    def test_shared_lock_falls_back_to_no_lock(self, file_path, error):
+        """
+        Test that a shared lock is not taken, rather than failing, when the lock file cannot be opened because the lock
+        directory is not writable, whereas an exclusive lock fails.
+        """
+        with patch("scigateway_auth.src.file_utils.os.open", side_effect=OSError(error, "test-error")):
+            with lock_file(str(file_path), fcntl.LOCK_SH):
+                assert file_path.read_text() == "{}"
+
+            with pytest.raises(OSError):
+                with lock_file(str(file_path), fcntl.LOCK_EX):
+                    pass
@@ -0,0 +1,199 @@
+"""
+Unit tests for the `ICATClient` class.
+"""
+
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+import pytest
+
+from scigateway_auth.common.config import config
+from scigateway_auth.common.exceptions import ICATUnavailableError
+from scigateway_auth.src.icat_client import ICATClient
+from scigateway_auth.src.resilience import request_deadline_var, RetryPolicy
+
+
+@pytest.mark.anyio
+class TestICATClient:
+    """
+    Unit tests for the `ICATClient` class.
+    """
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_client_is_created_once(self, mock_async_client):
+        """
+        Test that the HTTP client is created using the ICAT server config and shared between requests.
+        """
+        icat_client = ICATClient()
+
+        client = icat_client.client
+
+        assert icat_client.client is client
+        mock_async_client.assert_called_once()
+        kwargs = mock_async_client.call_args.kwargs
+        assert kwargs["base_url"] == config.icat_server.url
+        assert kwargs["verify"] == config.icat_server.certificate_validation
+        assert kwargs["timeout"] == config.icat_server.request_timeout_seconds
+        assert kwargs["limits"].max_connections == config.icat_server.max_connections
+        assert kwargs["limits"].max_keepalive_connections == config.icat_server.max_keepalive_connections
+        assert kwargs["http2"] == config.icat_server.http2
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request(self, mock_async_client):
+        """
+        Test that `request` sends the request using the shared HTTP client.
+        """
+        mock_response = Mock(status_code=200)
+        mock_async_client.return_value.request = AsyncMock(return_value=mock_response)
+        icat_client = ICATClient()
+
+        response = await icat_client.request("PUT", "/session/test-session-id")
+
+        assert response is mock_response
+        mock_async_client.return_value.request.assert_awaited_once_with(
+            "PUT",
+            "/session/test-session-id",
+            timeout=config.icat_server.request_timeout_seconds,
+        )
+
+    @pytest.mark.parametrize(
+        "method, error, is_retried",
+        [
+            pytest.param("GET", httpx.ReadError("test-error"), True, id="idempotent request"),
+            pytest.param("POST", httpx.ConnectError("test-error"), True, id="login which failed to connect"),
+            pytest.param("POST", httpx.ReadTimeout("test-error"), False, id="login which may have been received"),
+        ],
+    )
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request_retries(self, mock_async_client, method, error, is_retried):
+        """
+        Test that `request` retries requests which fail because of a transient error, unless they are not idempotent and
+        may have been received by ICAT.
+        """
+        mock_response = Mock(status_code=200)
+        mock_async_client.return_value.request = AsyncMock(side_effect=[error, mock_response])
+        icat_client = ICATClient()
+        icat_client.retry_policy = RetryPolicy(max_retries=2, backoff_seconds=0)
+
+        if is_retried:
+            assert await icat_client.request(method, "/session") is mock_response
+        else:
+            with pytest.raises(ICATUnavailableError):
+                await icat_client.request(method, "/session")
+
+        assert mock_async_client.return_value.request.await_count == (2 if is_retried else 1)
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request_retries_server_errors_up_to_max_retries(self, mock_async_client):
+        """
+        Test that `request` retries idempotent requests which get a `503` response up to `max_retries` times, and then
+        returns the last response.
+        """
+        mock_async_client.return_value.request = AsyncMock(return_value=Mock(status_code=503))
+        icat_client = ICATClient()
+        icat_client.retry_policy = RetryPolicy(max_retries=2, backoff_seconds=0)
+
+        response = await icat_client.request("GET", "/properties")
+
+        assert response.status_code == 503
+        assert mock_async_client.return_value.request.await_count == 3
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request_timeout_is_cut_short_by_deadline(self, mock_async_client):
+        """
+        Test that the timeout of a request is cut short by the deadline of the request being handled, and that no
+        request is sent once the deadline has passed.
+        """
+        mock_async_client.return_value.request = AsyncMock(return_value=Mock(status_code=200))
+        icat_client = ICATClient()
+
+        token = request_deadline_var.set(time.monotonic() + 1)
+        try:
+            await icat_client.request("GET", "/properties")
+        finally:
+            request_deadline_var.reset(token)
+        token = request_deadline_var.set(time.monotonic())
+        try:
+            with pytest.raises(ICATUnavailableError, match="deadline"):
+                await icat_client.request("GET", "/properties")
+        finally:
+            request_deadline_var.reset(token)
+
+        mock_async_client.return_value.request.assert_awaited_once()
+        assert mock_async_client.return_value.request.call_args.kwargs["timeout"] <= 1
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request_failures_open_circuit(self, mock_async_client):
+        """
+        Test that `request` raises `ICATUnavailableError` when ICAT cannot be reached, and without sending the request
+        once the circuit has opened after repeated failures.
+        """
+        mock_async_client.return_value.request = AsyncMock(side_effect=httpx.ConnectError("test-error"))
+        icat_client = ICATClient()
+
+        for _ in range(config.icat_server.circuit_breaker_failure_threshold + 1):
+            with pytest.raises(ICATUnavailableError):
+                await icat_client.request("GET", "/properties")
+
+        assert icat_client.circuit_breaker.is_open
+        assert (
+            mock_async_client.return_value.request.await_count == config.icat_server.circuit_breaker_failure_threshold
+        )
+
+    @pytest.mark.parametrize("status_code", [401, 503])
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request_server_errors_decrease_concurrency_limit(self, mock_async_client, status_code):
+        """
+        Test that server errors from ICAT decrease the limit of concurrent requests, but client errors do not.
+        """
+        mock_async_client.return_value.request = AsyncMock(return_value=Mock(status_code=status_code))
+        icat_client = ICATClient()
+
+        await icat_client.request("POST", "/session")
+
+        expected_limit = config.icat_server.max_connections // (2 if status_code >= 500 else 1)
+        assert icat_client.concurrency_limiter.limit == expected_limit
+
+    @patch("scigateway_auth.src.icat_client.config.icat_server.slow_request_seconds", new=0)
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_slow_request_decreases_concurrency_limit(self, mock_async_client):
+        """
+        Test that a request which takes longer than `slow_request_seconds` decreases the limit of concurrent requests.
+        """
+        mock_async_client.return_value.request = AsyncMock(return_value=Mock(status_code=200))
+        icat_client = ICATClient()
+
+        await icat_client.request("GET", "/session/test-session-id")
+
+        assert icat_client.concurrency_limiter.limit == config.icat_server.max_connections // 2
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_request_over_concurrency_limit(self, mock_async_client):
+        """
+        Test that `request` raises `ICATUnavailableError` without sending the request when the limit of concurrent
+        requests has been reached.
+        """
+        icat_client = ICATClient()
+        while icat_client.concurrency_limiter.try_acquire():
+            pass
+
+        with pytest.raises(ICATUnavailableError):
+            await icat_client.request("GET", "/properties")
+
+        mock_async_client.assert_not_called()
+
+    @patch("scigateway_auth.src.icat_client.httpx.AsyncClient")
+    async def test_close(self, mock_async_client):
+        """
+        Test that `close` closes the shared HTTP client and that a new client is created when it is next used.
+        """
+        mock_async_client.return_value.aclose = AsyncMock()
+        icat_client = ICATClient()
+        icat_client.client
+
+        await icat_client.close()
+        icat_client.client
+
+        mock_async_client.return_value.aclose.assert_awaited_once()
+        assert mock_async_client.call_count == 2
@@ -2,18 +2,24 @@
 Unit tests for the `JWTHandler` class.
 """
 
+import asyncio
 from datetime import datetime, timezone
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import UUID
 
+import jwt
 import pytest
 
 from scigateway_auth.common.exceptions import (
     BlacklistedJWTError,
     ICATAuthenticationError,
+    ICATUnavailableError,
     InvalidJWTError,
     JWTRefreshError,
 )
 from scigateway_auth.src.jwt_handler import JWTHandler
+from scigateway_auth.src.revocation import get_token_id, RevocationStore
+from scigateway_auth.src.token_cache import VerifiedTokenCache
 from test.mock_data import (
     EXPECTED_ACCESS_TOKEN_ADMIN,
     EXPECTED_ACCESS_TOKEN_NON_ADMIN,
@@ -35,6 +41,18 @@ class TestJWTHandler:
     mock_icat_authenticator: Mock
     jwt_handler = JWTHandler()
 
+    @pytest.fixture(autouse=True)
+    def revocation_store(self) -> RevocationStore:
+        """
+        Fixture which replaces the revocation store with an in-memory one, so that the refresh tokens used by each test
+        have not been used before.
+
+        :return: The revocation store.
+        """
+        store = RevocationStore(None, 3600)
+        with patch("scigateway_auth.src.jwt_handler.revocation_store", new=store):
+            yield store
+
     def mock_datetime_now(self) -> datetime:
         """
         Mock function to return a predefined datetime object.
@@ -66,8 +84,9 @@ class TestJWTHandler:
 
         assert access_token == EXPECTED_ACCESS_TOKEN_ADMIN
 
+    @patch("scigateway_auth.src.jwt_handler.uuid.uuid4", return_value=UUID(int=1))
     @patch("scigateway_auth.src.jwt_handler.datetime")
-    def test_get_refresh_token(self, mock_datetime):
+    def test_get_refresh_token(self, mock_datetime, mock_uuid4):
         """
         Test that `get_refresh_token` method successfully returns a JWT refresh token.
         """
@@ -77,51 +96,241 @@ class TestJWTHandler:
 
         assert refresh_token == EXPECTED_REFRESH_TOKEN
 
-    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", return_value=None)
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
     @patch("scigateway_auth.src.jwt_handler.datetime")
-    def test_refresh_access_token(self, mock_datetime, mock_icat_authenticator_refresh):
+    async def test_refresh_access_token(self, mock_datetime, mock_icat_authenticator_refresh):
         """
         Test that `refresh_access_token` method successfully returns a new JWT access token when provided a valid
         refresh token.
         """
         mock_datetime.now.return_value = self.mock_datetime_now()
 
-        access_token = self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+        access_token, refresh_token = await self.jwt_handler.refresh_access_token(
+            EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+            VALID_REFRESH_TOKEN,
+        )
 
         assert access_token == EXPECTED_ACCESS_TOKEN_NON_ADMIN
-
-    @patch(
-        "scigateway_auth.src.jwt_handler.config.authentication.jwt_refresh_token_blacklist",
-        new=[VALID_REFRESH_TOKEN],
+        refresh_token_payload = self.jwt_handler.verify_token(refresh_token)
+        assert refresh_token_payload["jti"] != get_token_id(VALID_REFRESH_TOKEN, {})
+        # Refresh tokens issued before rotation start a family identified by their own ID
+        assert refresh_token_payload["fam"] == get_token_id(VALID_REFRESH_TOKEN, {})
+        assert (refresh_token_payload["username"], refresh_token_payload["exp"]) == (self.icat_username, 253402300799)
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize(
+        ("refreshed_minutes_ago", "session_lifetime_minutes", "is_refreshed"),
+        [
+            pytest.param(10, 120, False, id="recently refreshed"),
+            pytest.param(70, 120, True, id="refreshed over the skip fraction ago"),
+            pytest.param(10, 40, True, id="session would expire before access token"),
+        ],
     )
-    def test_refresh_access_token_with_blacklisted_refresh_token(self):
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    @patch("scigateway_auth.src.jwt_handler.datetime")
+    async def test_refresh_access_token_skips_recent_icat_session_refresh(
+        self,
+        mock_datetime,
+        mock_icat_authenticator_refresh,
+        refreshed_minutes_ago,
+        session_lifetime_minutes,
+        is_refreshed,
+    ):
         """
-        Test that `refresh_access_token` raises `BlacklistedJWTError` when attempting to refresh with a blacklisted
-        refresh token.
+        Test that the ICAT session is only refreshed when it was last refreshed over `session_refresh_skip_fraction` of
+        its lifetime ago or would expire before the refreshed access token.
+        """
+        mock_datetime.now.return_value = self.mock_datetime_now()
+        refreshed_at = int(self.mock_datetime_now().timestamp()) - refreshed_minutes_ago * 60
+        access_token = JWTHandler._pack_jwt(
+            {
+                "sessionId": self.icat_session_id,
+                "username": self.icat_username,
+                "userIsAdmin": False,
+                "exp": 0,
+                "sessionRefreshedAt": refreshed_at,
+            },
+        )
+
+        with patch(
+            "scigateway_auth.src.jwt_handler.config.icat_server.session_lifetime_minutes",
+            new=session_lifetime_minutes,
+        ):
+            access_token, _ = await self.jwt_handler.refresh_access_token(access_token, VALID_REFRESH_TOKEN)
+
+        assert mock_icat_authenticator_refresh.await_count == int(is_refreshed)
+        expected_refreshed_at = int(self.mock_datetime_now().timestamp()) if is_refreshed else refreshed_at
+        payload = JWTHandler._get_jwt_payload(access_token, {"verify_exp": False})
+        assert payload["sessionRefreshedAt"] == expected_refreshed_at
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    async def test_refresh_access_token_with_rotated_refresh_token(self, mock_icat_authenticator_refresh):
+        """
+        Test that a rotated refresh token can be used to refresh the access token and stays in the same family.
+        """
+        _, refresh_token = await self.jwt_handler.refresh_access_token(
+            EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+            VALID_REFRESH_TOKEN,
+        )
+
+        _, rotated_refresh_token = await self.jwt_handler.refresh_access_token(
+            EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+            refresh_token,
+        )
+
+        assert self.jwt_handler.verify_token(rotated_refresh_token)["fam"] == get_token_id(VALID_REFRESH_TOKEN, {})
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    async def test_refresh_access_token_with_recently_used_refresh_token(self, mock_icat_authenticator_refresh):
+        """
+        Test that a refresh token can be used again within `refresh_token_reuse_interval_seconds`, e.g. by concurrent
+        requests.
+        """
+        await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+
+        access_token, _ = await self.jwt_handler.refresh_access_token(
+            EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+            VALID_REFRESH_TOKEN,
+        )
+
+        assert self.jwt_handler.verify_token(access_token)["username"] == self.icat_username
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.config.authentication.refresh_token_reuse_interval_seconds", new=0)
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    async def test_refresh_access_token_icat_unavailable(self, mock_icat_authenticator_refresh):
+        """
+        Test that `ICATUnavailableError` is raised when ICAT is unavailable, and that the refresh token can be used again
+        once ICAT is available.
+        """
+        mock_icat_authenticator_refresh.side_effect = ICATUnavailableError("ICAT is unavailable")
+        with pytest.raises(ICATUnavailableError):
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+
+        mock_icat_authenticator_refresh.side_effect = None
+        access_token, _ = await self.jwt_handler.refresh_access_token(
+            EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+            VALID_REFRESH_TOKEN,
+        )
+
+        assert self.jwt_handler.verify_token(access_token)["username"] == self.icat_username
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.config.authentication.refresh_token_reuse_interval_seconds", new=0)
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    async def test_refresh_access_token_concurrently_with_same_refresh_token(self, mock_icat_authenticator_refresh):
         """
+        Test that only one of the concurrent requests with the same refresh token succeeds outside the reuse interval,
+        as the refresh token is used up before the ICAT session is refreshed.
+        """
+        release = asyncio.Event()
+
+        async def refresh(session_id: str) -> None:
+            await release.wait()
+
+        mock_icat_authenticator_refresh.side_effect = refresh
+
+        first = asyncio.create_task(
+            self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN),
+        )
+        while not mock_icat_authenticator_refresh.await_count:
+            await asyncio.sleep(0)
+        with pytest.raises(BlacklistedJWTError):
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+        release.set()
+
+        access_token, _ = await first
+        assert self.jwt_handler.verify_token(access_token)["username"] == self.icat_username
+        assert mock_icat_authenticator_refresh.await_count == 1
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.config.authentication.refresh_token_reuse_interval_seconds", new=0)
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    async def test_refresh_access_token_icat_unavailable_with_reused_refresh_token(
+        self,
+        mock_icat_authenticator_refresh,
+        revocation_store,
+    ):
+        """
+        Test that a request which reuses a refresh token within the reuse interval does not release it when ICAT is
+        unavailable, as the token was used up by another request.
+        """
+        await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+        mock_icat_authenticator_refresh.side_effect = ICATUnavailableError("ICAT is unavailable")
+
+        with patch(
+            "scigateway_auth.src.jwt_handler.config.authentication.refresh_token_reuse_interval_seconds",
+            new=60,
+        ):
+            with pytest.raises(ICATUnavailableError):
+                await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+
+        assert revocation_store.use_token(get_token_id(VALID_REFRESH_TOKEN, {}), 0) is not None
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.config.authentication.refresh_token_reuse_interval_seconds", new=0)
+    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", new_callable=AsyncMock)
+    async def test_refresh_access_token_with_reused_refresh_token(self, mock_icat_authenticator_refresh):
+        """
+        Test that reusing a refresh token raises `BlacklistedJWTError` and revokes the refresh tokens rotated from it.
+        """
+        _, refresh_token = await self.jwt_handler.refresh_access_token(
+            EXPIRED_ACCESS_TOKEN_NON_ADMIN,
+            VALID_REFRESH_TOKEN,
+        )
+
+        with pytest.raises(BlacklistedJWTError) as exc:
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+        assert str(exc.value) == "Attempted refresh with a refresh token which has already been used"
+
+        with pytest.raises(BlacklistedJWTError) as exc:
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, refresh_token)
+        assert str(exc.value) == "Attempted refresh with a revoked refresh token"
+
+    @pytest.mark.anyio
+    @patch("scigateway_auth.src.jwt_handler.revocation_store")
+    async def test_refresh_access_token_with_revoked_refresh_token(self, mock_revocation_store):
+        """
+        Test that `refresh_access_token` raises `BlacklistedJWTError` when attempting to refresh with a revoked refresh
+        token.
+        """
+        mock_revocation_store.is_revoked.return_value = True
+
         with pytest.raises(BlacklistedJWTError) as exc:
-            self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
-        assert str(exc.value) == f"Attempted refresh from token in blacklist: {VALID_REFRESH_TOKEN}"
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+        assert str(exc.value) == "Attempted refresh with a revoked refresh token"
+        mock_revocation_store.is_revoked.assert_called_once_with(
+            get_token_id(VALID_REFRESH_TOKEN, {}),
+            self.icat_username,
+            None,
+            get_token_id(VALID_REFRESH_TOKEN, {}),
+        )
 
-    def test_refresh_access_token_with_expired_refresh_token(self):
+    @pytest.mark.anyio
+    async def test_refresh_access_token_with_expired_refresh_token(self):
         """
         Test that `refresh_access_token` raises `InvalidJWTError` when attempting to refresh with an expired refresh
         token.
         """
         with pytest.raises(InvalidJWTError) as exc:
-            self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, EXPIRED_REFRESH_TOKEN)
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, EXPIRED_REFRESH_TOKEN)
         assert str(exc.value) == "Invalid JWT token"
 
-    def test_refresh_access_token_with_invalid_access_token(self):
+    @pytest.mark.anyio
+    async def test_refresh_access_token_with_invalid_access_token(self):
         """
         Test that `refresh_access_token` raises `JWTRefreshError` when attempting to refresh with an invalid access
         token.
         """
         with pytest.raises(JWTRefreshError) as exc:
-            self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN + "1", VALID_REFRESH_TOKEN)
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN + "1", VALID_REFRESH_TOKEN)
         assert str(exc.value) == "Unable to refresh access token"
 
-    def test_refresh_access_token_with_with_non_matching_usernames(self):
+    @pytest.mark.anyio
+    async def test_refresh_access_token_with_with_non_matching_usernames(self):
         """
         Test that `refresh_access_token` raises `JWTRefreshError` when access token and refresh token have non-matching
         usernames.
@@ -135,16 +344,21 @@ class TestJWTHandler:
         )
 
         with pytest.raises(JWTRefreshError) as exc:
-            self.jwt_handler.refresh_access_token(access_token, VALID_REFRESH_TOKEN)
+            await self.jwt_handler.refresh_access_token(access_token, VALID_REFRESH_TOKEN)
         assert str(exc.value) == "Unable to refresh access token"
 
-    @patch("scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh", side_effect=ICATAuthenticationError)
-    def test_refresh_access_token_icat_authenticator_refresh_failure(self, mock_icat_authenticator_refresh):
+    @pytest.mark.anyio
+    @patch(
+        "scigateway_auth.src.jwt_handler.ICATAuthenticator.refresh",
+        new_callable=AsyncMock,
+        side_effect=ICATAuthenticationError,
+    )
+    async def test_refresh_access_token_icat_authenticator_refresh_failure(self, mock_icat_authenticator_refresh):
         """
         Test that `refresh_access_token` raises `JWTRefreshError` when `ICATAuthenticator.refresh` fails.
         """
         with pytest.raises(JWTRefreshError) as exc:
-            self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
+            await self.jwt_handler.refresh_access_token(EXPIRED_ACCESS_TOKEN_NON_ADMIN, VALID_REFRESH_TOKEN)
         assert str(exc.value) == "Unable to refresh access token"
 
     def test_verify_token_with_access_token(self):
@@ -160,6 +374,19 @@ class TestJWTHandler:
             "exp": 253402300799,
         }
 
+    @patch("scigateway_auth.src.jwt_handler.verified_token_cache", new_callable=lambda: VerifiedTokenCache(10))
+    @patch("scigateway_auth.src.key_material.jwt.decode", wraps=jwt.decode)
+    def test_verify_token_uses_verified_token_cache(self, mock_jwt_decode, mock_verified_token_cache):
+        """
+        Test that `verify_token` only checks the signature of a token the first time it is verified.
+        """
+        first_payload = self.jwt_handler.verify_token(VALID_ACCESS_TOKEN_NON_ADMIN)
+        second_payload = self.jwt_handler.verify_token(VALID_ACCESS_TOKEN_NON_ADMIN)
+
+        assert first_payload == second_payload
+        mock_jwt_decode.assert_called_once()
+        assert (mock_verified_token_cache.hits, mock_verified_token_cache.misses) == (1, 1)
+
     def test_verify_token_with_refresh_token(self):
         """
         Test that `verify_token` method successfully verifies a valid JWT refresh token.
@@ -184,6 +411,18 @@ class TestJWTHandler:
             self.jwt_handler.verify_token(EXPIRED_REFRESH_TOKEN)
         assert str(exc.value) == "Invalid JWT token"
 
+    def test_verify_token_with_unknown_kid(self):
+        """
+        Test that `verify_token` raises `InvalidJWTError` when verifying a token signed with an unknown key.
+        """
+        header, payload, signature = VALID_REFRESH_TOKEN.split(".")
+        header = jwt.utils.base64url_encode(b'{"alg":"RS256","kid":"unknown","typ":"JWT"}').decode()
+
+        with pytest.raises(InvalidJWTError) as exc:
+            self.jwt_handler.verify_token(f"{header}.{payload}.{signature}")
+        assert str(exc.value) == "Invalid JWT token"
+        assert isinstance(exc.value.__cause__, jwt.InvalidSignatureError)
+
     def test_verify_token_with_invalid_token(self):
         """
         Test that `verify_token` raises `InvalidJWTError` when verifying an invalid token.
@@ -0,0 +1,185 @@
+"""
+Unit tests for the `logger_setup` module.
+"""
+
+import json
+import logging
+import queue
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from scigateway_auth.common.logger_setup import (
+    JSONFormatter,
+    RecordQueueHandler,
+    request_id_var,
+    RequestIDFilter,
+    RequestIDMiddleware,
+    SamplingFilter,
+)
+
+
+def create_record(level: int = logging.INFO, exc_info=None) -> logging.LogRecord:
+    """
+    Create a record as if it was logged from this module.
+
+    :param level: The level of the record.
+    :param exc_info: The exception information of the record.
+    :return: The record.
+    """
+    return logging.LogRecord("root", level, __file__, 10, "test-message %s", ("test-arg",), exc_info)
+
+
+def get_exc_info():
+    """
+    Return the exception information of a raised exception.
+
+    :return: The exception information.
+    """
+    try:
+        raise ValueError("test-error")
+    except ValueError as exc:
+        return type(exc), exc, exc.__traceback__
+
+
+class TestRecordQueueHandler:
+    """
+    Unit tests for the `RecordQueueHandler` class.
+    """
+
+    def test_prepare(self):
+        """
+        Test that `prepare` merges the arguments into the message and keeps the formatted exception information.
+        """
+        handler = RecordQueueHandler(queue.SimpleQueue())
+
+        prepared = handler.prepare(create_record(logging.ERROR, get_exc_info()))
+
+        assert (prepared.msg, prepared.args, prepared.exc_info) == ("test-message test-arg", None, None)
+        assert "ValueError: test-error" in prepared.exc_text
+
+
+class TestSamplingFilter:
+    """
+    Unit tests for the `SamplingFilter` class.
+    """
+
+    module_name = "test.test_logger_setup"
+
+    def test_filter_without_sample_rate(self):
+        """
+        Test that records from a module without a sample rate are let through.
+        """
+        assert SamplingFilter({"other.module": 0}).filter(create_record())
+
+    def test_filter_drops_sampled_out_records(self):
+        """
+        Test that records below `WARNING` from a module with a sample rate of `0` are dropped.
+        """
+        assert not SamplingFilter({self.module_name: 0}).filter(create_record())
+
+    @pytest.mark.parametrize(
+        "record",
+        [
+            pytest.param(create_record(logging.WARNING), id="warning"),
+            pytest.param(create_record(logging.INFO, get_exc_info()), id="exception"),
+        ],
+    )
+    def test_filter_always_lets_through_failures(self, record):
+        """
+        Test that warnings, errors and records with exception information are always let through.
+        """
+        assert SamplingFilter({self.module_name: 0}).filter(record)
+
+    def test_filter_samples_by_request(self):
+        """
+        Test that the records logged during a request are either all let through or all dropped.
+        """
+        sampling_filter = SamplingFilter({self.module_name: 0.5})
+        results = set()
+        for index in range(20):
+            token = request_id_var.set(f"request-{index}")
+            try:
+                request_results = {sampling_filter.filter(create_record()) for _ in range(5)}
+            finally:
+                request_id_var.reset(token)
+            assert len(request_results) == 1
+            results |= request_results
+
+        assert results == {True, False}
+
+
+class TestJSONFormatter:
+    """
+    Unit tests for the `JSONFormatter` class.
+    """
+
+    def test_format(self):
+        """
+        Test that records are formatted as JSON objects including the request ID.
+        """
+        record = create_record()
+        RequestIDFilter().filter(record)
+
+        document = json.loads(JSONFormatter().format(record))
+
+        assert document["message"] == "test-message test-arg"
+        assert (document["level"], document["request_id"]) == ("INFO", "-")
+        assert "exception" not in document
+
+    def test_format_exception(self):
+        """
+        Test that the exception information of a record is included in the JSON object.
+        """
+        document = json.loads(JSONFormatter().format(create_record(logging.ERROR, get_exc_info())))
+
+        assert "ValueError: test-error" in document["exception"]
+
+
+class TestRequestIDMiddleware:
+    """
+    Unit tests for the `RequestIDMiddleware` class.
+    """
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        """
+        Fixture which creates a test client for an app which returns the request ID the middleware sets.
+
+        :return: The test client.
+        """
+        app = FastAPI()
+        app.add_middleware(RequestIDMiddleware)
+
+        @app.get("/request_id")
+        async def get_request_id() -> str:
+            return request_id_var.get()
+
+        return TestClient(app)
+
+    def test_request_id_is_generated(self, client):
+        """
+        Test that a request ID is generated and returned when the request does not have one.
+        """
+        response = client.get("/request_id")
+
+        assert response.json() == response.headers["X-Request-ID"]
+        assert len(response.json()) == 32
+
+    def test_request_id_is_propagated(self, client):
+        """
+        Test that the request ID of the request is used when it is valid.
+        """
+        response = client.get("/request_id", headers={"X-Request-ID": "test-request-id"})
+
+        assert response.json() == response.headers["X-Request-ID"] == "test-request-id"
+
+    def test_invalid_request_id_is_replaced(self, client):
+        """
+        Test that a request ID which is not safe to log is replaced with a generated one.
+        """
+        response = client.get("/request_id", headers={"X-Request-ID": "invalid request id\n"})
+
+        assert response.json() != "invalid request id\n"
+        assert len(response.json()) == 32
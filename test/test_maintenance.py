@@ -2,8 +2,16 @@
 Unit tests for the `MaintenanceBase` class.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import fcntl
+import hashlib
 import json
-from unittest.mock import mock_open, patch
+import os
+from pathlib import Path
+import stat
+import time
+from unittest.mock import patch
 
 import pytest
 
@@ -13,6 +21,7 @@ from scigateway_auth.common.exceptions import (
     MaintenanceFileWriteError,
 )
 from scigateway_auth.common.schemas import ScheduledMaintenanceStateSchema
+from scigateway_auth.src.file_utils import lock_file
 from scigateway_auth.src.maintenance import MaintenanceBase
 
 
@@ -21,57 +30,194 @@ class TestMaintenanceBase:
     Unit tests for the `MaintenanceBase` class.
     """
 
-    config_path = "path/to/config/test_maintenance.json"
     maintenance_state = ScheduledMaintenanceStateSchema(show=False, message="test-message", severity="test-severity")
-    maintenance_base = MaintenanceBase(config_path, ScheduledMaintenanceStateSchema)
 
-    @patch("builtins.open", mock_open(read_data=maintenance_state.model_dump_json()))
-    def test_get_maintenance_state(self):
+    @pytest.fixture
+    def config_path(self, tmp_path: Path) -> Path:
+        """
+        Fixture which writes the maintenance state to a file in a temporary directory.
+
+        :return: The path to the maintenance file.
+        """
+        config_path = tmp_path / "test_maintenance.json"
+        config_path.write_text(self.maintenance_state.model_dump_json())
+        return config_path
+
+    @pytest.fixture
+    def maintenance_base(self, config_path: Path) -> MaintenanceBase:
+        """
+        Fixture which creates a `MaintenanceBase` for the maintenance file.
+
+        :return: The `MaintenanceBase` instance.
+        """
+        return MaintenanceBase(str(config_path), ScheduledMaintenanceStateSchema)
+
+    def test_get_maintenance_state(self, maintenance_base):
         """
         Test that `get_maintenance_state` successfully reads and returns the maintenance state from the file.
         """
-        state = self.maintenance_base.get_maintenance_state()
+        state = maintenance_base.get_maintenance_state()
+
+        assert state == self.maintenance_state
+
+    def test_get_cached_maintenance_state(self, maintenance_base, config_path):
+        """
+        Test that `get_cached_maintenance_state` returns the maintenance state serialised as JSON along with its
+        validators.
+        """
+        cached_state = maintenance_base.get_cached_maintenance_state()
+
+        assert json.loads(cached_state.content) == self.maintenance_state.model_dump()
+        assert cached_state.etag == '"' + hashlib.sha256(cached_state.content).hexdigest() + '"'
+        assert cached_state.last_modified.timestamp() == int(os.stat(config_path).st_mtime)
+
+    def test_get_maintenance_state_is_held_in_memory(self, maintenance_base, config_path):
+        """
+        Test that `get_maintenance_state` does not read the file again when it has not changed, including from a
+        different instance.
+        """
+        maintenance_base.get_maintenance_state()
+
+        with patch("builtins.open", side_effect=IOError) as mock_open_file:
+            with patch("scigateway_auth.src.maintenance.config.maintenance.poll_interval_seconds", new=0):
+                state = MaintenanceBase(str(config_path), ScheduledMaintenanceStateSchema).get_maintenance_state()
+
+        assert state == self.maintenance_state
+        mock_open_file.assert_not_called()
+
+    @patch("scigateway_auth.src.maintenance.config.maintenance.poll_interval_seconds", new=0)
+    def test_get_maintenance_state_after_file_changed(self, maintenance_base, config_path):
+        """
+        Test that `get_maintenance_state` reads the file again when it has changed.
+        """
+        maintenance_base.get_maintenance_state()
+        new_maintenance_state = self.maintenance_state.model_copy(update={"show": True})
+        config_path.write_text(new_maintenance_state.model_dump_json())
+
+        state = maintenance_base.get_maintenance_state()
+
+        assert state == new_maintenance_state
+
+    def test_get_maintenance_state_within_poll_interval(self, maintenance_base, config_path):
+        """
+        Test that `get_maintenance_state` does not check the file for changes until the poll interval has passed.
+        """
+        maintenance_base.get_maintenance_state()
+        config_path.write_text(self.maintenance_state.model_copy(update={"show": True}).model_dump_json())
+
+        with patch("scigateway_auth.src.file_utils.os.stat") as mock_stat:
+            state = maintenance_base.get_maintenance_state()
 
         assert state == self.maintenance_state
+        mock_stat.assert_not_called()
+
+    def test_get_maintenance_state_file_not_found(self, tmp_path):
+        """
+        Test that `get_maintenance_state` raises `MaintenanceFileReadError` when the file cannot be found.
+        """
+        maintenance_base = MaintenanceBase(str(tmp_path / "missing.json"), ScheduledMaintenanceStateSchema)
+
+        with pytest.raises(MaintenanceFileReadError) as exc:
+            maintenance_base.get_maintenance_state()
+        assert str(exc.value) == "An error occurred while trying to find and read the scheduled maintenance file"
 
     @patch("builtins.open", side_effect=IOError)
-    def test_get_maintenance_state_file_read_error(self, mock_open_file):
+    def test_get_maintenance_state_file_read_error(self, mock_open_file, maintenance_base):
         """
         Test that `get_maintenance_state` raises `MaintenanceFileReadError` when an `IOError` occurs while trying to
         read the file.
         """
         with pytest.raises(MaintenanceFileReadError) as exc:
-            self.maintenance_base.get_maintenance_state()
+            maintenance_base.get_maintenance_state()
         assert str(exc.value) == "An error occurred while trying to find and read the scheduled maintenance file"
 
-    @patch("builtins.open", mock_open(read_data=json.dumps({"show": True})))
-    def test_get_maintenance_state_invalid_file(self):
+    def test_get_maintenance_state_invalid_file(self, maintenance_base, config_path):
         """
         Test that `get_maintenance_state` raises `InvalidMaintenanceFileError` when the data in the file is invalid and
         cannot be validated.
         """
+        config_path.write_text(json.dumps({"show": True}))
+
         with pytest.raises(InvalidMaintenanceFileError) as exc:
-            self.maintenance_base.get_maintenance_state()
+            maintenance_base.get_maintenance_state()
         assert str(exc.value) == "An error occurred while validating the data in the scheduled maintenance file"
 
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("json.dump")
-    def test_update_maintenance_state(self, mock_json_dump, mock_open_file):
+    def test_update_maintenance_state(self, maintenance_base, config_path):
+        """
+        Test that `update_maintenance_state` replaces the file with one containing the maintenance state.
+        """
+        new_maintenance_state = self.maintenance_state.model_copy(update={"show": True})
+        config_path.chmod(0o640)
+        inode = os.stat(config_path).st_ino
+
+        maintenance_base.update_maintenance_state(new_maintenance_state)
+
+        assert json.loads(config_path.read_text()) == new_maintenance_state.model_dump()
+        assert os.stat(config_path).st_ino != inode
+        assert stat.S_IMODE(os.stat(config_path).st_mode) == 0o640
+        assert os.listdir(config_path.parent) == [config_path.name]
+
+    @patch("scigateway_auth.src.file_utils.os.replace", side_effect=OSError(errno.EBUSY, "Device or resource busy"))
+    def test_update_maintenance_state_in_place(self, mock_replace, maintenance_base, config_path):
+        """
+        Test that `update_maintenance_state` writes the maintenance state to the file in place when the file cannot be
+        replaced.
+        """
+        new_maintenance_state = self.maintenance_state.model_copy(update={"show": True})
+        inode = os.stat(config_path).st_ino
+
+        maintenance_base.update_maintenance_state(new_maintenance_state)
+
+        assert json.loads(config_path.read_text()) == new_maintenance_state.model_dump()
+        assert os.stat(config_path).st_ino == inode
+        assert os.listdir(config_path.parent) == [config_path.name]
+        mock_replace.assert_called_once()
+
+    def test_get_maintenance_state_in_read_only_directory(self, maintenance_base, config_path):
+        """
+        Test that `get_maintenance_state` reads the file when its directory is read-only, as is the case when it is
+        bind mounted into a directory owned by another user.
+        """
+        config_path.parent.chmod(0o555)
+
+        assert maintenance_base.get_maintenance_state() == self.maintenance_state
+        assert os.listdir(config_path.parent) == [config_path.name]
+
+    def test_get_maintenance_state_waits_for_update(self, maintenance_base, config_path):
         """
-        Test that `update_maintenance_state` successfully writes the maintenance state to the file.
+        Test that `get_maintenance_state` does not read the file while an update holds the lock on it.
         """
-        self.maintenance_base.update_maintenance_state(self.maintenance_state)
+        config_path.write_text("")
+        reader = ThreadPoolExecutor(max_workers=1)
 
-        mock_open_file.assert_called_once_with(self.config_path, "w")
-        mock_json_dump.assert_called_once_with(self.maintenance_state.model_dump(), mock_open_file())
+        with lock_file(str(config_path), fcntl.LOCK_EX):
+            future = reader.submit(maintenance_base.get_maintenance_state)
+            time.sleep(0.1)
+            assert not future.done()
+            config_path.write_text(self.maintenance_state.model_dump_json())
 
-    @patch("builtins.open", side_effect=OSError)
-    def test_update_maintenance_state_file_write_error(self, mock_open_file):
+        assert future.result(timeout=5) == self.maintenance_state
+        reader.shutdown()
+
+    def test_update_maintenance_state_is_read_back(self, maintenance_base, config_path):
+        """
+        Test that `get_maintenance_state` returns the updated state straight after `update_maintenance_state`.
+        """
+        maintenance_base.get_maintenance_state()
+        new_maintenance_state = self.maintenance_state.model_copy(update={"message": "updated-message"})
+
+        maintenance_base.update_maintenance_state(new_maintenance_state)
+
+        assert maintenance_base.get_maintenance_state() == new_maintenance_state
+        assert os.path.exists(config_path)
+
+    def test_update_maintenance_state_file_write_error(self, tmp_path):
         """
         Test that `update_maintenance_state` raises `MaintenanceFileWriteError` when an `OSError` occurs while trying
         to write the maintenance state to the file.
         """
+        maintenance_base = MaintenanceBase(str(tmp_path / "missing" / "test.json"), ScheduledMaintenanceStateSchema)
+
         with pytest.raises(MaintenanceFileWriteError) as exc:
-            self.maintenance_base.update_maintenance_state(self.maintenance_state)
+            maintenance_base.update_maintenance_state(self.maintenance_state)
         assert str(exc.value) == "An error occurred while trying to find and update the scheduled maintenance file"
-        mock_open_file.assert_called_once_with(self.config_path, "w")
@@ -0,0 +1,158 @@
+"""
+Unit tests for the `MaintenanceStateBroadcaster` class.
+"""
+
+import asyncio
+import fcntl
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from scigateway_auth.common.exceptions import MaintenanceStreamLimitError
+from scigateway_auth.common.schemas import MaintenanceStateSchema
+from scigateway_auth.src.file_utils import lock_file
+from scigateway_auth.src.maintenance import MaintenanceBase
+from scigateway_auth.src.maintenance_stream import MaintenanceStateBroadcaster
+
+
+@pytest.mark.anyio
+class TestMaintenanceStateBroadcaster:
+    """
+    Unit tests for the `MaintenanceStateBroadcaster` class.
+    """
+
+    maintenance_state = MaintenanceStateSchema(show=False, message="test-message")
+
+    @pytest.fixture
+    def maintenance_base(self, tmp_path: Path) -> MaintenanceBase:
+        """
+        Fixture which creates a `MaintenanceBase` for a maintenance file in a temporary directory.
+
+        :return: The `MaintenanceBase` instance.
+        """
+        config_path = tmp_path / "test_maintenance.json"
+        config_path.write_text(self.maintenance_state.model_dump_json())
+        return MaintenanceBase(str(config_path), MaintenanceStateSchema)
+
+    @staticmethod
+    def get_data(event: bytes) -> bytes:
+        """
+        Return the data of a server-sent event.
+
+        :param event: The server-sent event.
+        :return: The data of the event.
+        """
+        return next(line for line in event.split(b"\n") if line.startswith(b"data: ")).removeprefix(b"data: ")
+
+    async def test_stream_sends_current_state(self, maintenance_base):
+        """
+        Test that a subscriber is sent the retry interval followed by the current maintenance state.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+
+        assert (await anext(stream)).startswith(b"retry: ")
+        assert self.get_data(await anext(stream)) == self.maintenance_state.model_dump_json().encode()
+        await stream.aclose()
+
+    async def test_stream_sends_updated_state(self, maintenance_base):
+        """
+        Test that a subscriber is sent the new maintenance state when it is updated.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+        await anext(stream)
+        await anext(stream)
+        new_maintenance_state = self.maintenance_state.model_copy(update={"show": True})
+
+        maintenance_base.update_maintenance_state(new_maintenance_state)
+        broadcaster.notify()
+
+        assert self.get_data(await anext(stream)) == new_maintenance_state.model_dump_json().encode()
+        await stream.aclose()
+
+    @patch("scigateway_auth.src.maintenance_stream.config.maintenance.stream_heartbeat_seconds", new=0.01)
+    async def test_stream_sends_heartbeat(self, maintenance_base):
+        """
+        Test that a subscriber is sent a heartbeat when the maintenance state has not changed.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+        await anext(stream)
+        await anext(stream)
+
+        assert await anext(stream) == b": heartbeat\n\n"
+        await stream.aclose()
+
+    async def test_slow_subscriber_only_gets_latest_state(self, maintenance_base):
+        """
+        Test that a subscriber which has not consumed its events is only sent the latest maintenance state.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+        await anext(stream)
+        await asyncio.sleep(0.01)
+
+        for message in ["first-update", "second-update"]:
+            maintenance_base.update_maintenance_state(self.maintenance_state.model_copy(update={"message": message}))
+            broadcaster.notify()
+            await asyncio.sleep(0.01)
+
+        assert b"second-update" in await anext(stream)
+        assert broadcaster.subscriber_count == 1
+        await stream.aclose()
+
+    async def test_stream_removes_subscriber_when_closed(self, maintenance_base):
+        """
+        Test that a subscriber is removed when its stream is closed.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+        await anext(stream)
+
+        await stream.aclose()
+
+        assert broadcaster.subscriber_count == 0
+
+    async def test_stream_not_iterated_does_not_subscribe(self, maintenance_base):
+        """
+        Test that a stream which is never iterated, e.g. because the client disconnected before the response started,
+        does not leave a subscriber behind.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+
+        broadcaster.stream()
+
+        assert broadcaster.subscriber_count == 0
+
+    @patch("scigateway_auth.src.maintenance_stream.config.maintenance.stream_max_subscribers", new=1)
+    async def test_stream_limit(self, maintenance_base):
+        """
+        Test that `stream` raises `MaintenanceStreamLimitError` when the maximum number of subscribers is reached.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+        await anext(stream)
+
+        with pytest.raises(MaintenanceStreamLimitError) as exc:
+            broadcaster.stream()
+        assert str(exc.value) == "The maximum number of maintenance state subscribers has been reached"
+        await stream.aclose()
+
+    async def test_stream_does_not_block_event_loop_while_file_locked(self, maintenance_base, tmp_path):
+        """
+        Test that the event loop keeps running while the maintenance file is locked by an update, and that the state is
+        sent once the lock is released.
+        """
+        broadcaster = MaintenanceStateBroadcaster(maintenance_base)
+        stream = broadcaster.stream()
+        await anext(stream)
+
+        with lock_file(str(tmp_path / "test_maintenance.json"), fcntl.LOCK_EX):
+            next_event = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0.05)
+            assert not next_event.done()
+
+        assert self.get_data(await next_event) == self.maintenance_state.model_dump_json().encode()
+        await stream.aclose()
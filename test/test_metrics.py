@@ -0,0 +1,141 @@
+"""
+Unit tests for the `metrics` module.
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+import pytest
+
+from scigateway_auth.routers import metrics as metrics_router
+from scigateway_auth.src.metrics import generate_metrics, MetricsMiddleware, observe_upstream_request
+
+
+def get_sample_value(name: str, labels: dict[str, str]) -> float:
+    """
+    Return the value of a sample from the default registry, treating a missing sample as `0`.
+
+    :param name: The name of the sample.
+    :param labels: The labels of the sample.
+    :return: The value of the sample.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetricsMiddleware:
+    """
+    Unit tests for the `MetricsMiddleware` class.
+    """
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        """
+        Fixture which creates a test client for an app with a parameterised route that uses the middleware.
+
+        :return: The test client.
+        """
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        def get_item(item_id: str) -> dict:
+            return {"item_id": item_id}
+
+        return TestClient(app)
+
+    def test_request_is_labelled_with_route(self, client):
+        """
+        Test that requests are counted and timed by the path template of the route they matched and their status.
+        """
+        labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+        requests = get_sample_value("scigateway_auth_http_requests_total", labels)
+        durations = get_sample_value("scigateway_auth_http_request_duration_seconds_count", labels)
+
+        client.get("/items/1")
+        client.get("/items/2")
+
+        assert get_sample_value("scigateway_auth_http_requests_total", labels) == requests + 2
+        assert get_sample_value("scigateway_auth_http_request_duration_seconds_count", labels) == durations + 2
+
+    def test_unmatched_request(self, client):
+        """
+        Test that requests which do not match a route are labelled as unmatched.
+        """
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        requests = get_sample_value("scigateway_auth_http_requests_total", labels)
+
+        client.get("/unknown")
+
+        assert get_sample_value("scigateway_auth_http_requests_total", labels) == requests + 1
+
+    def test_threadpool_is_sampled(self, client):
+        """
+        Test that the capacity of the threadpool is recorded.
+        """
+        client.get("/items/1")
+
+        assert get_sample_value("scigateway_auth_threadpool_capacity", {}) > 0
+
+
+class TestObserveUpstreamRequest:
+    """
+    Unit tests for the `observe_upstream_request` context manager.
+    """
+
+    def test_observe_upstream_request(self):
+        """
+        Test that a request which succeeds is timed with a success outcome.
+        """
+        labels = {"upstream": "icat", "operation": "test-operation", "outcome": "success"}
+        count = get_sample_value("scigateway_auth_upstream_request_duration_seconds_count", labels)
+
+        with observe_upstream_request("icat", "test-operation"):
+            pass
+
+        assert get_sample_value("scigateway_auth_upstream_request_duration_seconds_count", labels) == count + 1
+
+    def test_observe_upstream_request_error(self):
+        """
+        Test that a request which raises an error is timed with an error outcome and the error is not suppressed.
+        """
+        labels = {"upstream": "oidc", "operation": "test-operation", "outcome": "error"}
+        count = get_sample_value("scigateway_auth_upstream_request_duration_seconds_count", labels)
+
+        with pytest.raises(ValueError):
+            with observe_upstream_request("oidc", "test-operation"):
+                raise ValueError("test-error")
+
+        assert get_sample_value("scigateway_auth_upstream_request_duration_seconds_count", labels) == count + 1
+
+
+class TestGenerateMetrics:
+    """
+    Unit tests for the `generate_metrics` function and the route serving the metrics.
+    """
+
+    def test_generate_metrics(self):
+        """
+        Test that `generate_metrics` returns the metrics in the Prometheus text format.
+        """
+        assert b"# TYPE scigateway_auth_http_requests_total counter" in generate_metrics()
+
+    def test_generate_metrics_multiprocess(self, tmp_path, monkeypatch):
+        """
+        Test that `generate_metrics` aggregates the metrics written to the multiprocess directory.
+        """
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+        assert generate_metrics() == b""
+
+    def test_get_metrics(self):
+        """
+        Test that the metrics route returns the metrics with the Prometheus content type.
+        """
+        app = FastAPI()
+        app.include_router(metrics_router.router)
+
+        response = TestClient(app).get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "scigateway_auth_http_requests_total" in response.text
@@ -9,9 +9,11 @@ from cryptography.hazmat.primitives import serialization
 import jwt
 import pytest
 import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
 from scigateway_auth.common.exceptions import InvalidJWTError, OidcProviderNotFoundError
 from scigateway_auth.src import oidc
+from scigateway_auth.src.resilience import RetryPolicy
 from test.mock_data import JWK_PRIVATE_KEY, JWK_PUBLIC
 
 
@@ -211,3 +213,123 @@ class TestOidc:
 
         with pytest.raises(OidcProviderNotFoundError):
             oidc.get_token("mock-pkce", "test-code")
+
+
+@patch("scigateway_auth.src.oidc.RETRY_POLICY", new=RetryPolicy(max_retries=2, backoff_seconds=0))
+class TestRequestWithRetries:
+    """
+    Test suite for the `_request_with_retries` function.
+    """
+
+    connect_error = requests.ConnectionError(MaxRetryError(None, "/token", NewConnectionError(None, "test-error")))
+
+    @pytest.mark.parametrize(
+        "method, error, is_retried",
+        [
+            pytest.param("GET", requests.ConnectionError("test-error"), True, id="idempotent request"),
+            pytest.param("POST", connect_error, True, id="token request which failed to connect"),
+            pytest.param("POST", requests.ConnectTimeout("test-error"), True, id="token request connect timeout"),
+            pytest.param("POST", requests.ReadTimeout("test-error"), False, id="token request read timeout"),
+        ],
+    )
+    def test_request_with_retries(self, method, error, is_retried):
+        """
+        Test that requests which fail because of a transient error are retried, unless they are not idempotent and may
+        have been received by the provider.
+        """
+        response = MockRequestsResponse({})
+        send = Mock(side_effect=[error, response])
+
+        if is_retried:
+            assert oidc._request_with_retries(method, send) is response
+        else:
+            with pytest.raises(type(error)):
+                oidc._request_with_retries(method, send)
+
+        assert send.call_count == (2 if is_retried else 1)
+        assert send.call_args.kwargs["timeout"] == oidc.TIMEOUT
+
+    def test_request_with_retries_up_to_max_retries(self):
+        """
+        Test that a request is retried up to `max_retries` times and the last error is raised.
+        """
+        send = Mock(side_effect=requests.ConnectionError("test-error"))
+
+        with pytest.raises(requests.ConnectionError):
+            oidc._request_with_retries("GET", send)
+
+        assert send.call_count == 3
+
+
+class TestJWKSKeyStore:
+    """
+    Test suite for the `JWKSKeyStore` class.
+    """
+
+    old_jwks = jwt.PyJWKSet([{**JWK_PUBLIC, "kid": "old-kid"}])
+    new_jwks = jwt.PyJWKSet([{**JWK_PUBLIC, "kid": "old-kid"}, JWK_PUBLIC])
+
+    @patch("scigateway_auth.src.oidc.get_jwks")
+    def test_get_key(self, mock_get_jwks: Mock):
+        """
+        Test that JWKSKeyStore.get_key() returns the key from the cached JWK Set without refetching it.
+        """
+        mock_get_jwks.return_value = self.new_jwks
+        key_store = oidc.JWKSKeyStore(60, 10, 300)
+
+        assert key_store.get_key("mock-pkce", "mock-kid") is self.new_jwks["mock-kid"]
+        mock_get_jwks.refresh.assert_not_called()
+
+    @patch("scigateway_auth.src.oidc.get_jwks")
+    def test_get_key_after_rotation(self, mock_get_jwks: Mock):
+        """
+        Test that JWKSKeyStore.get_key() refetches the JWK Set when the kid is not in the cached one.
+        """
+        mock_get_jwks.return_value = self.old_jwks
+        mock_get_jwks.refresh.return_value = self.new_jwks
+        key_store = oidc.JWKSKeyStore(60, 10, 300)
+
+        assert key_store.get_key("mock-pkce", "mock-kid") is self.new_jwks["mock-kid"]
+        mock_get_jwks.refresh.assert_called_once_with("mock-pkce")
+
+    @patch("scigateway_auth.src.oidc.get_jwks")
+    def test_get_key_unknown_kid_is_remembered(self, mock_get_jwks: Mock):
+        """
+        Test that JWKSKeyStore.get_key() does not refetch the JWK Set again for a kid that was not in the refetched one.
+        """
+        mock_get_jwks.return_value = self.old_jwks
+        mock_get_jwks.refresh.return_value = self.old_jwks
+        key_store = oidc.JWKSKeyStore(0, 10, 300)
+
+        for _ in range(2):
+            with pytest.raises(KeyError):
+                key_store.get_key("mock-pkce", "unknown")
+        mock_get_jwks.refresh.assert_called_once_with("mock-pkce")
+
+    @patch("scigateway_auth.src.oidc.get_jwks")
+    def test_get_key_min_refetch_interval(self, mock_get_jwks: Mock):
+        """
+        Test that JWKSKeyStore.get_key() refetches the JWK Set at most once within the minimum refetch interval.
+        """
+        mock_get_jwks.return_value = self.old_jwks
+        mock_get_jwks.refresh.return_value = self.old_jwks
+        key_store = oidc.JWKSKeyStore(60, 10, 300)
+
+        for kid in ["unknown-1", "unknown-2"]:
+            with pytest.raises(KeyError):
+                key_store.get_key("mock-pkce", kid)
+        mock_get_jwks.refresh.assert_called_once_with("mock-pkce")
+
+    @patch("scigateway_auth.src.oidc.get_jwks")
+    def test_get_key_negative_cache_is_bounded(self, mock_get_jwks: Mock):
+        """
+        Test that JWKSKeyStore.get_key() forgets the least recently seen unknown kid when the negative cache is full.
+        """
+        mock_get_jwks.return_value = self.old_jwks
+        mock_get_jwks.refresh.return_value = self.old_jwks
+        key_store = oidc.JWKSKeyStore(0, 1, 300)
+
+        for kid in ["unknown-1", "unknown-2", "unknown-1"]:
+            with pytest.raises(KeyError):
+                key_store.get_key("mock-pkce", kid)
+        assert mock_get_jwks.refresh.call_count == 3
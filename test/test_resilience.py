@@ -0,0 +1,231 @@
+"""
+Unit tests for the `resilience` module.
+"""
+
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from scigateway_auth.src.resilience import (
+    AdaptiveConcurrencyLimiter,
+    CallPermit,
+    CircuitBreaker,
+    DeadlineMiddleware,
+    get_remaining_timeout,
+    request_deadline_var,
+    RetryPolicy,
+)
+
+
+class TestCircuitBreaker:
+    """
+    Unit tests for the `CircuitBreaker` class.
+    """
+
+    @staticmethod
+    def open_circuit_breaker() -> CircuitBreaker:
+        """
+        Create a circuit breaker and open its circuit by failing the threshold number of calls.
+
+        :return: The circuit breaker.
+        """
+        circuit_breaker = CircuitBreaker("test-service", failure_threshold=3, open_seconds=30)
+        for _ in range(3):
+            permit = circuit_breaker.allow_call()
+            assert permit is not None
+            circuit_breaker.record_result(permit, False)
+        return circuit_breaker
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        """
+        Test that the circuit only opens after the threshold number of consecutive calls fail, and then rejects calls.
+        """
+        circuit_breaker = CircuitBreaker("test-service", failure_threshold=3, open_seconds=30)
+        for succeeded in [False, False, True, False, False]:
+            circuit_breaker.record_result(circuit_breaker.allow_call(), succeeded)
+        assert not circuit_breaker.is_open
+
+        circuit_breaker.record_result(circuit_breaker.allow_call(), False)
+
+        assert circuit_breaker.is_open
+        assert circuit_breaker.allow_call() is None
+
+    def test_half_open_circuit_lets_one_trial_call_through(self):
+        """
+        Test that once the circuit has been open for `open_seconds`, a single trial call is let through and the circuit
+        closes if it succeeds.
+        """
+        circuit_breaker = self.open_circuit_breaker()
+
+        with patch("scigateway_auth.src.resilience.time.monotonic", return_value=time.monotonic() + 30):
+            permit = circuit_breaker.allow_call()
+            assert permit == CallPermit(is_trial=True)
+            assert circuit_breaker.allow_call() is None
+            circuit_breaker.record_result(permit, True)
+
+        assert not circuit_breaker.is_open
+        assert circuit_breaker.allow_call() == CallPermit(is_trial=False)
+
+    def test_failed_trial_call_reopens_circuit(self):
+        """
+        Test that the circuit opens for another `open_seconds` if the trial call fails.
+        """
+        circuit_breaker = self.open_circuit_breaker()
+
+        with patch("scigateway_auth.src.resilience.time.monotonic", return_value=time.monotonic() + 30):
+            circuit_breaker.record_result(circuit_breaker.allow_call(), False)
+            assert circuit_breaker.allow_call() is None
+
+        assert circuit_breaker.is_open
+
+    def test_cancelled_trial_call_lets_another_through(self):
+        """
+        Test that another trial call is let through when the trial call ends without a result.
+        """
+        circuit_breaker = self.open_circuit_breaker()
+
+        with patch("scigateway_auth.src.resilience.time.monotonic", return_value=time.monotonic() + 30):
+            circuit_breaker.record_result(circuit_breaker.allow_call(), None)
+            assert circuit_breaker.allow_call() == CallPermit(is_trial=True)
+
+        assert circuit_breaker.is_open
+
+    def test_call_started_before_circuit_opened_does_not_end_trial(self):
+        """
+        Test that a call which was started before the circuit opened and ends during the trial call does not let
+        another trial call through.
+        """
+        circuit_breaker = CircuitBreaker("test-service", failure_threshold=3, open_seconds=30)
+        slow_permit = circuit_breaker.allow_call()
+        for _ in range(3):
+            circuit_breaker.record_result(circuit_breaker.allow_call(), False)
+
+        with patch("scigateway_auth.src.resilience.time.monotonic", return_value=time.monotonic() + 30):
+            trial_permit = circuit_breaker.allow_call()
+            assert trial_permit == CallPermit(is_trial=True)
+            circuit_breaker.record_result(slow_permit, None)
+            assert circuit_breaker.allow_call() is None
+            circuit_breaker.record_result(trial_permit, None)
+            assert circuit_breaker.allow_call() == CallPermit(is_trial=True)
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """
+    Unit tests for the `AdaptiveConcurrencyLimiter` class.
+    """
+
+    def test_try_acquire_up_to_limit(self):
+        """
+        Test that slots can only be taken up to the limit, and can be taken again once they are given back.
+        """
+        limiter = AdaptiveConcurrencyLimiter("test-service", min_limit=1, max_limit=2)
+
+        assert [limiter.try_acquire(), limiter.try_acquire(), limiter.try_acquire()] == [True, True, False]
+        limiter.release(time.monotonic(), None)
+        assert limiter.try_acquire()
+        assert (limiter.limit, limiter.in_flight) == (2, 2)
+
+    def test_unhealthy_call_decreases_limit_once(self):
+        """
+        Test that the limit is halved by an unhealthy call, but not again by the unhealthy calls started before the
+        decrease, and never below `min_limit`.
+        """
+        limiter = AdaptiveConcurrencyLimiter("test-service", min_limit=3, max_limit=8)
+        started_at = time.monotonic()
+        for _ in range(3):
+            limiter.try_acquire()
+
+        limiter.release(started_at, False)
+        limiter.release(started_at, False)
+        assert limiter.limit == 4
+
+        limiter.release(time.monotonic() + 1, False)
+        assert limiter.limit == 3
+
+    def test_healthy_calls_increase_limit(self):
+        """
+        Test that the limit grows by one for each limit's worth of healthy calls, up to `max_limit`.
+        """
+        limiter = AdaptiveConcurrencyLimiter("test-service", min_limit=1, max_limit=4)
+        limiter.try_acquire()
+        limiter.release(time.monotonic(), False)
+        assert limiter.limit == 2
+
+        for _ in range(2):
+            limiter.try_acquire()
+            limiter.release(time.monotonic(), True)
+        assert limiter.limit == 2
+
+        for _ in range(20):
+            limiter.try_acquire()
+            limiter.release(time.monotonic(), True)
+        assert limiter.limit == 4
+
+
+class TestRetryPolicy:
+    """
+    Unit tests for the `RetryPolicy` class.
+    """
+
+    def test_get_delay(self):
+        """
+        Test that the delays are jittered up to a backoff which doubles with each retry and is capped, and that there is
+        no delay after `max_retries` retries.
+        """
+        retry_policy = RetryPolicy(max_retries=4, backoff_seconds=0.5, max_backoff_seconds=1.5)
+
+        for retry, backoff_seconds in enumerate([0.5, 1.0, 1.5, 1.5]):
+            delays = [retry_policy.get_delay(retry) for _ in range(20)]
+            assert all(0 <= delay <= backoff_seconds for delay in delays)
+            assert len(set(delays)) > 1
+        assert retry_policy.get_delay(4) is None
+
+    def test_get_delay_past_deadline(self):
+        """
+        Test that there is no delay when the deadline of the request being handled would pass during it.
+        """
+        retry_policy = RetryPolicy(max_retries=2, backoff_seconds=0.5)
+
+        token = request_deadline_var.set(time.monotonic() + 0.5)
+        try:
+            with patch("scigateway_auth.src.resilience.random.uniform", return_value=0.5):
+                assert retry_policy.get_delay(0) is None
+        finally:
+            request_deadline_var.reset(token)
+
+
+class TestDeadlineMiddleware:
+    """
+    Unit tests for the `DeadlineMiddleware` class.
+    """
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        """
+        Fixture which creates a test client for an app which returns the timeout left before the deadline.
+
+        :return: The test client.
+        """
+        app = FastAPI()
+        app.add_middleware(DeadlineMiddleware, deadline_seconds=5)
+
+        @app.get("/timeout")
+        async def get_timeout() -> float:
+            return get_remaining_timeout(60)
+
+        return TestClient(app)
+
+    def test_deadline_is_set(self, client):
+        """
+        Test that the timeout of requests made while handling a request is cut short by its deadline.
+        """
+        assert 4 < client.get("/timeout").json() <= 5
+
+    def test_timeout_outside_request(self):
+        """
+        Test that the timeout is not cut short outside of a request.
+        """
+        assert get_remaining_timeout(60) == 60
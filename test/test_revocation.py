@@ -0,0 +1,286 @@
+"""
+Unit tests for the `revocation` module.
+"""
+
+from pathlib import Path
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from scigateway_auth.common.exceptions import RevocationStoreError
+from scigateway_auth.routers import revocation as revocation_router
+from scigateway_auth.src.jwt_handler import JWTHandler
+from scigateway_auth.src.revocation import _import_blacklist, get_token_id, RevocationStore
+from test.mock_data import EXPIRED_REFRESH_TOKEN, VALID_REFRESH_TOKEN
+
+
+def test_get_token_id():
+    """
+    Test that the ID of a token is its `jti` claim.
+    """
+    assert get_token_id("test-token", {"jti": "test-jti"}) == "test-jti"
+
+
+def test_get_token_id_without_jti():
+    """
+    Test that the ID of a token issued without a `jti` claim is the digest of the token.
+    """
+    assert get_token_id("test-token", {}) == "sha256:4c5dc9b7708905f77f5e5d16316b5dfb425e68cb326dcd55a860e90a7707031e"
+
+
+class TestRevocationStore:
+    """
+    Unit tests for the `RevocationStore` class.
+    """
+
+    @pytest.fixture
+    def store_path(self, tmp_path: Path) -> str:
+        """
+        Fixture which returns the path of a revocation store database in a temporary directory.
+
+        :return: The path of the database.
+        """
+        return str(tmp_path / "revocations.db")
+
+    def test_revoke_token(self, store_path):
+        """
+        Test that a revoked token is revoked and other tokens are not.
+        """
+        store = RevocationStore(store_path, 3600)
+
+        store.revoke_token("test-token-id", time.time() + 60)
+
+        assert store.is_revoked("test-token-id", "test-username", time.time())
+        assert not store.is_revoked("other-token-id", "test-username", time.time())
+
+    def test_revoke_user(self, store_path):
+        """
+        Test that revoking a user revokes the tokens issued to them before, but not after, the revocation.
+        """
+        store = RevocationStore(store_path, 3600)
+
+        store.revoke_user("test-username")
+
+        assert store.is_revoked("test-token-id", "test-username", time.time() - 60)
+        assert store.is_revoked("test-token-id", "test-username", None)
+        assert not store.is_revoked("test-token-id", "test-username", time.time() + 60)
+        assert not store.is_revoked("test-token-id", "other-username", time.time() - 60)
+
+    def test_revoke_family(self, store_path):
+        """
+        Test that revoking a family revokes the tokens in the family and not the tokens in other families.
+        """
+        store = RevocationStore(store_path, 3600)
+
+        store.revoke_family("test-family-id", time.time() + 60)
+
+        assert store.is_revoked("test-token-id", "test-username", time.time(), "test-family-id")
+        assert not store.is_revoked("test-token-id", "test-username", time.time(), "other-family-id")
+
+    def test_use_token(self, store_path):
+        """
+        Test that the first use of a token is recorded and returned when the token is used again.
+        """
+        store = RevocationStore(store_path, 3600)
+
+        with patch("scigateway_auth.src.revocation.time.time", return_value=1000.0):
+            first_use = store.use_token("test-token-id", time.time() + 60)
+        second_use = store.use_token("test-token-id", time.time() + 60)
+
+        assert (first_use, second_use) == (None, 1000.0)
+        assert store.use_token("other-token-id", time.time() + 60) is None
+
+    def test_release_token(self, store_path):
+        """
+        Test that a token can be used again as if for the first time once its use has been released.
+        """
+        store = RevocationStore(store_path, 3600)
+        store.use_token("test-token-id", time.time() + 60)
+
+        store.release_token("test-token-id")
+
+        assert store.use_token("test-token-id", time.time() + 60) is None
+        assert store.use_token("test-token-id", time.time() + 60) is not None
+
+    def test_revocations_are_persisted(self, store_path):
+        """
+        Test that revocations are shared by stores using the same database.
+        """
+        RevocationStore(store_path, 3600).revoke_token("test-token-id", time.time() + 60)
+
+        assert RevocationStore(store_path, 3600).is_revoked("test-token-id", "test-username", time.time())
+
+    def test_prune(self, store_path):
+        """
+        Test that the revocations and uses of expired tokens are pruned.
+        """
+        store = RevocationStore(store_path, 3600)
+        store.revoke_token("expired-token-id", time.time() - 60)
+        store.revoke_family("expired-family-id", time.time() - 60)
+        store.use_token("expired-token-id", time.time() - 60)
+        with patch("scigateway_auth.src.revocation.time.time", return_value=time.time() - 7200):
+            store.revoke_user("test-username")
+
+        store.prune()
+
+        assert not store.is_revoked("expired-token-id", "test-username", 0, "expired-family-id")
+        assert store.use_token("expired-token-id", time.time() + 60) is None
+
+    def test_use_token_prunes_expired_uses(self, store_path):
+        """
+        Test that the uses of expired tokens are pruned when recording the use of a token once the prune interval has
+        passed, without any token being revoked.
+        """
+        store = RevocationStore(store_path, 3600, 60)
+        store.use_token("expired-token-id", time.time() - 60)
+
+        store.use_token("test-token-id", time.time() + 60)
+        assert store._execute("SELECT token_id FROM used_tokens ORDER BY token_id", ())[0] == [
+            ("expired-token-id",),
+            ("test-token-id",),
+        ]
+
+        with patch("scigateway_auth.src.revocation.time.monotonic", return_value=time.monotonic() + 90):
+            store.use_token("other-token-id", time.time() + 60)
+        assert store._execute("SELECT token_id FROM used_tokens ORDER BY token_id", ())[0] == [
+            ("other-token-id",),
+            ("test-token-id",),
+        ]
+
+    def test_directory_is_created(self, tmp_path):
+        """
+        Test that the directory of the database is created if it does not exist.
+        """
+        store_path = tmp_path / "revocations" / "revocations.db"
+
+        RevocationStore(str(store_path), 3600).revoke_token("test-token-id", time.time() + 60)
+
+        assert RevocationStore(str(store_path), 3600).is_revoked("test-token-id", "test-username", time.time())
+
+    def test_cannot_open(self, tmp_path):
+        """
+        Test that `RevocationStoreError` is raised when the database cannot be opened.
+        """
+        (tmp_path / "file").write_text("")
+
+        with pytest.raises(RevocationStoreError):
+            RevocationStore(str(tmp_path / "file" / "revocations.db"), 3600)
+
+    def test_in_memory(self):
+        """
+        Test that revocations are kept in memory when no database path is given.
+        """
+        store = RevocationStore(None, 3600)
+
+        store.revoke_token("test-token-id", time.time() + 60)
+
+        assert store.is_revoked("test-token-id", "test-username", time.time())
+
+    def test_import_blacklist(self):
+        """
+        Test that the tokens in the deprecated blacklist configuration are revoked, ignoring those that are invalid.
+        """
+        store = RevocationStore(None, 3600)
+
+        _import_blacklist(store, [VALID_REFRESH_TOKEN, "invalid-token"])
+
+        assert store.is_revoked(get_token_id(VALID_REFRESH_TOKEN, {}), "test-username", None)
+
+
+class TestRevocationRoutes:
+    """
+    Unit tests for the routes revoking JWT refresh tokens.
+    """
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        """
+        Fixture which creates a test client for an app with the revocation routes.
+
+        :return: The test client.
+        """
+        app = FastAPI()
+        app.include_router(revocation_router.router)
+        return TestClient(app)
+
+    @pytest.fixture
+    def store(self) -> RevocationStore:
+        """
+        Fixture which replaces the revocation store used by the JWT handler with an in-memory one.
+
+        :return: The revocation store.
+        """
+        store = RevocationStore(None, 3600)
+        with patch("scigateway_auth.src.jwt_handler.revocation_store", new=store):
+            yield store
+
+    @staticmethod
+    def get_headers(is_admin: bool) -> dict[str, str]:
+        """
+        Return the headers authorising a request with an access token.
+
+        :param is_admin: Whether the access token is for an admin.
+        :return: The headers.
+        """
+        access_token = JWTHandler._pack_jwt({"username": "test-username", "userIsAdmin": is_admin, "exp": 253402300799})
+        return {"Authorization": f"Bearer {access_token}"}
+
+    @pytest.mark.parametrize(
+        "refresh_token",
+        [
+            pytest.param(
+                JWTHandler._pack_jwt({"jti": "test-jti", "username": "test-username", "exp": 253402300799}),
+                id="token with jti",
+            ),
+            pytest.param(VALID_REFRESH_TOKEN, id="token without jti"),
+        ],
+    )
+    def test_revoke_token(self, client, store, refresh_token):
+        """
+        Test that an admin can revoke a refresh token.
+        """
+        response = client.post("/revocations/token", json={"token": refresh_token}, headers=self.get_headers(True))
+
+        assert response.status_code == 200
+        payload = JWTHandler._get_jwt_payload(refresh_token, {})
+        assert store.is_revoked(get_token_id(refresh_token, payload), "test-username", None)
+
+    def test_revoke_token_with_invalid_token(self, client, store):
+        """
+        Test that a token which was not signed by this service cannot be revoked.
+        """
+        response = client.post(
+            "/revocations/token",
+            json={"token": EXPIRED_REFRESH_TOKEN[:-4] + "abcd"},
+            headers=self.get_headers(True),
+        )
+
+        assert response.status_code == 400
+
+    def test_revoke_user(self, client, store):
+        """
+        Test that an admin can revoke all of a user's refresh tokens.
+        """
+        response = client.post("/revocations/user", json={"username": "test-username"}, headers=self.get_headers(True))
+
+        assert response.status_code == 200
+        assert store.is_revoked("test-token-id", "test-username", time.time() - 60)
+
+    @pytest.mark.parametrize(
+        ("path", "body"),
+        [
+            pytest.param("/revocations/token", {"token": VALID_REFRESH_TOKEN}, id="token"),
+            pytest.param("/revocations/user", {"username": "test-username"}, id="user"),
+        ],
+    )
+    def test_revoke_non_admin(self, client, store, path, body):
+        """
+        Test that a user who is not an admin cannot revoke refresh tokens.
+        """
+        response = client.post(path, json=body, headers=self.get_headers(False))
+
+        assert response.status_code == 403
+        assert not store.is_revoked(get_token_id(VALID_REFRESH_TOKEN, {}), "test-username", None)
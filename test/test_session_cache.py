@@ -0,0 +1,107 @@
+"""
+Unit tests for the `SessionUsernameCache` class.
+"""
+
+import time
+from unittest.mock import patch
+
+from scigateway_auth.src.session_cache import SessionUsernameCache
+
+
+class TestSessionUsernameCache:
+    """
+    Unit tests for the `SessionUsernameCache` class.
+    """
+
+    def test_get_miss(self):
+        """
+        Test that `get` returns `None` and counts a miss when the username of the session has not been cached.
+        """
+        cache = SessionUsernameCache(10, 60)
+
+        assert cache.get("session-id") is None
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_get_hit(self):
+        """
+        Test that `get` returns the cached username and counts a hit.
+        """
+        cache = SessionUsernameCache(10, 60)
+        cache.put("session-id", "username")
+
+        assert cache.get("session-id") == "username"
+        assert (cache.hits, cache.misses) == (1, 0)
+
+    def test_session_ids_are_not_held(self):
+        """
+        Test that the session IDs are not held in the cache, only their digests.
+        """
+        cache = SessionUsernameCache(10, 60)
+        cache.put("session-id", "username")
+
+        assert "session-id" not in cache._entries
+        assert all(isinstance(key, bytes) for key in cache._entries)
+
+    def test_get_expired(self):
+        """
+        Test that `get` does not return the username once the TTL has passed since it was cached.
+        """
+        cache = SessionUsernameCache(10, 60)
+        cache.put("session-id", "username")
+
+        with patch("scigateway_auth.src.session_cache.time.monotonic", return_value=time.monotonic() + 61):
+            assert cache.get("session-id") is None
+        assert len(cache) == 0
+
+    def test_extend(self):
+        """
+        Test that `extend` restarts the TTL of the username of a refreshed session, and does not add a session which is
+        not in the cache.
+        """
+        cache = SessionUsernameCache(10, 60)
+        cache.put("session-id", "username")
+
+        with patch("scigateway_auth.src.session_cache.time.monotonic", return_value=time.monotonic() + 50):
+            cache.extend("session-id")
+            cache.extend("other-session-id")
+        with patch("scigateway_auth.src.session_cache.time.monotonic", return_value=time.monotonic() + 100):
+            assert cache.get("session-id") == "username"
+        assert len(cache) == 1
+
+    def test_invalidate(self):
+        """
+        Test that `invalidate` removes the username of the session.
+        """
+        cache = SessionUsernameCache(10, 60)
+        cache.put("session-id", "username")
+        cache.put("other-session-id", "other-username")
+
+        cache.invalidate("session-id")
+        cache.invalidate("unknown-session-id")
+
+        assert cache.get("session-id") is None
+        assert cache.get("other-session-id") == "other-username"
+
+    def test_least_recently_used_evicted(self):
+        """
+        Test that the least recently used entry is evicted when the cache is full.
+        """
+        cache = SessionUsernameCache(2, 60)
+        cache.put("session-1", "user-1")
+        cache.put("session-2", "user-2")
+        cache.get("session-1")
+        cache.put("session-3", "user-3")
+
+        assert cache.get("session-2") is None
+        assert cache.get("session-1") == "user-1"
+        assert cache.get("session-3") == "user-3"
+
+    def test_disabled(self):
+        """
+        Test that nothing is cached when the maximum size is `0`.
+        """
+        cache = SessionUsernameCache(0, 60)
+        cache.put("session-id", "username")
+
+        assert cache.get("session-id") is None
+        assert len(cache) == 0
@@ -0,0 +1,302 @@
+"""
+Unit tests for the `SingleFlightTTLCache` and `AsyncSingleFlightTTLCache` classes.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from scigateway_auth.src.single_flight_cache import async_single_flight_ttl_cache, single_flight_ttl_cache
+
+
+class TestSingleFlightTTLCache:
+    """
+    Unit tests for the `SingleFlightTTLCache` class.
+    """
+
+    @staticmethod
+    def wait_for_refresh(cache) -> None:
+        """
+        Wait for any background refreshes of the cache to finish.
+
+        :param cache: The cache to wait for.
+        """
+        for future in list(cache._in_flight.values()):
+            future.exception(timeout=5)
+
+    def test_call_caches_result(self):
+        """
+        Test that the function is only called once while its result is fresh.
+        """
+        function = Mock(return_value="result")
+        cache = single_flight_ttl_cache(ttl_seconds=60)(function)
+
+        assert [cache("key"), cache("key")] == ["result", "result"]
+        function.assert_called_once_with("key")
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_call_is_keyed_by_arguments(self):
+        """
+        Test that the results are cached separately for different arguments.
+        """
+        cache = single_flight_ttl_cache(ttl_seconds=60)(lambda key: f"result-{key}")
+
+        assert [cache("key-1"), cache("key-2")] == ["result-key-1", "result-key-2"]
+        assert cache.misses == 2
+
+    def test_concurrent_calls_are_coalesced(self):
+        """
+        Test that concurrent calls which miss the cache wait for a single call of the function.
+        """
+        release = threading.Event()
+        function = Mock(side_effect=lambda key: release.wait(5) and "result")
+        cache = single_flight_ttl_cache(ttl_seconds=60)(function)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(cache, "key") for _ in range(10)]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+        assert results == ["result"] * 10
+        function.assert_called_once_with("key")
+
+    def test_concurrent_calls_share_error(self):
+        """
+        Test that an error raised by the function is raised to all the callers waiting for it and is not cached.
+        """
+        release = threading.Event()
+
+        def function(key):
+            release.wait(5)
+            raise ValueError("test-error")
+
+        cache = single_flight_ttl_cache(ttl_seconds=60)(function)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(cache, "key") for _ in range(2)]
+            time.sleep(0.1)
+            release.set()
+            for future in futures:
+                with pytest.raises(ValueError):
+                    future.result(timeout=5)
+
+        assert cache.errors == 1
+        assert cache._entries == {}
+
+    def test_call_refreshes_ahead_of_expiry(self):
+        """
+        Test that a result which is about to expire is returned while it is refreshed in the background.
+        """
+        function = Mock(side_effect=["first", "second"])
+        cache = single_flight_ttl_cache(ttl_seconds=60, refresh_ahead_seconds=10)(function)
+        cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 55):
+            assert cache("key") == "first"
+            self.wait_for_refresh(cache)
+
+        assert cache("key") == "second"
+        assert (cache.hits, cache.refreshes) == (2, 1)
+
+    def test_call_returns_stale_result_while_revalidating(self):
+        """
+        Test that an expired result is returned within the stale window while it is refreshed in the background.
+        """
+        function = Mock(side_effect=["first", "second"])
+        cache = single_flight_ttl_cache(ttl_seconds=60, stale_seconds=60)(function)
+        cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 90):
+            assert cache("key") == "first"
+            self.wait_for_refresh(cache)
+
+        assert cache("key") == "second"
+        assert (cache.stale_hits, cache.refreshes) == (1, 1)
+
+    def test_call_keeps_stale_result_when_refresh_fails(self):
+        """
+        Test that the previous result is still returned within the stale window when refreshing it fails.
+        """
+        function = Mock(side_effect=["first", ValueError("test-error")])
+        cache = single_flight_ttl_cache(ttl_seconds=60, stale_seconds=60)(function)
+        cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 90):
+            assert cache("key") == "first"
+            self.wait_for_refresh(cache)
+            assert cache("key") == "first"
+
+        assert cache.errors == 1
+
+    def test_call_after_stale_window(self):
+        """
+        Test that the function is called again once the result is older than the stale window.
+        """
+        function = Mock(side_effect=["first", "second"])
+        cache = single_flight_ttl_cache(ttl_seconds=60, stale_seconds=60)(function)
+        cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 150):
+            assert cache("key") == "second"
+
+        assert cache.misses == 2
+
+    def test_refresh(self):
+        """
+        Test that `refresh` calls the function and caches the result even when there is a fresh result.
+        """
+        function = Mock(side_effect=["first", "second"])
+        cache = single_flight_ttl_cache(ttl_seconds=60)(function)
+        cache("key")
+
+        assert cache.refresh("key") == "second"
+        assert cache("key") == "second"
+
+    def test_cache_clear(self):
+        """
+        Test that `cache_clear` removes the cached results.
+        """
+        function = Mock(return_value="result")
+        cache = single_flight_ttl_cache(ttl_seconds=60)(function)
+        cache("key")
+
+        cache.cache_clear()
+        cache("key")
+
+        assert function.call_count == 2
+
+
+@pytest.mark.anyio
+class TestAsyncSingleFlightTTLCache:
+    """
+    Unit tests for the `AsyncSingleFlightTTLCache` class.
+    """
+
+    async def test_call_caches_result(self):
+        """
+        Test that the function is only called once while its result is fresh.
+        """
+        function = AsyncMock(return_value="result")
+        cache = async_single_flight_ttl_cache(ttl_seconds=60)(function)
+
+        assert [await cache("key"), await cache("key"), await cache("other-key")] == ["result", "result", "result"]
+        assert function.await_count == 2
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    async def test_result_expires(self):
+        """
+        Test that the function is called again once its result has expired, and that expired results are pruned.
+        """
+        function = AsyncMock(side_effect=["first", "second", "third"])
+        cache = async_single_flight_ttl_cache(ttl_seconds=60)(function)
+        await cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 90):
+            assert await cache("key") == "second"
+            await cache("other-key")
+
+        assert list(cache._entries) == [("key",), ("other-key",)]
+        assert await cache("key") == "second"
+
+    async def test_call_refreshes_ahead_of_expiry(self):
+        """
+        Test that a result which is about to expire is refreshed in the background while it is still returned.
+        """
+        function = AsyncMock(side_effect=["first", "second"])
+        cache = async_single_flight_ttl_cache(ttl_seconds=60, refresh_ahead_seconds=20)(function)
+        await cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 50):
+            assert [await cache("key"), await cache("key")] == ["first", "first"]
+            await asyncio.gather(*cache._in_flight.values(), return_exceptions=True)
+
+        assert await cache("key") == "second"
+        assert (cache.hits, cache.refreshes) == (3, 1)
+
+    async def test_call_keeps_stale_result_when_refresh_fails(self):
+        """
+        Test that an expired result is returned within the stale window while it is refreshed in the background, and
+        is still returned when refreshing it fails.
+        """
+        function = AsyncMock(side_effect=["first", ValueError("test-error"), "second"])
+        cache = async_single_flight_ttl_cache(ttl_seconds=60, stale_seconds=60)(function)
+        await cache("key")
+
+        with patch("scigateway_auth.src.single_flight_cache.time.monotonic", return_value=time.monotonic() + 90):
+            assert await cache("key") == "first"
+            await asyncio.gather(*cache._in_flight.values(), return_exceptions=True)
+            assert await cache("key") == "first"
+            await asyncio.gather(*cache._in_flight.values(), return_exceptions=True)
+
+        assert await cache("key") == "second"
+        assert (cache.stale_hits, cache.refreshes, cache.errors) == (2, 2, 1)
+
+    async def test_concurrent_calls_are_coalesced(self):
+        """
+        Test that concurrent calls which miss the cache wait for a single call of the function.
+        """
+        release = asyncio.Event()
+
+        async def function(key: str) -> str:
+            await release.wait()
+            return f"result-{key}"
+
+        cache = async_single_flight_ttl_cache(ttl_seconds=0)(AsyncMock(side_effect=function))
+        tasks = [asyncio.create_task(cache("key")) for _ in range(10)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*tasks) == ["result-key"] * 10
+        assert (cache.misses, cache.coalesced) == (1, 9)
+
+    async def test_failures_are_shared_and_not_cached(self):
+        """
+        Test that the callers waiting for a call which fails get its exception, and that the failure is not cached.
+        """
+        release = asyncio.Event()
+
+        async def function(key: str) -> str:
+            await release.wait()
+            raise ValueError("test-error")
+
+        mock_function = AsyncMock(side_effect=function)
+        cache = async_single_flight_ttl_cache(ttl_seconds=60)(mock_function)
+        tasks = [asyncio.create_task(cache("key")) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert [str(result) for result in results] == ["test-error"] * 3
+        with pytest.raises(ValueError, match="test-error"):
+            await cache("key")
+        assert mock_function.await_count == 2
+
+    async def test_cancelled_caller_does_not_cancel_call(self):
+        """
+        Test that cancelling the caller which started a call does not cancel it for the callers waiting for it.
+        """
+        release = asyncio.Event()
+
+        async def function(key: str) -> str:
+            await release.wait()
+            return f"result-{key}"
+
+        cache = async_single_flight_ttl_cache(ttl_seconds=60)(AsyncMock(side_effect=function))
+        leader = asyncio.create_task(cache("key"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache("key"))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await waiter == "result-key"
+        assert leader.cancelled()
+        assert await cache("key") == "result-key"
+        assert (cache.misses, cache.coalesced, cache.hits) == (1, 1, 1)
@@ -0,0 +1,104 @@
+"""
+Unit tests for the `VerifiedTokenCache` class.
+"""
+
+import time
+from unittest.mock import patch
+
+from scigateway_auth.src.token_cache import VerifiedTokenCache
+
+
+class TestVerifiedTokenCache:
+    """
+    Unit tests for the `VerifiedTokenCache` class.
+    """
+
+    payload = {"sessionId": "test-session-id", "username": "test-username", "exp": 253402300799}
+
+    def test_get_miss(self):
+        """
+        Test that `get` returns `None` and counts a miss when the token has not been cached.
+        """
+        cache = VerifiedTokenCache(10)
+
+        assert cache.get("token", 1) is None
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_get_hit(self):
+        """
+        Test that `get` returns a copy of the cached payload and counts a hit.
+        """
+        cache = VerifiedTokenCache(10)
+        cache.put("token", self.payload, 1)
+
+        payload = cache.get("token", 1)
+        payload["username"] = "modified"
+
+        assert cache.get("token", 1) == self.payload
+        assert (cache.hits, cache.misses) == (2, 0)
+
+    def test_get_expired(self):
+        """
+        Test that `get` does not return the payload of a token that has expired since it was cached.
+        """
+        cache = VerifiedTokenCache(10)
+        cache.put("token", {**self.payload, "exp": time.time() + 60}, 1)
+
+        with patch("scigateway_auth.src.token_cache.time.time", return_value=time.time() + 61):
+            assert cache.get("token", 1) is None
+        assert len(cache) == 0
+
+    def test_get_different_key_version(self):
+        """
+        Test that the cache is cleared when the version of the keys changes.
+        """
+        cache = VerifiedTokenCache(10)
+        cache.put("token", self.payload, 1)
+
+        assert cache.get("token", 2) is None
+        assert len(cache) == 0
+
+    def test_put_evicts_least_recently_used(self):
+        """
+        Test that `put` evicts the least recently used entry when the cache is full.
+        """
+        cache = VerifiedTokenCache(2)
+        cache.put("token-1", self.payload, 1)
+        cache.put("token-2", self.payload, 1)
+        cache.get("token-1", 1)
+
+        cache.put("token-3", self.payload, 1)
+
+        assert cache.get("token-2", 1) is None
+        assert cache.get("token-1", 1) == self.payload
+        assert cache.get("token-3", 1) == self.payload
+
+    def test_put_evicts_expired(self):
+        """
+        Test that `put` evicts the entries whose tokens have expired.
+        """
+        cache = VerifiedTokenCache(10)
+        cache.put("token-1", {**self.payload, "exp": time.time() + 60}, 1)
+
+        with patch("scigateway_auth.src.token_cache.time.time", return_value=time.time() + 61):
+            cache.put("token-2", self.payload, 1)
+
+        assert len(cache) == 1
+
+    def test_put_without_exp(self):
+        """
+        Test that `put` does not cache the payload of a token without an `exp` claim.
+        """
+        cache = VerifiedTokenCache(10)
+        cache.put("token", {"username": "test-username"}, 1)
+
+        assert len(cache) == 0
+
+    def test_put_disabled(self):
+        """
+        Test that `put` does not cache anything when the maximum size is `0`.
+        """
+        cache = VerifiedTokenCache(0)
+        cache.put("token", self.payload, 1)
+
+        assert len(cache) == 0